@@ -65,6 +65,9 @@ CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
 CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_id);
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
 CREATE INDEX IF NOT EXISTS idx_products_active ON products(is_active);
+-- Keyset pagination of active products (GET /products?cursor=...)
+CREATE INDEX IF NOT EXISTS idx_products_active_created
+    ON products(created_at DESC, id DESC) WHERE is_active = TRUE;
 
 -- Verify tables were created
 SELECT table_name
@@ -0,0 +1,144 @@
+-- Database 101 - Example 4: Change Notifications (LISTEN/NOTIFY)
+-- Run this after 01_create_tables.sql. Every committed change to products,
+-- orders or order_items sends one message on the catalog_changes channel,
+-- which the Products API workers use to evict their cached responses.
+--
+-- Payloads are JSON:
+--   {"products": [ids], "categories": [names]}  products were written
+--   {"orders": [product ids]}                   orders of these products changed
+--   {"all": true}                               too many rows to list; drop everything
+--
+-- The triggers are statement-level, so a bulk UPDATE sends one message, not
+-- one per row. Notifications are delivered only on commit, and identical
+-- messages within a transaction are delivered once.
+
+-- Send one change message, falling back to {"all": true} when the id list
+-- would not fit in a NOTIFY payload (8000 bytes)
+CREATE OR REPLACE FUNCTION notify_catalog_change(kind TEXT, ids INTEGER[], categories TEXT[])
+RETURNS void AS $$
+BEGIN
+    IF ids IS NULL THEN
+        RETURN;
+    END IF;
+    IF cardinality(ids) > 500 THEN
+        PERFORM pg_notify('catalog_changes', json_build_object('all', TRUE)::text);
+    ELSIF kind = 'products' THEN
+        PERFORM pg_notify('catalog_changes', json_build_object(
+            'products', ids,
+            'categories', COALESCE(categories, '{}')
+        )::text);
+    ELSE
+        PERFORM pg_notify('catalog_changes', json_build_object(kind, ids)::text);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Products: ids and categories of every row touched (old and new category on update)
+CREATE OR REPLACE FUNCTION notify_product_changes() RETURNS trigger AS $$
+DECLARE
+    changed_ids INTEGER[];
+    changed_categories TEXT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT id), array_agg(DISTINCT category) FILTER (WHERE category IS NOT NULL)
+        INTO changed_ids, changed_categories
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT id), array_agg(DISTINCT category) FILTER (WHERE category IS NOT NULL)
+        INTO changed_ids, changed_categories
+        FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT id), array_agg(DISTINCT category) FILTER (WHERE category IS NOT NULL)
+        INTO changed_ids, changed_categories
+        FROM (SELECT id, category FROM old_rows
+              UNION ALL
+              SELECT id, category FROM new_rows) AS changed;
+    END IF;
+    PERFORM notify_catalog_change('products', changed_ids, changed_categories);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Order items: the products whose order history changed
+CREATE OR REPLACE FUNCTION notify_order_item_changes() RETURNS trigger AS $$
+DECLARE
+    changed_ids INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT product_id) INTO changed_ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT product_id) INTO changed_ids FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT product_id) INTO changed_ids
+        FROM (SELECT product_id FROM old_rows
+              UNION ALL
+              SELECT product_id FROM new_rows) AS changed;
+    END IF;
+    PERFORM notify_catalog_change('orders', changed_ids, NULL);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Orders: a status or date change shows up in the order history of every
+-- product on the order. Deleted orders cascade to order_items, which notify.
+CREATE OR REPLACE FUNCTION notify_order_changes() RETURNS trigger AS $$
+DECLARE
+    changed_ids INTEGER[];
+BEGIN
+    SELECT array_agg(DISTINCT oi.product_id) INTO changed_ids
+    FROM order_items oi
+    WHERE oi.order_id IN (SELECT id FROM new_rows);
+    PERFORM notify_catalog_change('orders', changed_ids, NULL);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_notify_inserts ON products;
+CREATE TRIGGER products_notify_inserts
+    AFTER INSERT ON products
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes();
+
+DROP TRIGGER IF EXISTS products_notify_updates ON products;
+CREATE TRIGGER products_notify_updates
+    AFTER UPDATE ON products
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes();
+
+DROP TRIGGER IF EXISTS products_notify_deletes ON products;
+CREATE TRIGGER products_notify_deletes
+    AFTER DELETE ON products
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes();
+
+DROP TRIGGER IF EXISTS order_items_notify_inserts ON order_items;
+CREATE TRIGGER order_items_notify_inserts
+    AFTER INSERT ON order_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_order_item_changes();
+
+DROP TRIGGER IF EXISTS order_items_notify_updates ON order_items;
+CREATE TRIGGER order_items_notify_updates
+    AFTER UPDATE ON order_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_order_item_changes();
+
+DROP TRIGGER IF EXISTS order_items_notify_deletes ON order_items;
+CREATE TRIGGER order_items_notify_deletes
+    AFTER DELETE ON order_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_order_item_changes();
+
+DROP TRIGGER IF EXISTS orders_notify_updates ON orders;
+CREATE TRIGGER orders_notify_updates
+    AFTER UPDATE ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_order_changes();
+
+-- Try it: in one psql session run
+--   LISTEN catalog_changes;
+-- and in another
+--   UPDATE products SET price = price WHERE id = 1;
+-- The first session then shows
+--   Asynchronous notification "catalog_changes" with payload
+--   "{"products" : [1], "categories" : ["Electronics"]}" received
@@ -0,0 +1,98 @@
+-- Database 101 - Example 5: Category Stats Read Model
+-- Run this after 01_create_tables.sql. category_stats holds the number of
+-- active products per category, kept current by triggers in the same
+-- transaction as every product write, so GET /categories reads a handful of
+-- rows instead of grouping the whole products table.
+
+CREATE TABLE IF NOT EXISTS category_stats (
+    category VARCHAR(50) PRIMARY KEY,
+    product_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Apply +1 for every active, categorized row in new_rows and -1 for every one
+-- in old_rows. Soft deletes (is_active -> FALSE), reactivations and category
+-- moves are all just an old row and a new row. Statement-level, so a bulk
+-- import costs one upsert per category rather than one per product.
+CREATE OR REPLACE FUNCTION maintain_category_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO category_stats (category, product_count)
+        SELECT category, COUNT(*)
+        FROM new_rows
+        WHERE is_active AND category IS NOT NULL
+        GROUP BY category
+        ON CONFLICT (category) DO UPDATE
+        SET product_count = category_stats.product_count + EXCLUDED.product_count;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE category_stats s
+        SET product_count = s.product_count - d.removed
+        FROM (
+            SELECT category, COUNT(*) AS removed
+            FROM old_rows
+            WHERE is_active AND category IS NOT NULL
+            GROUP BY category
+        ) AS d
+        WHERE s.category = d.category;
+    ELSE
+        INSERT INTO category_stats (category, product_count)
+        SELECT category, SUM(delta)
+        FROM (
+            SELECT category, -1 AS delta FROM old_rows
+            WHERE is_active AND category IS NOT NULL
+            UNION ALL
+            SELECT category, 1 AS delta FROM new_rows
+            WHERE is_active AND category IS NOT NULL
+        ) AS changes
+        GROUP BY category
+        HAVING SUM(delta) <> 0
+        ON CONFLICT (category) DO UPDATE
+        SET product_count = category_stats.product_count + EXCLUDED.product_count;
+    END IF;
+
+    DELETE FROM category_stats WHERE product_count <= 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Count the existing products and install the triggers while writes are
+-- blocked, so no change is missed or counted twice
+BEGIN;
+LOCK TABLE products IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM category_stats;
+INSERT INTO category_stats (category, product_count)
+SELECT category, COUNT(*)
+FROM products
+WHERE is_active = TRUE AND category IS NOT NULL
+GROUP BY category;
+
+DROP TRIGGER IF EXISTS products_category_stats_inserts ON products;
+CREATE TRIGGER products_category_stats_inserts
+    AFTER INSERT ON products
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_category_stats();
+
+DROP TRIGGER IF EXISTS products_category_stats_updates ON products;
+CREATE TRIGGER products_category_stats_updates
+    AFTER UPDATE ON products
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_category_stats();
+
+DROP TRIGGER IF EXISTS products_category_stats_deletes ON products;
+CREATE TRIGGER products_category_stats_deletes
+    AFTER DELETE ON products
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_category_stats();
+
+COMMIT;
+
+-- Check the read model against the live aggregate (should return no rows)
+SELECT COALESCE(s.category, p.category) AS category, s.product_count, p.product_count
+FROM category_stats s
+FULL JOIN (
+    SELECT category, COUNT(*) AS product_count
+    FROM products
+    WHERE is_active = TRUE AND category IS NOT NULL
+    GROUP BY category
+) p ON p.category = s.category
+WHERE s.product_count IS DISTINCT FROM p.product_count;
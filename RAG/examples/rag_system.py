@@ -4,28 +4,67 @@ A fully functional Retrieval-Augmented Generation system.
 
 Features:
 - Document ingestion with chunking
+- Optional exact and near-duplicate chunk detection at ingest
+- Optional normalized storage (source text stored once, chunks as offsets)
 - Semantic search with pgvector
+- Optional MMR diversification of retrieved chunks
+- Optional hybrid keyword + vector retrieval for identifier-heavy queries
 - Context-aware answer generation
+- Token-budgeted context packing
+- Optional extractive sentence-level context compression
 - Source citation
+- Online embedding-model migration through a shadow vector column
+- Optional scatter-gather retrieval across several Postgres shards
+- Optional read replicas for retrieval, with read-your-writes
+- Snapshot export/import (Arrow IPC + binary COPY) without re-embedding
+- Vector index health checks and off-peak VACUUM/REINDEX (IndexMaintenance)
+- Trigger-maintained corpus statistics (get_stats) instead of COUNT(*)
+
+Sharding, replicas, migrations, snapshots, deduplication signatures and
+IndexMaintenance come from vector_store.py next to this file, the same
+module the knowledge base example uses.
 
 Prerequisites:
-- pip install openai psycopg2-binary python-dotenv
+- pip install openai psycopg2-binary python-dotenv numpy
 - PostgreSQL with pgvector extension
+- Optional: pip install tiktoken (exact token counts for context packing)
+- Optional: pip install pyarrow (snapshot export/import)
 
 Setup:
 1. Create .env file with API keys and DB credentials
 2. Run: python rag_system.py
+   (or: python rag_system.py --benchmark-mmr to time MMR reranking)
 """
 
 from openai import OpenAI
+import numpy as np
 import psycopg2
 import psycopg2.extras
+import heapq
 import os
 import re
-from typing import List, Dict, Optional
+import sys
+import time
+from itertools import islice
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 from dataclasses import dataclass
 
+# tiktoken gives exact token counts; fall back to an estimate without it
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+from vector_store import (
+    PgVectorStore,
+    SIMHASH_BANDS,
+    content_signature,
+    install_row_counters,
+    keyword_query,
+)
+
 load_dotenv()
 
 # Initialize OpenAI client
@@ -40,6 +79,59 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'password')
 }
 
+# Sentence boundaries used by context compression
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text (roughly 4 characters per token without tiktoken)."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def mmr_select(
+    query_embedding: np.ndarray,
+    candidate_embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Pick k diverse candidates with Maximal Marginal Relevance.
+
+    Each step chooses the candidate maximizing
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected).
+    The pairwise similarity matrix is computed once, so every step is a
+    single vectorized update.
+
+    Returns indices into candidate_embeddings, in selection order.
+    """
+    n = len(candidate_embeddings)
+    if n == 0 or k <= 0:
+        return []
+
+    vectors = candidate_embeddings / np.maximum(
+        np.linalg.norm(candidate_embeddings, axis=1, keepdims=True), 1e-12
+    )
+    query = query_embedding / max(np.linalg.norm(query_embedding), 1e-12)
+    relevance = vectors @ query
+    pairwise = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, n):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, pairwise[best], out=max_similarity)
+
+    return selected
+
 
 @dataclass
 class Document:
@@ -55,9 +147,12 @@ class RetrievedChunk:
     content: str
     source: str
     similarity: float
+    chunk_index: int = 0
+    token_count: int = 0
+    chunk_id: Optional[int] = None
 
 
-class RAGSystem:
+class RAGSystem(PgVectorStore):
     """
     A complete RAG (Retrieval-Augmented Generation) system.
 
@@ -67,6 +162,9 @@ class RAGSystem:
     3. Generate answers grounded in the retrieved context
     """
 
+    # Column of the signatures table referencing a chunk
+    signature_key = "chunk_id"
+
     def __init__(
         self,
         embedding_model: str = "text-embedding-3-small",
@@ -74,7 +172,24 @@ class RAGSystem:
         chunk_size: int = 500,
         chunk_overlap: int = 50,
         top_k: int = 5,
-        similarity_threshold: float = 0.5
+        similarity_threshold: float = 0.5,
+        context_token_budget: Optional[int] = None,
+        compress_context: bool = False,
+        max_context_sentences: int = 8,
+        use_mmr: bool = False,
+        mmr_lambda: float = 0.5,
+        mmr_fetch_k: int = 20,
+        use_hybrid: bool = False,
+        lexical_k: int = 50,
+        storage_mode: str = "inline",
+        neighbor_chunks: int = 0,
+        deduplicate: bool = False,
+        near_duplicate_distance: int = 3,
+        shard_dsns: Optional[List[str]] = None,
+        shard_timeout: float = 2.0,
+        allow_partial_results: bool = True,
+        replica_dsns: Optional[List] = None,
+        max_replica_lag: float = 5.0
     ):
         """
         Initialize the RAG system.
@@ -86,53 +201,272 @@ class RAGSystem:
             chunk_overlap: Overlap between chunks for context continuity
             top_k: Number of chunks to retrieve
             similarity_threshold: Minimum similarity score for retrieval
+            context_token_budget: Maximum tokens of context sent to the LLM
+                (None means no limit)
+            compress_context: Embed sentences at ingest and send only the
+                sentences most similar to the question
+            max_context_sentences: Sentences kept when compressing context
+            use_mmr: Rerank candidates with Maximal Marginal Relevance to
+                avoid near-duplicate chunks
+            mmr_lambda: Relevance/diversity trade-off for MMR (1.0 means
+                pure relevance, 0.0 means pure diversity)
+            mmr_fetch_k: Candidates fetched before MMR picks top_k
+            use_hybrid: Look up identifier-like query terms (error codes,
+                SKUs) in a full-text index and fuse that ranking with the
+                vector ranking (inline storage only)
+            lexical_k: Keyword matches fetched per shard in hybrid mode
+            storage_mode: "inline" stores each chunk's text in
+                rag_documents; "normalized" stores each source text once
+                and chunks as character offsets into it
+            neighbor_chunks: In normalized mode, widen each retrieved
+                chunk to include this many neighboring chunks on each side
+            deduplicate: Skip embedding chunks that exactly or nearly
+                match an existing chunk; store them as references instead
+            near_duplicate_distance: Maximum SimHash bit difference for two
+                chunks to count as near-duplicates (at most 3 is
+                guaranteed to be found by the banded index)
+            shard_dsns: Connection strings of Postgres shards; None uses
+                the single DB_CONFIG database. Each document's chunks
+                live on the shard chosen by hashing its source.
+            shard_timeout: Seconds each shard gets to answer a search
+            allow_partial_results: Return results from the shards that
+                answered when others fail or time out (otherwise raise)
+            replica_dsns: Connection strings of read replicas. A flat list
+                holds replicas of the single database; with shards, give
+                one list per shard. Searches use a replica, writes always
+                go to the primary.
+            max_replica_lag: Replicas lagging more seconds than this are
+                skipped for reads
         """
+        if storage_mode not in ("inline", "normalized"):
+            raise ValueError(f"Unknown storage_mode: {storage_mode}")
+        if use_hybrid and storage_mode != "inline":
+            raise ValueError("Hybrid search needs inline storage")
+
         self.embedding_model = embedding_model
         self.llm_model = llm_model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.top_k = top_k
         self.similarity_threshold = similarity_threshold
+        self.context_token_budget = context_token_budget
+        self.compress_context = compress_context
+        self.max_context_sentences = max_context_sentences
+        self.use_mmr = use_mmr
+        self.mmr_lambda = mmr_lambda
+        self.mmr_fetch_k = mmr_fetch_k
+        self.use_hybrid = use_hybrid
+        self.lexical_k = lexical_k
+        self.storage_mode = storage_mode
+        self.neighbor_chunks = neighbor_chunks
+        self.deduplicate = deduplicate
+        self.near_duplicate_distance = near_duplicate_distance
         self.table_name = "rag_documents"
-
-    def get_connection(self):
-        """Create a database connection."""
-        return psycopg2.connect(**DB_CONFIG)
+        if storage_mode == "normalized":
+            self.sources_table = f"{self.table_name}_sources"
+            self.chunks_table = f"{self.table_name}_chunks"
+        else:
+            self.sources_table = None
+            self.chunks_table = self.table_name
+        self.sentences_table = f"{self.chunks_table}_sentences"
+        super().__init__(
+            self.chunks_table,
+            DB_CONFIG,
+            shard_dsns=shard_dsns,
+            shard_timeout=shard_timeout,
+            allow_partial_results=allow_partial_results,
+            replica_dsns=replica_dsns,
+            max_replica_lag=max_replica_lag
+        )
 
     def setup_database(self):
-        """Create necessary tables and indexes."""
-        conn = self.get_connection()
+        """Create necessary tables and indexes on every shard."""
+        for shard in range(self.shard_count):
+            self._setup_shard(shard)
+        print("Database setup complete!")
+
+    def _setup_shard(self, shard: int):
+        """Create necessary tables and indexes in one database."""
+        conn = self.get_connection(shard)
         try:
             with conn.cursor() as cur:
                 # Enable pgvector extension
                 cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
 
-                # Create documents table
+                if self.storage_mode == "normalized":
+                    self._setup_normalized_tables(cur)
+                else:
+                    self._setup_inline_table(cur)
+
+                if self.shard_dsns:
+                    self._interleave_ids(cur, shard)
+
+                # Cached sentence embeddings for context compression
                 cur.execute(f"""
-                    CREATE TABLE IF NOT EXISTS {self.table_name} (
-                        id SERIAL PRIMARY KEY,
+                    CREATE TABLE IF NOT EXISTS {self.sentences_table} (
+                        chunk_id INTEGER NOT NULL
+                            REFERENCES {self.chunks_table}(id) ON DELETE CASCADE,
+                        sentence_index INTEGER NOT NULL,
                         content TEXT NOT NULL,
-                        source VARCHAR(500),
-                        chunk_index INTEGER,
-                        metadata JSONB DEFAULT '{{}}'::jsonb,
                         embedding VECTOR(1536),
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        PRIMARY KEY (chunk_id, sentence_index)
                     )
                 """)
 
-                # Create index for fast similarity search
+                # Duplicate chunks point at a canonical chunk's vector
                 cur.execute(f"""
-                    CREATE INDEX IF NOT EXISTS {self.table_name}_embedding_idx
-                    ON {self.table_name}
-                    USING ivfflat (embedding vector_cosine_ops)
-                    WITH (lists = 100)
+                    ALTER TABLE {self.chunks_table}
+                    ADD COLUMN IF NOT EXISTS canonical_id INTEGER
+                        REFERENCES {self.chunks_table}(id) ON DELETE CASCADE
+                """)
+
+                # Signature index of canonical chunks for deduplication
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.signatures_table} (
+                        chunk_id INTEGER PRIMARY KEY
+                            REFERENCES {self.chunks_table}(id) ON DELETE CASCADE,
+                        content_hash CHAR(64) NOT NULL,
+                        simhash BIGINT NOT NULL,
+                        band0 INTEGER NOT NULL,
+                        band1 INTEGER NOT NULL,
+                        band2 INTEGER NOT NULL,
+                        band3 INTEGER NOT NULL
+                    )
                 """)
+                for column in ["content_hash"] + [
+                    f"band{i}" for i in range(SIMHASH_BANDS)
+                ]:
+                    cur.execute(f"""
+                        CREATE INDEX IF NOT EXISTS
+                            {self.signatures_table}_{column}_idx
+                        ON {self.signatures_table} ({column})
+                    """)
+
+                # Which vector column (and model) queries should use
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.embedding_columns_table} (
+                        column_name VARCHAR(63) PRIMARY KEY,
+                        model VARCHAR(100) NOT NULL,
+                        dimensions INTEGER,
+                        status VARCHAR(20) NOT NULL
+                            CHECK (status IN ('backfilling', 'active', 'retired')),
+                        checkpoint_id INTEGER DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cur.execute(f"""
+                    INSERT INTO {self.embedding_columns_table}
+                    (column_name, model, status)
+                    VALUES ('embedding', %s, 'active')
+                    ON CONFLICT (column_name) DO NOTHING
+                """, (self.embedding_model,))
+
+                # Counters behind get_stats(); chunks by source and tenant
+                chunk_keys = [("chunks", "''"), ("tenant", "metadata->>'tenant'")]
+                if self.storage_mode == "normalized":
+                    install_row_counters(
+                        cur, self.sources_table, self.stats_table,
+                        [("documents", "''"), ("source", "source")]
+                    )
+                else:
+                    chunk_keys.append(("source", "source"))
+                install_row_counters(
+                    cur, self.chunks_table, self.stats_table, chunk_keys
+                )
 
                 conn.commit()
-                print("Database setup complete!")
         finally:
             conn.close()
 
+    def _setup_inline_table(self, cur):
+        """Create the table that stores every chunk's text."""
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                id SERIAL PRIMARY KEY,
+                content TEXT NOT NULL,
+                source VARCHAR(500),
+                chunk_index INTEGER,
+                token_count INTEGER,
+                metadata JSONB DEFAULT '{{}}'::jsonb,
+                embedding VECTOR(1536),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Upgrade tables created before token counts were stored
+        cur.execute(f"""
+            ALTER TABLE {self.table_name}
+            ADD COLUMN IF NOT EXISTS token_count INTEGER
+        """)
+
+        # Create index for fast similarity search
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS {self.table_name}_embedding_idx
+            ON {self.table_name}
+            USING ivfflat (embedding vector_cosine_ops)
+            WITH (lists = 100)
+        """)
+
+        # Full-text index for exact identifiers in hybrid search
+        cur.execute(f"""
+            ALTER TABLE {self.table_name}
+            ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR
+                GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+        """)
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS {self.table_name}_content_tsv_idx
+            ON {self.table_name}
+            USING gin (content_tsv)
+        """)
+
+    def _setup_normalized_tables(self, cur):
+        """Create the source-text and chunk-offset tables."""
+        # Source text is stored once; TOAST compresses large values
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.sources_table} (
+                id SERIAL PRIMARY KEY,
+                source VARCHAR(500),
+                content TEXT NOT NULL,
+                metadata JSONB DEFAULT '{{}}'::jsonb,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # lz4 compresses and decompresses faster than the default pglz.
+        # It needs PostgreSQL 14+ built with lz4; other servers keep pglz.
+        cur.execute("SAVEPOINT source_compression")
+        try:
+            cur.execute(f"""
+                ALTER TABLE {self.sources_table}
+                ALTER COLUMN content SET COMPRESSION lz4
+            """)
+        except psycopg2.Error:
+            cur.execute("ROLLBACK TO SAVEPOINT source_compression")
+        cur.execute("RELEASE SAVEPOINT source_compression")
+
+        # Chunks hold offsets into the source text instead of a copy
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.chunks_table} (
+                id SERIAL PRIMARY KEY,
+                document_id INTEGER NOT NULL
+                    REFERENCES {self.sources_table}(id) ON DELETE CASCADE,
+                chunk_index INTEGER NOT NULL,
+                start_offset INTEGER NOT NULL,
+                end_offset INTEGER NOT NULL,
+                token_count INTEGER,
+                metadata JSONB DEFAULT '{{}}'::jsonb,
+                embedding VECTOR(1536),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (document_id, chunk_index)
+            )
+        """)
+
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS {self.chunks_table}_embedding_idx
+            ON {self.chunks_table}
+            USING ivfflat (embedding vector_cosine_ops)
+            WITH (lists = 100)
+        """)
+
     def chunk_text(self, text: str) -> List[str]:
         """
         Split text into overlapping chunks.
@@ -140,11 +474,21 @@ class RAGSystem:
         Uses smart chunking that respects natural boundaries like
         paragraphs and sentences.
         """
-        chunks = []
+        text = text.strip()
+        return [text[start:end] for start, end in self.chunk_spans(text)]
+
+    def chunk_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Compute chunk boundaries as (start, end) character offsets.
+
+        Offsets refer to text.strip(), which is what normalized storage
+        keeps as the source text.
+        """
+        spans = []
         text = text.strip()
 
         if len(text) <= self.chunk_size:
-            return [text]
+            return [(0, len(text))]
 
         start = 0
         while start < len(text):
@@ -164,22 +508,53 @@ class RAGSystem:
                             end = sent_break + len(sep)
                             break
 
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
+            # Trim surrounding whitespace from the span
+            chunk = text[start:end]
+            stripped = chunk.strip()
+            if stripped:
+                chunk_start = start + len(chunk) - len(chunk.lstrip())
+                spans.append((chunk_start, chunk_start + len(stripped)))
 
             # Move to next chunk with overlap
             start = max(start + 1, end - self.chunk_overlap)
 
-        return chunks
+        return spans
+
+    def get_embedding(
+        self,
+        text: str,
+        model: str = None,
+        dimensions: Optional[int] = None
+    ) -> List[float]:
+        """
+        Generate embedding for a text string.
 
-    def get_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a text string."""
+        Uses the model of the active embedding column unless a model
+        is given.
+        """
+        return self.get_embeddings_batch([text], model, dimensions)[0]
+
+    def get_embeddings_batch(
+        self,
+        texts: List[str],
+        model: str = None,
+        dimensions: Optional[int] = None
+    ) -> List[List[float]]:
+        """Generate embeddings for multiple texts in one API call."""
+        if model is None:
+            _, model, dimensions = self._active_embedding()
+        options = {"dimensions": dimensions} if dimensions else {}
         response = client.embeddings.create(
-            input=text,
-            model=self.embedding_model
+            input=texts,
+            model=model,
+            **options
         )
-        return response.data[0].embedding
+        return [item.embedding for item in response.data]
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        """Split text into sentences, dropping empty fragments."""
+        return [s.strip() for s in SENTENCE_SPLIT.split(text) if s.strip()]
 
     def add_document(
         self,
@@ -191,35 +566,105 @@ class RAGSystem:
         Add a document to the knowledge base.
 
         The document will be chunked and each chunk will be stored
-        with its embedding.
+        with its embedding. With compress_context enabled, the
+        sentences of each chunk are embedded and cached as well.
+
+        With shards configured, the document goes to the shard picked
+        by hashing its source (or its text when there is no source).
+
+        In normalized storage mode, the source text is stored once and
+        each chunk only records its character offsets into it.
+
+        With deduplicate enabled, chunks matching an existing chunk are
+        stored with a canonical_id reference and no embedding, so they
+        cost no API call and add nothing to the vector index.
 
         Returns the number of chunks created.
         """
-        chunks = self.chunk_text(content)
+        text = content.strip()
+        spans = self.chunk_spans(text)
 
-        conn = self.get_connection()
+        # Fill every vector column in use, including one being migrated to
+        vector_columns = self._embedding_columns()
+        column_list = ", ".join(column for column, _, _ in vector_columns)
+        placeholders = ", ".join(["%s"] * len(vector_columns))
+
+        # Keep all chunks of a document on one shard
+        shard = self.shard_for(source or text)
+        conn = self.get_connection(shard)
         try:
             with conn.cursor() as cur:
-                for idx, chunk in enumerate(chunks):
-                    embedding = self.get_embedding(chunk)
-
+                document_id = None
+                if self.storage_mode == "normalized":
                     cur.execute(f"""
-                        INSERT INTO {self.table_name}
-                        (content, source, chunk_index, metadata, embedding)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (
-                        chunk,
-                        source,
-                        idx,
-                        psycopg2.extras.Json(metadata or {}),
-                        embedding
-                    ))
-
-                conn.commit()
+                        INSERT INTO {self.sources_table}
+                        (source, content, metadata)
+                        VALUES (%s, %s, %s)
+                        RETURNING id
+                    """, (source, text, psycopg2.extras.Json(metadata or {})))
+                    document_id = cur.fetchone()[0]
+
+                for idx, (start, end) in enumerate(spans):
+                    chunk = text[start:end]
+
+                    signature = canonical_id = None
+                    if self.deduplicate:
+                        signature = content_signature(chunk)
+                        canonical_id = self._find_canonical(cur, signature)
+                    if canonical_id is None:
+                        embeddings = [
+                            self.get_embedding(chunk, model, dimensions)
+                            for _, model, dimensions in vector_columns
+                        ]
+                    else:
+                        embeddings = [None] * len(vector_columns)
+
+                    if self.storage_mode == "normalized":
+                        cur.execute(f"""
+                            INSERT INTO {self.chunks_table}
+                            (document_id, chunk_index, start_offset,
+                             end_offset, token_count, metadata,
+                             canonical_id, {column_list})
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, {placeholders})
+                            RETURNING id
+                        """, [
+                            document_id,
+                            idx,
+                            start,
+                            end,
+                            count_tokens(chunk),
+                            psycopg2.extras.Json(metadata or {}),
+                            canonical_id
+                        ] + embeddings)
+                    else:
+                        cur.execute(f"""
+                            INSERT INTO {self.table_name}
+                            (content, source, chunk_index, token_count,
+                             metadata, canonical_id, {column_list})
+                            VALUES (%s, %s, %s, %s, %s, %s, {placeholders})
+                            RETURNING id
+                        """, [
+                            chunk,
+                            source,
+                            idx,
+                            count_tokens(chunk),
+                            psycopg2.extras.Json(metadata or {}),
+                            canonical_id
+                        ] + embeddings)
+                    chunk_id = cur.fetchone()[0]
+
+                    if canonical_id is not None:
+                        continue
+                    if signature is not None:
+                        self._store_signature(cur, chunk_id, signature)
+                    if self.compress_context:
+                        self._store_sentences(cur, chunk_id, chunk)
+
+                self._commit(conn, shard)
         finally:
             conn.close()
 
-        return len(chunks)
+        return len(spans)
 
     def add_documents(self, documents: List[Document]) -> int:
         """Add multiple documents to the knowledge base."""
@@ -233,47 +678,505 @@ class RAGSystem:
             total_chunks += chunks
         return total_chunks
 
-    def retrieve(self, query: str) -> List[RetrievedChunk]:
+    def _store_sentences(self, cur, chunk_id: int, chunk: str):
+        """Embed the sentences of a chunk and cache them."""
+        sentences = self.split_sentences(chunk)
+        if not sentences:
+            return
+        # Sentence vectors always use the model the system was built with
+        embeddings = self.get_embeddings_batch(
+            sentences, model=self.embedding_model
+        )
+        psycopg2.extras.execute_values(
+            cur,
+            f"""
+                INSERT INTO {self.sentences_table}
+                (chunk_id, sentence_index, content, embedding)
+                VALUES %s
+            """,
+            [
+                (chunk_id, idx, sentence, embedding)
+                for idx, (sentence, embedding)
+                in enumerate(zip(sentences, embeddings))
+            ],
+            template="(%s, %s, %s, %s::vector)"
+        )
+
+    def retrieve(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]] = None,
+        embedding_column: Optional[str] = None
+    ) -> List[RetrievedChunk]:
+        """
+        Retrieve relevant chunks for a query.
+
+        See _retrieve, which also returns the shards that were skipped.
+        """
+        return self._retrieve(query, query_embedding, embedding_column)[0]
+
+    def _retrieve(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]] = None,
+        embedding_column: Optional[str] = None
+    ) -> Tuple[List[RetrievedChunk], List[int]]:
         """
         Retrieve relevant chunks for a query.
 
         Uses semantic similarity search to find the most relevant
-        document chunks.
+        document chunks. Pass query_embedding to reuse an embedding
+        that was already computed for the query. With use_mmr enabled,
+        mmr_fetch_k candidates are fetched with their vectors and
+        reranked with MMR down to top_k. In normalized storage mode the
+        chunk text is rebuilt from its offsets, widened by
+        neighbor_chunks on each side, and hits whose text overlaps are
+        merged into one passage.
+
+        The active embedding column is searched unless embedding_column
+        names the column query_embedding was computed for. With shards
+        configured, all shards are searched in parallel and their top
+        results merged.
+
+        With use_hybrid, identifier-like query terms are first looked up
+        in the full-text index. If the index returns every matching chunk
+        (fewer than lexical_k per shard), the match is selective and only
+        those chunks are ranked, without an ANN scan. Otherwise vector
+        search runs as well. Both rankings are combined with Reciprocal
+        Rank Fusion.
+
+        Returns:
+            (chunks, failed_shards): failed_shards lists the shards left
+            out of the results (see allow_partial_results)
         """
-        query_embedding = self.get_embedding(query)
+        column = embedding_column
+        if column is None:
+            column, model, dimensions = self._active_embedding()
+            if query_embedding is None:
+                query_embedding = self.get_embedding(query, model, dimensions)
+        elif query_embedding is None:
+            query_embedding = self.get_embedding(query)
+
+        if self.use_mmr:
+            limit = max(self.mmr_fetch_k, self.top_k)
+            vector_column = f",\n                            {column}::real[]"
+        else:
+            limit = self.top_k
+            vector_column = ""
+
+        def search_shard(shard: int) -> List[tuple]:
+            timeout = self.shard_timeout if self.shard_dsns else None
+            conn = self.get_read_connection(shard, timeout)
+            try:
+                with conn.cursor() as cur:
+                    if self.storage_mode == "normalized":
+                        return self._normalized_retrieve(
+                            cur, query_embedding, column, limit
+                        )
+                    else:
+                        cur.execute(f"""
+                            SELECT
+                                content,
+                                source,
+                                1 - ({column} <=> %s::vector) as similarity,
+                                chunk_index,
+                                token_count,
+                                id{vector_column}
+                            FROM {self.table_name}
+                            WHERE 1 - ({column} <=> %s::vector) >= %s
+                            ORDER BY {column} <=> %s::vector
+                            LIMIT %s
+                        """, (
+                            query_embedding,
+                            query_embedding,
+                            self.similarity_threshold,
+                            query_embedding,
+                            limit
+                        ))
+                    return cur.fetchall()
+            finally:
+                conn.close()
+
+        keywords = keyword_query(query) if self.use_hybrid else None
+        lexical_rows, selective, failed_shards = [], False, []
+        if keywords:
+            lexical_rows, selective, failed_shards = self._lexical_candidates(
+                keywords, query_embedding, column, vector_column
+            )
 
-        conn = self.get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(f"""
-                    SELECT
-                        content,
-                        source,
-                        1 - (embedding <=> %s::vector) as similarity
-                    FROM {self.table_name}
-                    WHERE 1 - (embedding <=> %s::vector) >= %s
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                """, (
-                    query_embedding,
-                    query_embedding,
-                    self.similarity_threshold,
-                    query_embedding,
-                    self.top_k
-                ))
-
-                results = [
-                    RetrievedChunk(
-                        content=row[0],
-                        source=row[1],
-                        similarity=float(row[2])
-                    )
-                    for row in cur.fetchall()
-                ]
-        finally:
-            conn.close()
+        if selective and lexical_rows:
+            # Every keyword hit is known: rank them without an ANN scan
+            rows = self._fuse_hybrid(lexical_rows, [], limit)
+        else:
+            # Each shard returns its own top rows; merge them by similarity
+            shard_rows, failed = self._scatter(search_shard)
+            failed_shards = sorted(set(failed_shards) | set(failed))
+            rows = list(islice(
+                heapq.merge(*shard_rows, key=lambda row: -row[2]),
+                limit
+            ))
+            if lexical_rows:
+                rows = self._fuse_hybrid(lexical_rows, rows, limit)
+
+        if self.use_mmr and len(rows) > self.top_k:
+            order = mmr_select(
+                np.asarray(query_embedding, dtype=np.float32),
+                np.asarray([row[6] for row in rows], dtype=np.float32),
+                self.top_k,
+                self.mmr_lambda
+            )
+            rows = [rows[i] for i in order]
+
+        chunks = [
+            RetrievedChunk(
+                content=row[0],
+                source=row[1],
+                similarity=float(row[2]),
+                chunk_index=row[3] or 0,
+                token_count=row[4] or count_tokens(row[0]),
+                chunk_id=row[5]
+            )
+            for row in rows
+        ]
+        return chunks, failed_shards
+
+    def _lexical_candidates(
+        self,
+        keywords: str,
+        query_embedding: List[float],
+        column: str,
+        vector_column: str
+    ) -> Tuple[List[tuple], bool, List[int]]:
+        """
+        Find chunks matching a keyword query through the full-text index.
+
+        Rows are shaped like vector search rows with the text rank
+        appended, best text rank first; at most lexical_k per shard, all
+        above similarity_threshold. Also returns whether the rows are
+        every match (all shards answered and none had more than
+        lexical_k) and the shards that did not answer.
+        """
+        timeout = self.shard_timeout if self.shard_dsns else None
+
+        def search_shard(shard: int) -> List[tuple]:
+            conn = self.get_read_connection(shard, timeout)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT
+                            content,
+                            source,
+                            1 - ({column} <=> %s::vector) as similarity,
+                            chunk_index,
+                            token_count,
+                            id{vector_column},
+                            ts_rank_cd(content_tsv, keywords) AS text_rank
+                        FROM {self.table_name},
+                             websearch_to_tsquery('english', %s) AS keywords
+                        WHERE content_tsv @@ keywords
+                          AND 1 - ({column} <=> %s::vector) >= %s
+                        ORDER BY text_rank DESC
+                        LIMIT %s
+                    """, (
+                        query_embedding,
+                        keywords,
+                        query_embedding,
+                        self.similarity_threshold,
+                        self.lexical_k + 1
+                    ))
+                    return cur.fetchall()
+            finally:
+                conn.close()
+
+        # One extra row per shard tells a complete match from a truncated one
+        results, failed_shards = self._scatter(search_shard)
+        complete = not failed_shards and all(
+            len(rows) <= self.lexical_k for rows in results
+        )
+        rows = [row for shard_rows in results
+                for row in shard_rows[:self.lexical_k]]
+        return sorted(rows, key=lambda row: -row[-1]), complete, failed_shards
+
+    @staticmethod
+    def _fuse_hybrid(
+        lexical_rows: List[tuple],
+        vector_rows: List[tuple],
+        limit: int,
+        k: int = 60
+    ) -> List[tuple]:
+        """
+        Combine keyword and vector rankings with Reciprocal Rank Fusion.
+
+        Keyword hits are ranked by text rank, and every candidate by
+        similarity; each ranking adds 1 / (k + rank) to a chunk's score.
+        The text rank column is dropped from the returned rows.
+        """
+        candidates = {row[5]: row[:-1] for row in lexical_rows}
+        for row in vector_rows:
+            candidates.setdefault(row[5], row)
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for rank, row in enumerate(lexical_rows, 1):
+            scores[row[5]] += 1.0 / (k + rank)
+        by_similarity = sorted(candidates.values(), key=lambda row: -row[2])
+        for rank, row in enumerate(by_similarity, 1):
+            scores[row[5]] += 1.0 / (k + rank)
+
+        return sorted(
+            candidates.values(),
+            key=lambda row: -scores[row[5]]
+        )[:limit]
+
+    def _normalized_retrieve(
+        self,
+        cur,
+        query_embedding: List[float],
+        column: str,
+        limit: int
+    ) -> List[tuple]:
+        """
+        Run the similarity search against offset-based chunks.
+
+        Returns rows shaped like the inline query. The chunk text is
+        sliced out of the source text, spanning the neighboring chunks
+        when neighbor_chunks is set, and hits whose text overlaps are
+        merged by _merge_passages().
+        """
+        vector_column = ",\n                c.embedding::real[]" if self.use_mmr else ""
+        # Stored token counts only describe the unwidened chunk
+        token_column = "NULL::integer" if self.neighbor_chunks else "c.token_count"
+
+        cur.execute(f"""
+            SELECT
+                substr(d.content, s.start_offset + 1,
+                       s.end_offset - s.start_offset) AS content,
+                d.source,
+                c.similarity,
+                c.chunk_index,
+                {token_column},
+                c.id{vector_column},
+                c.document_id,
+                s.start_offset,
+                s.end_offset
+            FROM (
+                SELECT
+                    id,
+                    document_id,
+                    chunk_index,
+                    token_count,
+                    {column} AS embedding,
+                    1 - ({column} <=> %s::vector) AS similarity
+                FROM {self.chunks_table}
+                WHERE 1 - ({column} <=> %s::vector) >= %s
+                ORDER BY {column} <=> %s::vector
+                LIMIT %s
+            ) c
+            JOIN {self.sources_table} d ON d.id = c.document_id
+            CROSS JOIN LATERAL (
+                SELECT
+                    MIN(n.start_offset) AS start_offset,
+                    MAX(n.end_offset) AS end_offset
+                FROM {self.chunks_table} n
+                WHERE n.document_id = c.document_id
+                  AND n.chunk_index BETWEEN c.chunk_index - %s
+                                        AND c.chunk_index + %s
+            ) s
+            ORDER BY c.similarity DESC
+        """, (
+            query_embedding,
+            query_embedding,
+            self.similarity_threshold,
+            query_embedding,
+            limit,
+            self.neighbor_chunks,
+            self.neighbor_chunks
+        ))
+        return self._merge_passages(cur.fetchall())
+
+    @staticmethod
+    def _merge_passages(rows: List[tuple]) -> List[tuple]:
+        """
+        Merge hits whose text overlaps or touches within one source text.
+
+        Rows end with document_id, start_offset and end_offset. Widened
+        neighbouring hits share whole chunks, more than pack_context()
+        can strip, so each run of overlapping spans becomes one passage
+        stitched together at its offsets. A passage keeps the similarity,
+        chunk index, id and vector of its best hit. Returns rows without
+        the offset columns, most similar first.
+        """
+        passages = []
+        for row in sorted(rows, key=lambda row: (row[-3], row[-2])):
+            *fields, document_id, start, end = row
+            last = passages[-1] if passages else None
+            if last is None or last['document_id'] != document_id or start > last['end']:
+                passages.append({
+                    'document_id': document_id,
+                    'end': end,
+                    'text': fields[0],
+                    'best': fields,
+                    'merged': False
+                })
+                continue
+            if end > last['end']:
+                last['text'] += fields[0][last['end'] - start:]
+                last['end'] = end
+            if fields[2] > last['best'][2]:
+                last['best'] = fields
+            last['merged'] = True
+
+        merged = []
+        for passage in passages:
+            fields = list(passage['best'])
+            fields[0] = passage['text']
+            if passage['merged']:
+                # Recounted from the text later
+                fields[4] = None
+            merged.append(tuple(fields))
+        return sorted(merged, key=lambda row: -row[2])
+
+    def compress_chunks(
+        self,
+        query_embedding: List[float],
+        chunks: List[RetrievedChunk]
+    ) -> List[RetrievedChunk]:
+        """
+        Keep only the sentences most similar to the query.
 
-        return results
+        Scores every cached sentence of the retrieved chunks against the
+        query embedding in one matrix product, keeps the best
+        max_context_sentences, and rebuilds each chunk from its kept
+        sentences in their original order. Chunks without cached
+        sentences are returned unchanged.
+        """
+        chunk_ids = [c.chunk_id for c in chunks if c.chunk_id is not None]
+        if not chunk_ids:
+            return chunks
+
+        def load_sentences(shard: int) -> List[tuple]:
+            shard_ids = [i for i in chunk_ids if self.shard_of_id(i) == shard]
+            if not shard_ids:
+                return []
+            conn = self.get_read_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT chunk_id, sentence_index, content, embedding::real[]
+                        FROM {self.sentences_table}
+                        WHERE chunk_id = ANY(%s)
+                        ORDER BY chunk_id, sentence_index
+                    """, (shard_ids,))
+                    return cur.fetchall()
+            finally:
+                conn.close()
+
+        rows = [row for shard_rows in self._scatter(load_sentences)[0]
+                for row in shard_rows]
+
+        if not rows:
+            return chunks
+
+        matrix = np.asarray([row[3] for row in rows], dtype=np.float32)
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vec)
+        scores = matrix @ query_vec / np.maximum(norms, 1e-12)
+
+        # Best-scoring sentences first; overlapping chunks repeat sentences
+        kept = {}
+        seen = set()
+        for i in np.argsort(-scores):
+            chunk_id, sentence_index, content = rows[i][:3]
+            if content in seen:
+                continue
+            seen.add(content)
+            kept.setdefault(chunk_id, []).append(sentence_index)
+            if len(seen) >= self.max_context_sentences:
+                break
+
+        sentences = {(row[0], row[1]): row[2] for row in rows}
+        cached_ids = {row[0] for row in rows}
+        compressed = []
+        for chunk in chunks:
+            if chunk.chunk_id not in cached_ids:
+                compressed.append(chunk)
+                continue
+            if chunk.chunk_id not in kept:
+                continue
+            content = " ".join(
+                sentences[(chunk.chunk_id, idx)]
+                for idx in sorted(kept[chunk.chunk_id])
+            )
+            compressed.append(RetrievedChunk(
+                content=content,
+                source=chunk.source,
+                similarity=chunk.similarity,
+                chunk_index=chunk.chunk_index,
+                token_count=count_tokens(content),
+                chunk_id=chunk.chunk_id
+            ))
+        return compressed
+
+    @staticmethod
+    def _strip_overlap(previous: str, current: str, max_overlap: int) -> str:
+        """Remove the prefix of `current` that repeats the end of `previous`."""
+        limit = min(len(previous), len(current), max_overlap)
+        # Ignore tiny matches such as a shared trailing period
+        for size in range(limit, min(limit, 8) - 1, -1):
+            if previous.endswith(current[:size]):
+                return current[size:].lstrip()
+        return current
+
+    def pack_context(
+        self,
+        chunks: List[RetrievedChunk]
+    ) -> List[RetrievedChunk]:
+        """
+        Fit retrieved chunks into the context token budget.
+
+        Chunks are taken in order of similarity until the budget is
+        full. Consecutive chunks from the same source are then merged
+        into one passage with their overlapping text removed.
+        """
+        selected = []
+        used_tokens = 0
+        for chunk in sorted(chunks, key=lambda c: c.similarity, reverse=True):
+            tokens = chunk.token_count or count_tokens(chunk.content)
+            if (self.context_token_budget is not None
+                    and used_tokens + tokens > self.context_token_budget):
+                continue
+            selected.append(chunk)
+            used_tokens += tokens
+
+        # Merge runs of consecutive chunk_index values per source
+        ordered = sorted(
+            selected,
+            key=lambda c: (c.source or "", c.chunk_index)
+        )
+        packed = []
+        for chunk in ordered:
+            last = packed[-1] if packed else None
+            if (last is not None
+                    and last.source == chunk.source
+                    and chunk.chunk_index == last.chunk_index + 1):
+                tail = self._strip_overlap(
+                    last.content,
+                    chunk.content,
+                    self.chunk_overlap + 1
+                )
+                # An overlap-free join is simply a paragraph break
+                separator = " " if tail != chunk.content else "\n\n"
+                packed[-1] = RetrievedChunk(
+                    content=f"{last.content}{separator}{tail}" if tail else last.content,
+                    source=last.source,
+                    similarity=max(last.similarity, chunk.similarity),
+                    chunk_index=chunk.chunk_index,
+                    token_count=last.token_count + count_tokens(tail)
+                )
+            else:
+                packed.append(chunk)
+
+        packed.sort(key=lambda c: c.similarity, reverse=True)
+        return packed
 
     def generate_answer(
         self,
@@ -288,9 +1191,9 @@ class RAGSystem:
         if not context_chunks:
             return "I don't have enough information to answer this question."
 
-        # Format context
+        # Format context, dropping duplicated overlap and excess chunks
         context_parts = []
-        for chunk in context_chunks:
+        for chunk in self.pack_context(context_chunks):
             source = chunk.source or "Unknown"
             context_parts.append(f"[Source: {source}]\n{chunk.content}")
 
@@ -339,9 +1242,23 @@ Please provide a helpful answer based on the context above. Cite sources when ap
             - answer: The generated answer
             - sources: List of sources used
             - chunks_retrieved: Number of chunks retrieved
+            - failed_shards: Shards left out of the search
         """
         # Retrieve relevant context
-        chunks = self.retrieve(question)
+        column, model, dimensions = self._active_embedding()
+        query_embedding = self.get_embedding(question, model, dimensions)
+        chunks, failed_shards = self._retrieve(
+            question,
+            query_embedding=query_embedding,
+            embedding_column=column
+        )
+        if self.compress_context:
+            # Cached sentence vectors use the original embedding model
+            if model != self.embedding_model or dimensions:
+                query_embedding = self.get_embedding(
+                    question, model=self.embedding_model
+                )
+            chunks = self.compress_chunks(query_embedding, chunks)
 
         # Generate answer
         answer = self.generate_answer(question, chunks)
@@ -353,28 +1270,150 @@ Please provide a helpful answer based on the context above. Cite sources when ap
                 {'source': c.source, 'similarity': round(c.similarity, 3)}
                 for c in chunks
             ],
-            'chunks_retrieved': len(chunks)
+            'chunks_retrieved': len(chunks),
+            'failed_shards': failed_shards
         }
 
     def clear_knowledge_base(self):
-        """Clear all documents from the knowledge base."""
-        conn = self.get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(f"TRUNCATE {self.table_name} RESTART IDENTITY")
-                conn.commit()
-        finally:
-            conn.close()
+        """Clear all documents from the knowledge base (every shard)."""
+        for shard in range(self.shard_count):
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    tables = self.chunks_table
+                    if self.sources_table:
+                        tables += f", {self.sources_table}"
+                    cur.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+                    self._commit(conn, shard)
+            finally:
+                conn.close()
+
+    def get_stats(self) -> Dict:
+        """
+        Corpus statistics that stay cheap however large the corpus gets.
+
+        Exact counts come from the trigger-maintained counters table,
+        the estimate and sizes from the system catalog, so nothing scans
+        the chunk table. Chunks are grouped by source and by
+        their 'tenant' metadata value; in normalized storage by_source
+        counts source documents instead.
+
+        Returns:
+            {'chunks', 'estimated_chunks', 'by_source', 'by_tenant',
+             'table_bytes', 'index_bytes', 'last_ingest'}, plus
+            'documents' in normalized storage
+        """
+        stats = {
+            'chunks': 0,
+            'estimated_chunks': 0,
+            'by_source': {},
+            'by_tenant': {},
+            'table_bytes': 0,
+            'index_bytes': 0,
+            'last_ingest': None
+        }
+        if self.storage_mode == "normalized":
+            stats['documents'] = 0
+        for shard in range(self.shard_count):
+            conn = self.get_read_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT scope, key, SUM(row_count)::bigint, MAX(last_ingest)
+                        FROM {self.stats_table}
+                        GROUP BY scope, key
+                    """)
+                    for scope, key, count, last_ingest in cur.fetchall():
+                        if scope in stats:
+                            stats[scope] += count
+                        elif count:
+                            group = stats[f"by_{scope}"]
+                            group[key] = group.get(key, 0) + count
+                        if last_ingest and (stats['last_ingest'] is None
+                                            or last_ingest > stats['last_ingest']):
+                            stats['last_ingest'] = last_ingest
+
+                    cur.execute("""
+                        SELECT GREATEST(reltuples, 0)::bigint,
+                               pg_table_size(oid),
+                               pg_indexes_size(oid)
+                        FROM pg_class
+                        WHERE oid = %s::regclass
+                    """, (self.chunks_table,))
+                    estimated, table_bytes, index_bytes = cur.fetchone()
+                    stats['estimated_chunks'] += estimated
+                    stats['table_bytes'] += table_bytes
+                    stats['index_bytes'] += index_bytes
+            finally:
+                conn.close()
+        return stats
 
     def get_document_count(self) -> int:
         """Get the total number of chunks in the knowledge base."""
-        conn = self.get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(f"SELECT COUNT(*) FROM {self.table_name}")
-                return cur.fetchone()[0]
-        finally:
-            conn.close()
+        total = 0
+        for shard in range(self.shard_count):
+            conn = self.get_read_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT COALESCE(SUM(row_count), 0)
+                        FROM {self.stats_table}
+                        WHERE scope = 'chunks'
+                    """)
+                    total += cur.fetchone()[0]
+            finally:
+                conn.close()
+        return total
+
+    # ------------------------------------------------------------------
+    # Embedding model migration
+    # ------------------------------------------------------------------
+
+    def _text_query(self) -> str:
+        """SELECT returning (id, text) for every chunk, aliased as c."""
+        if self.storage_mode == "normalized":
+            return f"""
+                SELECT c.id,
+                       substr(d.content, c.start_offset + 1,
+                              c.end_offset - c.start_offset)
+                FROM {self.chunks_table} c
+                JOIN {self.sources_table} d ON d.id = c.document_id
+            """
+        return f"SELECT c.id, c.content FROM {self.table_name} c"
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def _snapshot_fields(self) -> List[Tuple[str, str]]:
+        """(column, kind) pairs saved in a snapshot, besides the embedding."""
+        return [
+            ("id", "int"),
+            ("content", "text"),
+            ("source", "text"),
+            ("chunk_index", "int"),
+            ("token_count", "int"),
+            ("metadata", "jsonb"),
+            ("canonical_id", "int"),
+            ("created_at", "timestamp"),
+        ]
+
+    def export_snapshot(self, path: str, batch_size: int = 10000) -> int:
+        """Export inline-stored chunks; see PgVectorStore.export_snapshot()."""
+        if self.storage_mode != "inline":
+            raise ValueError("Snapshots support inline storage only")
+        return super().export_snapshot(path, batch_size)
+
+    def import_snapshot(self, path: str) -> int:
+        """
+        Import chunks into inline storage; see PgVectorStore.import_snapshot().
+
+        Cached sentences for compress_context are not part of a snapshot;
+        such chunks are sent to the LLM uncompressed.
+        """
+        if self.storage_mode != "inline":
+            raise ValueError("Snapshots support inline storage only")
+        return super().import_snapshot(path)
 
 
 def demo():
@@ -513,5 +1552,25 @@ Best practices:
         print("-" * 60)
 
 
+def benchmark_mmr(candidates: int = 100, top_k: int = 5, runs: int = 200):
+    """Time MMR reranking on random 1536-dim candidates (target: < 2 ms)."""
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(1536, dtype=np.float32)
+    vectors = rng.standard_normal((candidates, 1536), dtype=np.float32)
+
+    mmr_select(query, vectors, top_k)  # warm up
+    start = time.perf_counter()
+    for _ in range(runs):
+        mmr_select(query, vectors, top_k)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / runs
+
+    print(f"MMR over {candidates} candidates (top_k={top_k}): "
+          f"{elapsed_ms:.3f} ms per query")
+    return elapsed_ms
+
+
 if __name__ == "__main__":
-    demo()
+    if "--benchmark-mmr" in sys.argv:
+        benchmark_mmr()
+    else:
+        demo()
@@ -0,0 +1,68 @@
+"""Shared setup for the RAG example tests: no database or OpenAI calls are made."""
+
+import os
+import sys
+
+import pytest
+
+# rag_system builds an OpenAI client at import time; it is never called here
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_system import RAGSystem  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.queries.append(sql)
+        self.conn.params.append(params)
+        if "sentence_index" in sql:
+            self.rows = [r for r in self.conn.sentence_rows if r[0] in params[0]]
+        elif "ts_rank_cd" in sql:
+            self.rows = self.conn.lexical_rows[:params[-1]]
+        else:
+            self.rows = self.conn.vector_rows[:params[-1]]
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+class FakeConnection:
+    def __init__(self, lexical_rows, vector_rows):
+        self.lexical_rows = lexical_rows
+        self.vector_rows = vector_rows
+        self.sentence_rows = []
+        self.queries = []
+        self.params = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def make_system(monkeypatch):
+    """Build a hybrid RAGSystem whose searches read from a FakeConnection."""
+    def make(lexical_rows, vector_rows, **options):
+        options.setdefault("similarity_threshold", 0.0)
+        system = RAGSystem(use_hybrid=True, **options)
+        conn = FakeConnection(lexical_rows, vector_rows)
+        monkeypatch.setattr(system, "get_read_connection", lambda *args: conn)
+        monkeypatch.setattr(
+            system, "_active_embedding", lambda: ("embedding", "model", None)
+        )
+        monkeypatch.setattr(system, "get_embedding", lambda *args: [1.0, 0.0])
+        return system, conn
+    return make
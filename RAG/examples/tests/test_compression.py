@@ -0,0 +1,46 @@
+"""Tests for extractive sentence compression of retrieved chunks."""
+
+from rag_system import RetrievedChunk, count_tokens
+
+# Cached sentences: chunk id, sentence index, text, embedding.
+# Against the query [1, 0]: B scores 1.0, C 0.89, E 0.6, A and F 0.
+SENTENCES = [
+    (1, 0, "A.", [0.0, 1.0]),
+    (1, 1, "B.", [1.0, 0.0]),
+    (1, 2, "C.", [1.0, 0.5]),
+    (2, 0, "C.", [1.0, 0.5]),
+    (2, 1, "E.", [0.6, 0.8]),
+    (4, 0, "F.", [0.0, 1.0]),
+]
+
+
+def chunk(chunk_id, content):
+    return RetrievedChunk(content=content, source="doc.txt", similarity=0.8,
+                          chunk_index=chunk_id, token_count=50, chunk_id=chunk_id)
+
+
+def test_keeps_best_sentences_in_order_once(make_system):
+    system, conn = make_system([], [], compress_context=True, max_context_sentences=3)
+    conn.sentence_rows = SENTENCES
+    uncached = chunk(3, "Not split into sentences.")
+    chunks = [chunk(1, "A. B. C."), chunk(2, "C. E."), uncached, chunk(4, "F.")]
+
+    compressed = system.compress_chunks([1.0, 0.0], chunks)
+
+    # Chunk 4 kept no sentence and is dropped; chunk 3 has none cached
+    assert [c.chunk_id for c in compressed] == [1, 2, 3]
+    assert compressed[2] is uncached
+    first, second = compressed[0].content, compressed[1].content
+    assert first in ("B.", "B. C.")
+    assert second in ("E.", "C. E.")
+    # C. is in both overlapping chunks but sent only once
+    assert (first + " " + second).split().count("C.") == 1
+    assert compressed[0].token_count == count_tokens(first)
+
+
+def test_chunks_without_cached_sentences_are_unchanged(make_system):
+    system, conn = make_system([], [], compress_context=True)
+    chunks = [chunk(1, "A. B. C."), RetrievedChunk("D.", "doc.txt", 0.5, 0, 1)]
+
+    assert system.compress_chunks([1.0, 0.0], chunks) == chunks
+    assert len(conn.queries) == 1
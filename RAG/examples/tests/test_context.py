@@ -0,0 +1,55 @@
+"""Tests for packing retrieved chunks into the context token budget."""
+
+from rag_system import RAGSystem, RetrievedChunk, count_tokens
+
+
+def chunk(source, index, content, similarity, tokens=10):
+    return RetrievedChunk(content=content, source=source, similarity=similarity,
+                          chunk_index=index, token_count=tokens)
+
+
+def test_budget_keeps_most_similar_chunks():
+    system = RAGSystem(context_token_budget=20)
+    chunks = [
+        chunk("a.txt", 0, "first", 0.6),
+        chunk("b.txt", 0, "second", 0.9),
+        chunk("c.txt", 0, "third", 0.8),
+    ]
+
+    packed = system.pack_context(chunks)
+
+    assert [c.content for c in packed] == ["second", "third"]
+
+
+def test_consecutive_chunks_are_merged_without_overlap():
+    system = RAGSystem(chunk_overlap=30)
+    chunks = [
+        chunk("doc.txt", 1, "gamma delta epsilon zeta. eta theta iota.", 0.8),
+        chunk("other.txt", 4, "unrelated", 0.85),
+        chunk("doc.txt", 0, "alpha beta gamma delta epsilon zeta.", 0.9),
+    ]
+
+    packed = system.pack_context(chunks)
+
+    assert [c.source for c in packed] == ["doc.txt", "other.txt"]
+    merged = packed[0]
+    assert merged.content == "alpha beta gamma delta epsilon zeta. eta theta iota."
+    assert merged.similarity == 0.9
+    assert merged.chunk_index == 1
+    assert merged.token_count == 10 + count_tokens("eta theta iota.")
+
+
+def test_adjacent_chunks_without_overlap_join_as_paragraphs():
+    system = RAGSystem(chunk_overlap=30)
+    chunks = [
+        chunk("doc.txt", 0, "The first paragraph.", 0.9),
+        chunk("doc.txt", 1, "A second one.", 0.7),
+        chunk("doc.txt", 3, "Not adjacent.", 0.6),
+    ]
+
+    packed = system.pack_context(chunks)
+
+    assert [c.content for c in packed] == [
+        "The first paragraph.\n\nA second one.",
+        "Not adjacent.",
+    ]
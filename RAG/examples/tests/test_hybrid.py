@@ -0,0 +1,92 @@
+"""Tests for hybrid (keyword + vector) retrieval in RAGSystem.retrieve."""
+
+import rag_system
+from rag_system import RAGSystem, keyword_query
+
+
+def row(chunk_id, similarity, text_rank=None):
+    """A search row: content, source, similarity, chunk_index, token_count, id."""
+    values = (f"chunk {chunk_id}", "doc.txt", similarity, 0, 10, chunk_id)
+    return values if text_rank is None else values + (text_rank,)
+
+
+def test_keyword_query_keeps_identifiers_and_skips_acronyms():
+    assert keyword_query("Why does the API return ERR-4012?") == '"ERR-4012"'
+    assert keyword_query("Is PRO-PLAN on v2.1?") == '"PRO-PLAN" or "v2.1"'
+    assert keyword_query("How do I use the API with SQL?") is None
+
+
+def test_selective_keyword_match_skips_ann_scan(make_system):
+    lexical = [row(1, 0.6, 0.9), row(2, 0.8, 0.5)]
+    system, conn = make_system(lexical, [row(9, 0.99)], top_k=5, lexical_k=10)
+
+    chunks = system.retrieve("What is ERR-4012?")
+
+    assert len(conn.queries) == 1
+    assert {chunk.chunk_id for chunk in chunks} == {1, 2}
+
+
+def test_truncated_keyword_match_is_fused_with_vector_search(make_system):
+    # More matches than lexical_k: the keyword side is not selective
+    lexical = [row(i, 0.5, 1.0 - i / 10) for i in range(1, 5)]
+    vector = [row(9, 0.99), row(1, 0.5)]
+    system, conn = make_system(lexical, vector, top_k=4, lexical_k=3)
+
+    chunks = system.retrieve("What is ERR-4012?")
+
+    assert len(conn.queries) == 2
+    ids = [chunk.chunk_id for chunk in chunks]
+    # Chunk 1 leads both rankings; the vector-only hit still gets in
+    assert ids[0] == 1
+    assert 9 in ids
+    assert 4 not in ids
+
+
+def test_lexical_candidates_apply_similarity_threshold(make_system):
+    system, conn = make_system([row(1, 0.9, 0.5)], [], similarity_threshold=0.7)
+
+    system.retrieve("What is ERR-4012?")
+
+    assert "<=> %s::vector) >= %s" in conn.queries[0].split("WHERE")[1]
+    assert 0.7 in conn.params[0]
+
+
+def test_fuse_hybrid_rewards_agreement():
+    lexical = [row(1, 0.2, 0.9), row(2, 0.96, 0.8)]
+    vector = [row(2, 0.96), row(3, 0.95)]
+
+    fused = RAGSystem._fuse_hybrid(lexical, vector, limit=3)
+
+    # 2 is near the top of both rankings, 3 only of the vector one
+    assert [r[5] for r in fused] == [2, 1, 3]
+    assert all(len(r) == 6 for r in fused)
+
+
+def test_fuse_hybrid_keeps_chunks_found_by_one_ranking_only():
+    lexical = [row(1, 0.5, 0.9)]
+    vector = [row(2, 0.9), row(3, 0.4)]
+
+    fused = RAGSystem._fuse_hybrid(lexical, vector, limit=2)
+
+    # 1 has both a keyword and a similarity rank; 2 only a similarity rank
+    assert fused == [row(1, 0.5), row(2, 0.9)]
+
+
+def test_fuse_hybrid_ties_keep_keyword_order():
+    # 1 ranks first by keywords and 2 by similarity: equal scores
+    lexical = [row(1, 0.5, 0.9), row(2, 0.9, 0.5)]
+
+    fused = RAGSystem._fuse_hybrid(lexical, [], limit=5)
+
+    assert [r[5] for r in fused] == [1, 2]
+
+
+def test_plain_questions_use_vector_search_only(make_system):
+    system, conn = make_system([row(1, 0.9, 0.5)], [row(7, 0.9)])
+
+    chunks = system.retrieve("How do refunds work?")
+
+    assert len(conn.queries) == 1
+    assert "ts_rank_cd" not in conn.queries[0]
+    assert [chunk.chunk_id for chunk in chunks] == [7]
+    assert rag_system.keyword_query("How do refunds work?") is None
@@ -0,0 +1,54 @@
+"""Tests for Maximal Marginal Relevance reranking."""
+
+import numpy as np
+
+from rag_system import mmr_select
+
+QUERY = np.array([1.0, 0.0])
+# Two near-identical candidates close to the query, and a less similar one
+CANDIDATES = np.array([[1.0, 0.2], [1.0, 0.25], [1.0, -0.6]])
+
+
+def row(chunk_id, similarity, vector, text_rank=None):
+    """A search row with its vector: content, source, similarity, chunk_index, token_count, id, embedding."""
+    values = (f"chunk {chunk_id}", "doc.txt", similarity, 0, 10, chunk_id, vector)
+    return values if text_rank is None else values + (text_rank,)
+
+
+def test_mmr_skips_near_duplicates():
+    assert mmr_select(QUERY, CANDIDATES, k=2) == [0, 2]
+
+
+def test_mmr_with_lambda_one_is_plain_relevance():
+    assert mmr_select(QUERY, CANDIDATES, k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_mmr_handles_edge_cases():
+    assert mmr_select(QUERY, np.empty((0, 2)), k=3) == []
+    assert mmr_select(QUERY, CANDIDATES, k=0) == []
+    assert sorted(mmr_select(QUERY, CANDIDATES, k=10)) == [0, 1, 2]
+
+
+def test_retrieve_reranks_vector_results(make_system):
+    vector = [row(i + 1, s, v) for i, (s, v) in enumerate(zip((0.98, 0.97, 0.86), CANDIDATES.tolist()))]
+    system, conn = make_system([], vector, use_mmr=True, top_k=2, mmr_fetch_k=20)
+
+    chunks = system.retrieve("How do refunds work?")
+
+    assert [chunk.chunk_id for chunk in chunks] == [1, 3]
+    assert "embedding::real[]" in conn.queries[0]
+    assert conn.params[0][-1] == 20
+
+
+def test_retrieve_reranks_hybrid_results(make_system):
+    lexical = [
+        row(i + 1, s, v, rank)
+        for i, (s, v, rank) in enumerate(zip((0.98, 0.97, 0.86), CANDIDATES.tolist(), (0.9, 0.8, 0.1)))
+    ]
+    system, conn = make_system(lexical, [], use_mmr=True, top_k=2)
+
+    chunks = system.retrieve("What is ERR-4012?")
+
+    # A selective keyword match: no ANN scan, then MMR over the keyword hits
+    assert len(conn.queries) == 1
+    assert [chunk.chunk_id for chunk in chunks] == [1, 3]
@@ -0,0 +1,48 @@
+"""Tests for merging offset-based hits in normalized storage mode."""
+
+from rag_system import RAGSystem
+
+SOURCE = "".join(f"[chunk {i}]" for i in range(10))
+SPAN = len("[chunk 0]")
+
+
+def hit(chunk_id, similarity, first, last, document_id=1, text=SOURCE):
+    """A normalized row for chunks first..last of a document, widened around chunk_id."""
+    start, end = first * SPAN, (last + 1) * SPAN
+    return (text[start:end], "doc.txt", similarity, chunk_id, 7, chunk_id,
+            document_id, start, end)
+
+
+def test_overlapping_windows_become_one_passage():
+    # Hits on chunks 2 and 4, each widened by one chunk, share chunk 3
+    rows = [hit(4, 0.9, 3, 5), hit(2, 0.8, 1, 3)]
+
+    merged = RAGSystem._merge_passages(rows)
+
+    assert merged == [(SOURCE[SPAN:6 * SPAN], "doc.txt", 0.9, 4, None, 4)]
+    assert merged[0][0].count("[chunk 3]") == 1
+
+
+def test_touching_windows_are_joined_and_separate_ones_kept():
+    rows = [hit(1, 0.7, 0, 1), hit(2, 0.6, 2, 2), hit(8, 0.95, 8, 9)]
+
+    merged = RAGSystem._merge_passages(rows)
+
+    assert [row[0] for row in merged] == [SOURCE[8 * SPAN:], SOURCE[:3 * SPAN]]
+    assert [row[2] for row in merged] == [0.95, 0.7]
+    # An unmerged hit keeps its stored token count
+    assert merged[0][4] == 7
+
+
+def test_windows_in_different_documents_are_not_merged():
+    rows = [hit(1, 0.7, 0, 2, document_id=1), hit(1, 0.6, 0, 2, document_id=2)]
+
+    assert len(RAGSystem._merge_passages(rows)) == 2
+
+
+def test_contained_window_adds_no_text():
+    rows = [hit(3, 0.5, 1, 5), hit(2, 0.9, 2, 3)]
+
+    merged = RAGSystem._merge_passages(rows)
+
+    assert merged == [(SOURCE[SPAN:6 * SPAN], "doc.txt", 0.9, 2, None, 2)]
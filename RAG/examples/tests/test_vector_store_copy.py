@@ -0,0 +1,16 @@
+"""The RAG chapter's vector_store.py must stay identical to the Vector-DB chapter's."""
+
+import os
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RAG_COPY = os.path.join(HERE, "..", "vector_store.py")
+VECTOR_DB_COPY = os.path.join(HERE, "..", "..", "..", "Vector-DB", "examples", "vector_store.py")
+
+
+def test_vector_store_copies_match():
+    if not os.path.exists(VECTOR_DB_COPY):
+        pytest.skip("Vector-DB chapter not present")
+    with open(RAG_COPY, "rb") as rag, open(VECTOR_DB_COPY, "rb") as vector_db:
+        assert rag.read() == vector_db.read()
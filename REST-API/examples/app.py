@@ -6,23 +6,44 @@ Run this file to start the API server:
     python app.py
 
 Then visit http://localhost:5000 for documentation.
+
+Optional: pip install orjson (faster JSON encoding for list endpoints)
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, has_request_context, jsonify, request, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
-from decimal import Decimal
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from functools import wraps
+import base64
+import bisect
+import cProfile
+import hashlib
+import itertools
+import json
+import math
 import os
+import random
+import select
+import threading
+import time as clock
+import uuid
 
 # Try to import psycopg2, fall back to mock data if not available
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import execute_values
     USE_DATABASE = True
 except ImportError:
     USE_DATABASE = False
     print("Warning: psycopg2 not installed. Using mock data.")
 
+# orjson is optional; the standard library encoder is used without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
 CORS(app)
 
@@ -38,16 +59,83 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'password')
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2:5433
+# Product and category reads go to a replica; writes stay on the primary.
+REPLICA_CONFIGS = []
+for _replica in os.getenv('DB_REPLICA_HOSTS', '').split(','):
+    if _replica.strip():
+        _host, _, _port = _replica.strip().partition(':')
+        REPLICA_CONFIGS.append({**DB_CONFIG, 'host': _host, 'port': _port or DB_CONFIG['port']})
+
+# Replicas lagging more than this many seconds are skipped
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', '5'))
+
+# A replica's lag in seconds, and whether it has replayed a given LSN
+REPLICA_STATUS_SQL = """
+    SELECT
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END,
+        NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= %s::pg_lsn
+"""
+
+# Cookie holding the client's last write position (read-your-writes)
+WRITE_LSN_COOKIE = 'db_write_lsn'
+
+# Page sizes for GET /products
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip when streaming an export (?format=ndjson)
+STREAM_BATCH_SIZE = 1000
+
+# Most items accepted by one bulk request (?ids=, /products/bulk)
+MAX_BULK_SIZE = 1000
+
+# Attempts at placing an order when it hits a deadlock or serialization failure
+ORDER_ATTEMPTS = 5
+
+# Seconds a cached catalog response may be served before it is rebuilt.
+# Writes invalidate entries at once (in other workers too, via the change
+# listener below); the TTL only bounds staleness if notifications are
+# missed or the triggers are not installed. 0 turns the cache off.
+CACHE_TTL = float(os.getenv('API_CACHE_TTL', '300'))
+
+# Most responses kept per worker; the least recently used go first
+CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', '10000'))
+
+# Channel the triggers in Database/examples/04_change_notifications.sql
+# notify on; each worker listens and evicts what other workers changed
+CHANGE_CHANNEL = 'catalog_changes'
+
+# Opt-in profiling: this fraction of requests runs under cProfile, and
+# those taking at least PROFILE_SLOW_SECONDS are dumped to PROFILE_DIR
+# (open a dump with: python -m pstats <file>)
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_SECONDS = float(os.getenv('PROFILE_SLOW_SECONDS', '1.0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+# Conversions for column types JSON cannot hold, keyed by PostgreSQL type OID
+COLUMN_CONVERTERS = {
+    1700: float,                # numeric
+    1082: date.isoformat,       # date
+    1083: time.isoformat,       # time
+    1114: datetime.isoformat,   # timestamp
+    1184: datetime.isoformat,   # timestamptz
+}
+
 # ============================================
 # MOCK DATA (used if database not available)
 # ============================================
 
 MOCK_PRODUCTS = [
-    {"id": 1, "name": "Laptop Pro", "description": "High-performance laptop", "price": 1299.99, "stock_quantity": 50, "category": "Electronics", "sku": "ELEC-001", "is_active": True},
-    {"id": 2, "name": "Wireless Mouse", "description": "Ergonomic wireless mouse", "price": 29.99, "stock_quantity": 200, "category": "Electronics", "sku": "ELEC-002", "is_active": True},
-    {"id": 3, "name": "USB-C Hub", "description": "7-in-1 USB-C hub", "price": 49.99, "stock_quantity": 150, "category": "Electronics", "sku": "ELEC-003", "is_active": True},
-    {"id": 4, "name": "Mechanical Keyboard", "description": "RGB mechanical keyboard", "price": 89.99, "stock_quantity": 100, "category": "Electronics", "sku": "ELEC-004", "is_active": True},
-    {"id": 5, "name": "Monitor 27\"", "description": "27-inch 4K monitor", "price": 399.99, "stock_quantity": 75, "category": "Electronics", "sku": "ELEC-005", "is_active": True},
+    {"id": 1, "name": "Laptop Pro", "description": "High-performance laptop", "price": 1299.99, "stock_quantity": 50, "category": "Electronics", "sku": "ELEC-001", "is_active": True, "created_at": "2024-01-10T09:00:00"},
+    {"id": 2, "name": "Wireless Mouse", "description": "Ergonomic wireless mouse", "price": 29.99, "stock_quantity": 200, "category": "Electronics", "sku": "ELEC-002", "is_active": True, "created_at": "2024-01-11T09:00:00"},
+    {"id": 3, "name": "USB-C Hub", "description": "7-in-1 USB-C hub", "price": 49.99, "stock_quantity": 150, "category": "Electronics", "sku": "ELEC-003", "is_active": True, "created_at": "2024-01-12T09:00:00"},
+    {"id": 4, "name": "Mechanical Keyboard", "description": "RGB mechanical keyboard", "price": 89.99, "stock_quantity": 100, "category": "Electronics", "sku": "ELEC-004", "is_active": True, "created_at": "2024-01-13T09:00:00"},
+    {"id": 5, "name": "Monitor 27\"", "description": "27-inch 4K monitor", "price": 399.99, "stock_quantity": 75, "category": "Electronics", "sku": "ELEC-005", "is_active": True, "created_at": "2024-01-14T09:00:00"},
 ]
 
 MOCK_ORDERS = [
@@ -56,48 +144,787 @@ MOCK_ORDERS = [
     {"order_id": 3, "customer_name": "Bob Johnson", "product_id": 1, "quantity": 2, "order_date": "2024-01-15", "status": "delivered"},
 ]
 
+class MockProductStore:
+    """
+    In-memory product table with the indexes the API queries need.
+
+    - id -> product dict for lookups by id
+    - (created_at, id) keys of active products, overall and per category,
+      sorted so keyset pages are found with bisect and read in order
+    - (price, id) keys of active products for price range filters
+
+    Category counts are the lengths of the per-category lists. All access
+    goes through one lock, so the store is safe under a threaded server.
+    """
+
+    def __init__(self, products=()):
+        self._lock = threading.RLock()
+        self._products = {}
+        self._order = []
+        self._category_order = {}
+        self._prices = []
+        self._next_id = 1
+        # Bulk load: append every key, then sort each index once
+        for product in products:
+            product = dict(product)
+            self._products[product['id']] = product
+            self._next_id = max(self._next_id, product['id'] + 1)
+            if product.get('is_active', True):
+                key = (product['created_at'], product['id'])
+                self._order.append(key)
+                if product.get('category'):
+                    self._category_order.setdefault(product['category'], []).append(key)
+                self._prices.append((product['price'], product['id']))
+        self._order.sort()
+        for keys in self._category_order.values():
+            keys.sort()
+        self._prices.sort()
+
+    def __len__(self):
+        return len(self._products)
+
+    def _index(self, product):
+        key = (product['created_at'], product['id'])
+        bisect.insort(self._order, key)
+        if product.get('category'):
+            bisect.insort(self._category_order.setdefault(product['category'], []), key)
+        bisect.insort(self._prices, (product['price'], product['id']))
+
+    def _unindex(self, product):
+        key = (product['created_at'], product['id'])
+        del self._order[bisect.bisect_left(self._order, key)]
+        if product.get('category'):
+            keys = self._category_order[product['category']]
+            del keys[bisect.bisect_left(keys, key)]
+            if not keys:
+                del self._category_order[product['category']]
+        del self._prices[bisect.bisect_left(self._prices, (product['price'], product['id']))]
+
+    def get(self, product_id):
+        """The product with this id (active or not), or None."""
+        with self._lock:
+            return self._products.get(product_id)
+
+    def add(self, fields):
+        """Store a new active product under the next id and return it."""
+        with self._lock:
+            product = {"id": self._next_id, "is_active": True, **fields}
+            self._products[product['id']] = product
+            self._next_id += 1
+            self._index(product)
+            return product
+
+    def update(self, product_id, changes):
+        """
+        Apply changes to a stored product; None if there is no such product.
+
+        Only validated UPDATABLE_FIELDS may be changed: the indexes sort
+        on created_at and price, which must stay comparable.
+        """
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None:
+                return None
+            if product.get('is_active', True):
+                self._unindex(product)
+            try:
+                product.update(changes)
+            finally:
+                # Indexed again even if the update failed half way
+                if product.get('is_active', True):
+                    self._index(product)
+            return product
+
+    def page(self, category=None, min_price=None, max_price=None, after=None, limit=None):
+        """
+        Active products matching the filters, newest first.
+
+        Args:
+            category: Only this category
+            min_price, max_price: Inclusive price bounds
+            after: (created_at, id) to continue after, as in GET /products
+            limit: Most products to return; None for all
+        """
+        after_key = (after[0].isoformat(), after[1]) if after is not None else None
+        low = -math.inf if min_price is None else min_price
+        high = math.inf if max_price is None else max_price
+        with self._lock:
+            order = self._order if category is None else self._category_order.get(category, [])
+            start = bisect.bisect_left(self._prices, (low,))
+            end = bisect.bisect_right(self._prices, (high, math.inf))
+            matches = end - start
+            # Walking the order index stops after about limit * len(order) / matches
+            # rows; sorting the price range costs about matches * log(matches)
+            walk_cost = len(order) if limit is None else limit * len(order) / max(matches, 1)
+            if (min_price is not None or max_price is not None) and matches * math.log2(matches + 1) < walk_cost:
+                # The price range is cheaper: sort just those products
+                keys = sorted((self._products[i]['created_at'], i) for _, i in self._prices[start:end])
+                if category is not None:
+                    keys = [key for key in keys if self._products[key[1]].get('category') == category]
+                price_ok = None
+            else:
+                keys = order
+                price_ok = low != -math.inf or high != math.inf
+
+            stop = bisect.bisect_left(keys, after_key) if after_key is not None else len(keys)
+            results = []
+            for i in range(stop - 1, -1, -1):
+                product = self._products[keys[i][1]]
+                if price_ok and not low <= product['price'] <= high:
+                    continue
+                results.append(product)
+                if limit is not None and len(results) == limit:
+                    break
+            return results
+
+    def reserve(self, quantities):
+        """
+        Take stock for an order, all or nothing.
+
+        Args:
+            quantities: product id -> quantity wanted
+
+        Returns:
+            (reserved products, ids of products that are missing, inactive
+            or short of stock); nothing is taken unless the second is empty.
+        """
+        with self._lock:
+            products = {i: self._products.get(i) for i in quantities}
+            unavailable = sorted(
+                i for i, product in products.items()
+                if product is None or not product.get('is_active', True)
+                or product['stock_quantity'] < quantities[i]
+            )
+            if unavailable:
+                return [], unavailable
+            for i, product in products.items():
+                product['stock_quantity'] -= quantities[i]
+            return list(products.values()), []
+
+    def category_counts(self):
+        """Active products per category, largest first."""
+        with self._lock:
+            counts = [(category, len(keys)) for category, keys in self._category_order.items()]
+        return sorted(counts, key=lambda item: item[1], reverse=True)
+
+def generate_mock_products(count, first_id):
+    """Synthetic products for padding the mock catalog in load tests."""
+    categories = ["Electronics", "Books", "Home", "Toys"]
+    for product_id in range(first_id, first_id + count):
+        yield {
+            "id": product_id,
+            "name": f"Product {product_id}",
+            "description": None,
+            "price": round(random.uniform(1, 1000), 2),
+            "stock_quantity": 100,
+            "category": categories[product_id % len(categories)],
+            "sku": f"MOCK-{product_id:07d}",
+            "is_active": True,
+            "created_at": (datetime(2024, 2, 1) + timedelta(seconds=product_id)).isoformat()
+        }
+
+# Load tests can pad the catalog, e.g. MOCK_CATALOG_SIZE=1000000
+MOCK_CATALOG_SIZE = int(os.getenv('MOCK_CATALOG_SIZE', '0'))
+
+MOCK_STORE = MockProductStore(itertools.chain(
+    MOCK_PRODUCTS,
+    generate_mock_products(max(MOCK_CATALOG_SIZE - len(MOCK_PRODUCTS), 0), len(MOCK_PRODUCTS) + 1)
+))
+
+# ============================================
+# METRICS
+# ============================================
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=""):
+    """Prometheus label set, e.g. {method="GET",route="/products"}."""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """
+    A counter or gauge per label set, rendered in Prometheus text format.
+
+    Values are per worker process; Prometheus sums them across workers.
+    """
+
+    def __init__(self, name, help_text, label_names, kind="counter"):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.kind = kind
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value}")
+        return lines
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        super().__init__(name, help_text, label_names, kind="histogram")
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # One slot per bucket, then +Inf, then the sum
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{format_labels(self.label_names, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {counts[-1]}")
+                lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time to produce a response",
+                             ("method", "route", "status"), LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size (streamed bodies excluded)",
+                          ("method", "route"), SIZE_BUCKETS)
+REQUESTS_IN_FLIGHT = Metric("http_requests_in_flight", "Requests being handled right now",
+                            ("method", "route"), kind="gauge")
+SQL_DURATION = Histogram("sql_query_duration_seconds", "Time spent in the database, connecting included",
+                         ("endpoint", "operation"), LATENCY_BUCKETS)
+SQL_ROWS = Metric("sql_rows_total", "Rows returned or changed by SQL statements",
+                  ("endpoint", "operation"))
+
+# Only one cProfile profiler can run at a time per process
+_profiler_lock = threading.Lock()
+
+def request_route():
+    """The matched URL rule (e.g. /products/<int:product_id>), so ids stay out of labels."""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def record_sql(operation, started, rows):
+    """Add one database call to the SQL metrics of the current endpoint."""
+    endpoint = (request.endpoint or "unmatched") if has_request_context() else "none"
+    SQL_DURATION.observe((endpoint, operation), clock.perf_counter() - started)
+    SQL_ROWS.inc((endpoint, operation), rows)
+
+@app.before_request
+def start_request_metrics():
+    """Start the request clock, count it in flight and maybe profile it."""
+    g.started = clock.perf_counter()
+    g.route = request_route()
+    REQUESTS_IN_FLIGHT.inc((request.method, g.route))
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE and _profiler_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record latency and response size once the response is ready."""
+    if 'started' in g:
+        REQUEST_DURATION.observe((request.method, g.route, str(response.status_code)),
+                                 clock.perf_counter() - g.started)
+        if not response.is_streamed and response.content_length is not None:
+            RESPONSE_SIZE.observe((request.method, g.route), response.content_length)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Leave the in-flight count and dump the profile of a slow request."""
+    # Streamed responses tear down twice (again when the stream ends); act once
+    started = g.pop('started', None)
+    if started is None:
+        return
+    REQUESTS_IN_FLIGHT.inc((request.method, g.route), -1)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+        elapsed = clock.perf_counter() - started
+        if elapsed >= PROFILE_SLOW_SECONDS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{int(clock.time() * 1000)}-{request.endpoint or 'unmatched'}-{elapsed * 1000:.0f}ms.prof")
+            profiler.dump_stats(path)
+            print(f"Slow request {request.method} {request.path} ({elapsed:.2f}s) profiled to {path}")
+
 # ============================================
 # DATABASE HELPERS
 # ============================================
 
-def get_db_connection():
-    """Create a database connection."""
+def get_db_connection(read_only=False):
+    """
+    Create a database connection.
+
+    With read_only=True a replica is used if one lags at most
+    REPLICA_MAX_LAG seconds and has already replayed this client's last
+    write, so clients always see their own changes. Otherwise the
+    primary is used, as it is while filling the response cache: a
+    lagging replica could otherwise cache a response from before the
+    write that just invalidated it and serve it to every client.
+    """
     if not USE_DATABASE:
         return None
+    if read_only and REPLICA_CONFIGS and not g.get('cache_fill'):
+        min_lsn = g.get('write_lsn') or request.cookies.get(WRITE_LSN_COOKIE, '0/0')
+        for config in random.sample(REPLICA_CONFIGS, len(REPLICA_CONFIGS)):
+            try:
+                conn = psycopg2.connect(**config)
+            except psycopg2.OperationalError:
+                continue
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(REPLICA_STATUS_SQL, (min_lsn,))
+                    lag, caught_up = cursor.fetchone()
+            except psycopg2.Error:
+                conn.close()
+                continue
+            if caught_up and float(lag) <= REPLICA_MAX_LAG:
+                return conn
+            conn.close()
     return psycopg2.connect(**DB_CONFIG)
 
-def execute_query(query, params=None, fetch_one=False):
-    """Execute a query and return results."""
+def execute_query(query, params=None, fetch_one=False, read_only=False):
+    """Execute a query and return its rows as JSON-ready dicts."""
     if not USE_DATABASE:
         return None
 
-    conn = get_db_connection()
+    started = clock.perf_counter()
+    rows = 0
+    conn = get_db_connection(read_only)
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        with conn.cursor() as cursor:
             cursor.execute(query, params)
+            rows = max(cursor.rowcount, 0)
+            serialize = row_serializer(cursor.description) if cursor.description else None
             if query.strip().upper().startswith('SELECT'):
                 if fetch_one:
-                    return cursor.fetchone()
-                return cursor.fetchall()
+                    row = cursor.fetchone()
+                    return serialize(row) if row is not None else None
+                return [serialize(row) for row in cursor.fetchall()]
             else:
+                row = cursor.fetchone() if serialize else None
+                result = serialize(row) if row is not None else None
                 conn.commit()
-                if cursor.description:
-                    return cursor.fetchone()
-                return None
+                remember_write(conn, cursor)
+                return result
     finally:
         conn.close()
+        record_sql("query", started, rows)
 
-def serialize_row(row):
-    """Convert database row to JSON-serializable format."""
-    if row is None:
-        return None
-    result = dict(row)
-    for key, value in result.items():
-        if isinstance(value, Decimal):
-            result[key] = float(value)
-        elif isinstance(value, datetime):
-            result[key] = value.isoformat()
-    return result
+def execute_transaction(work):
+    """
+    Run work(cursor) in one transaction on the primary and return its result.
+
+    For writes that take more than one statement; everything is rolled
+    back if any statement fails.
+    """
+    started = clock.perf_counter()
+    rows = 0
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            result = work(cursor)
+            # Rows of the transaction's last statement
+            rows = max(cursor.rowcount, 0)
+            conn.commit()
+            remember_write(conn, cursor)
+            return result
+    finally:
+        conn.close()
+        record_sql("transaction", started, rows)
+
+def remember_write(conn, cursor):
+    """Record where a committed write ended so later reads wait for it."""
+    if REPLICA_CONFIGS:
+        cursor.execute("SELECT pg_current_wal_lsn()::text")
+        g.write_lsn = cursor.fetchone()[0]
+        conn.commit()
+
+def stream_query(query, params=None, read_only=True):
+    """
+    Yield a query's rows in batches of STREAM_BATCH_SIZE.
+
+    Uses a named (server-side) cursor, so only one batch is held in
+    memory however many rows the query returns.
+    """
+    started = clock.perf_counter()
+    streamed = 0
+    conn = get_db_connection(read_only)
+    try:
+        with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = STREAM_BATCH_SIZE
+            cursor.execute(query, params)
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            # A named cursor only has a description after the first fetch
+            serialize = row_serializer(cursor.description) if rows else None
+            while rows:
+                streamed += len(rows)
+                yield [serialize(row) for row in rows]
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+    finally:
+        conn.close()
+        record_sql("stream", started, streamed)
+
+def ndjson_response(batches):
+    """Stream batches of rows as newline-delimited JSON, one row per line."""
+    def generate():
+        for rows in batches:
+            yield b"".join(dump_json(row) + b"\n" for row in rows)
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def wants_stream():
+    """Whether the client asked for a streamed NDJSON export."""
+    return request.args.get('format') == 'ndjson'
+
+@app.after_request
+def remember_write_position(response):
+    """Send the client its last write position for read-your-writes."""
+    if g.get('write_lsn'):
+        response.set_cookie(WRITE_LSN_COOKIE, g.write_lsn, httponly=True)
+    return response
+
+def encode_cursor(created_at, product_id):
+    """Build an opaque next-page token from the last row's sort key."""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    payload = json.dumps([created_at, product_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(token):
+    """Read (created_at, id) back from a page token; ValueError if invalid."""
+    try:
+        created_at, product_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(created_at), int(product_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+# Serializers already built, keyed by a result's column names and types
+_ROW_SERIALIZERS = {}
+
+def row_serializer(description):
+    """
+    Return a function turning a result's tuple rows into JSON-ready dicts.
+
+    The columns needing conversion are worked out once from the cursor
+    description rather than by checking every value of every row, and
+    the function is cached for results of the same shape. Results with
+    no numeric or date columns are just zipped with their column names.
+    """
+    key = tuple((column.name, column.type_code) for column in description)
+    serializer = _ROW_SERIALIZERS.get(key)
+    if serializer is None:
+        names = [name for name, _ in key]
+        converters = [(i, COLUMN_CONVERTERS[type_code])
+                      for i, (_, type_code) in enumerate(key) if type_code in COLUMN_CONVERTERS]
+        if not converters:
+            def serializer(row):
+                return dict(zip(names, row))
+        else:
+            def serializer(row):
+                values = list(row)
+                for i, convert in converters:
+                    if values[i] is not None:
+                        values[i] = convert(values[i])
+                return dict(zip(names, values))
+        _ROW_SERIALIZERS[key] = serializer
+    return serializer
+
+def dump_json(obj):
+    """
+    Encode obj as JSON bytes, with orjson when it is installed.
+
+    Used for every successful read response. Rows are still built in
+    Python rather than with json_agg in SQL: GET /products needs the last
+    row's (created_at, id) for next_cursor, and row_serializer already
+    skips the per-value type checks json_agg would save.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+# ============================================
+# RESPONSE CACHE
+# ============================================
+
+# Cached GET responses: key -> {"body", "mimetype", "etag", "tags", "expires"},
+# least recently used first
+RESPONSE_CACHE = OrderedDict()
+CACHE_STATS = {"hits": 0, "misses": 0, "not_modified": 0, "invalidated": 0, "evicted": 0}
+_cache_lock = threading.Lock()
+# Bumped by every invalidation. A response rendered while it changed may
+# predate the write and is not stored.
+_cache_generation = 0
+_next_cache_sweep = 0.0
+
+def cache_key():
+    """Normalized cache key: the path plus its query args in sorted order."""
+    args = sorted(request.args.items(multi=True))
+    return request.path + ('?' + '&'.join(f"{k}={v}" for k, v in args) if args else '')
+
+def store_response(key, entry, generation):
+    """
+    Add a rendered response to RESPONSE_CACHE, unless the cache was
+    invalidated after its generation was read. Call with _cache_lock held.
+
+    Expired entries are swept at most once per CACHE_TTL, and the least
+    recently used are evicted past CACHE_MAX_ENTRIES.
+    """
+    global _next_cache_sweep
+    if generation != _cache_generation:
+        return
+    RESPONSE_CACHE[key] = entry
+    RESPONSE_CACHE.move_to_end(key)
+    now = clock.monotonic()
+    if now >= _next_cache_sweep:
+        expired = [k for k, e in RESPONSE_CACHE.items() if e["expires"] < now]
+        for k in expired:
+            del RESPONSE_CACHE[k]
+        CACHE_STATS["evicted"] += len(expired)
+        _next_cache_sweep = now + CACHE_TTL
+    while len(RESPONSE_CACHE) > CACHE_MAX_ENTRIES:
+        RESPONSE_CACHE.popitem(last=False)
+        CACHE_STATS["evicted"] += 1
+
+def cached_response(tags):
+    """
+    Serve a GET endpoint from RESPONSE_CACHE, with ETag / If-None-Match.
+
+    Args:
+        tags: Function taking the view's arguments and returning the set
+              of tags the response depends on; invalidate_cache() drops
+              every entry carrying any of the given tags.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if CACHE_TTL <= 0 or CACHE_MAX_ENTRIES <= 0:
+                return view(**kwargs)
+            key = cache_key()
+            with _cache_lock:
+                entry = RESPONSE_CACHE.get(key)
+                if entry is not None and entry["expires"] < clock.monotonic():
+                    del RESPONSE_CACHE[key]
+                    entry = None
+                elif entry is not None:
+                    RESPONSE_CACHE.move_to_end(key)
+                CACHE_STATS["hits" if entry else "misses"] += 1
+                generation = _cache_generation
+
+            if entry is None:
+                # Fill from the primary (see get_db_connection). Streams read
+                # lazily, after the flag is cleared, and are never cached.
+                g.cache_fill = True
+                try:
+                    response = app.make_response(view(**kwargs))
+                finally:
+                    g.pop('cache_fill', None)
+                # Only whole, successful bodies are cached; streams and errors are not
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                entry = {
+                    "body": body,
+                    "mimetype": response.mimetype,
+                    "etag": hashlib.sha1(body).hexdigest(),
+                    "tags": tags(**kwargs),
+                    "expires": clock.monotonic() + CACHE_TTL,
+                }
+                with _cache_lock:
+                    store_response(key, entry, generation)
+
+            response = Response(entry["body"], mimetype=entry["mimetype"])
+            response.set_etag(entry["etag"])
+            response.make_conditional(request)
+            if response.status_code == 304:
+                with _cache_lock:
+                    CACHE_STATS["not_modified"] += 1
+            return response
+        return wrapper
+    return decorator
+
+def invalidate_cache(tags):
+    """Drop every cached response carrying any of the given tags."""
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        stale = [key for key, entry in RESPONSE_CACHE.items() if entry["tags"] & tags]
+        for key in stale:
+            del RESPONSE_CACHE[key]
+        CACHE_STATS["invalidated"] += len(stale)
+
+def clear_cache():
+    """Drop every cached response."""
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        CACHE_STATS["invalidated"] += len(RESPONSE_CACHE)
+        RESPONSE_CACHE.clear()
+
+def product_tags(product_id, *categories):
+    """
+    Tags touched by a write to one product.
+
+    Its own detail and orders responses, unfiltered product lists, lists
+    filtered on any category it was or now is in, and the category counts.
+    Lists filtered on other categories cannot contain it and are kept.
+    """
+    tags = {f"product:{product_id}", "products:*", "categories"}
+    tags.update(f"products:{category}" for category in categories if category)
+    return tags
+
+# ============================================
+# CROSS-WORKER INVALIDATION (LISTEN/NOTIFY)
+# ============================================
+
+_listener_lock = threading.Lock()
+_listener_started = False
+
+def apply_change(change):
+    """Evict the cached responses a catalog_changes payload affects."""
+    if change.get('all'):
+        clear_cache()
+        return
+    tags = set()
+    for product_id in change.get('products', []):
+        tags |= product_tags(product_id, *change.get('categories', []))
+    tags.update(f"orders:{product_id}" for product_id in change.get('orders', []))
+    if tags:
+        invalidate_cache(tags)
+
+def listen_for_changes():
+    """
+    Apply every catalog_changes notification to this worker's cache.
+
+    Runs forever in a daemon thread. After connecting (or reconnecting)
+    the whole cache is dropped, since changes may have been missed while
+    no connection was listening. Any error, not just a database one, is
+    logged and drops the cache before reconnecting, so the thread never
+    dies and leaves this worker serving entries no one invalidates.
+    """
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANGE_CHANNEL}")
+            clear_cache()
+            while True:
+                # Wake up at least every few seconds to notice a dead connection:
+                # after a quiet spell, a round trip raises if it is gone
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        apply_change(json.loads(notify.payload))
+                    except ValueError:
+                        clear_cache()
+        except Exception as e:
+            print(f"Change listener disconnected: {e!r}")
+            clear_cache()
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        clock.sleep(1)
+
+@app.before_request
+def start_change_listener():
+    """Start this worker's listener thread on its first request."""
+    global _listener_started
+    if _listener_started or not USE_DATABASE or CACHE_TTL <= 0:
+        return
+    with _listener_lock:
+        if not _listener_started:
+            # Started per process, after any fork by the server
+            threading.Thread(target=listen_for_changes, daemon=True).start()
+            _listener_started = True
+
+# Fields PUT /products/<id> and PATCH /products/bulk may change
+UPDATABLE_FIELDS = ('name', 'description', 'price', 'stock_quantity', 'category', 'is_active')
+
+def product_error(data):
+    """Why a new product's fields are invalid, or None if they are valid."""
+    if not isinstance(data, dict):
+        return "Product must be an object"
+    if not data.get('name'):
+        return "Name is required"
+    price = data.get('price')
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or not price or price < 0:
+        return "Valid price is required"
+    stock = data.get('stock_quantity', 0)
+    if isinstance(stock, bool) or not isinstance(stock, int) or stock < 0:
+        return "stock_quantity must be a non-negative integer"
+    return None
+
+def update_error(data):
+    """Why changes to a product are invalid, or None if they are valid."""
+    if not isinstance(data, dict):
+        return "Product must be an object"
+    for field in ('name', 'description', 'category'):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return f"{field} must be a string"
+    if data.get('name') == '':
+        return "Name cannot be empty"
+    if data.get('is_active') is not None and not isinstance(data['is_active'], bool):
+        return "is_active must be true or false"
+    price = data.get('price')
+    if price is not None and (isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0):
+        return "Valid price is required"
+    stock = data.get('stock_quantity')
+    if stock is not None and (isinstance(stock, bool) or not isinstance(stock, int) or stock < 0):
+        return "stock_quantity must be a non-negative integer"
+    return None
+
+def bulk_items():
+    """The item list of a bulk request, or raise ValueError."""
+    items = request.get_json(silent=True)
+    if isinstance(items, dict):
+        items = items.get('products')
+    if not isinstance(items, list) or not items:
+        raise ValueError("Expected a non-empty list of products")
+    if len(items) > MAX_BULK_SIZE:
+        raise ValueError(f"At most {MAX_BULK_SIZE} products per request")
+    return items
+
+def bulk_response(results):
+    """201/200 when every item succeeded, 207 Multi-Status otherwise."""
+    failed = sum(1 for r in results if r['status'] == 'error')
+    body = {
+        "status": "success" if not failed else "partial",
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+    if failed:
+        return jsonify(body), 207
+    return jsonify(body), 201 if request.method == 'POST' else 200
 
 # ============================================
 # API ENDPOINTS
@@ -111,15 +938,21 @@ def home():
         "version": "1.0.0",
         "description": "A sample REST API for managing products",
         "database_connected": USE_DATABASE,
+        "caching": "Catalog GETs send an ETag; repeat them with If-None-Match for a 304",
         "endpoints": {
             "GET /": "This documentation",
             "GET /health": "Health check",
-            "GET /products": "List all products",
+            "GET /metrics": "Prometheus metrics (latency, sizes, SQL timings, cache)",
+            "GET /products": "List products (paged: ?limit=&cursor=, export: ?format=ndjson)",
             "GET /products/<id>": "Get product by ID",
             "POST /products": "Create new product",
+            "GET /products?ids=1,2,3": "Get several products by ID",
+            "POST /products/bulk": "Create many products (per-item results)",
+            "PATCH /products/bulk": "Update many products (per-item results)",
             "PUT /products/<id>": "Update product",
             "DELETE /products/<id>": "Delete product",
-            "GET /products/<id>/orders": "Get last 10 orders for a product",
+            "POST /orders": "Place an order, reserving stock (409 if any item is short)",
+            "GET /products/<id>/orders": "Get last 10 orders for a product (all: ?format=ndjson)",
             "GET /categories": "List all categories"
         }
     })
@@ -131,15 +964,53 @@ def health():
     return jsonify({
         "status": "healthy",
         "database": db_status,
+        "read_replicas": len(REPLICA_CONFIGS),
+        "cache": {**CACHE_STATS, "entries": len(RESPONSE_CACHE)},
         "timestamp": datetime.utcnow().isoformat()
     })
 
+@app.route('/metrics')
+def metrics():
+    """Request, SQL and cache metrics of this worker in Prometheus text format."""
+    lines = []
+    for metric in (REQUEST_DURATION, RESPONSE_SIZE, REQUESTS_IN_FLIGHT, SQL_DURATION, SQL_ROWS):
+        lines.extend(metric.render())
+    lines.append("# HELP api_cache_events_total Response cache lookups and evictions")
+    lines.append("# TYPE api_cache_events_total counter")
+    for event, count in sorted(CACHE_STATS.items()):
+        lines.append(f'api_cache_events_total{{event="{event}"}} {count}')
+    lines.append("# HELP api_cache_entries Responses currently cached")
+    lines.append("# TYPE api_cache_entries gauge")
+    lines.append(f"api_cache_entries {len(RESPONSE_CACHE)}")
+    return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
+
 @app.route('/products', methods=['GET'])
+@cached_response(lambda: {f"products:{request.args.get('category') or '*'}"})
 def get_products():
-    """Get all products with optional filtering."""
+    """
+    Get active products, newest first, with optional filtering.
+
+    Results are paged by (created_at, id): pass the returned next_cursor
+    as ?cursor= to get the next page, and ?limit= to set the page size.
+    Every page costs the same, however deep. With ?format=ndjson all
+    matching products are streamed instead, one JSON object per line.
+
+    With ?ids=1,2,3 the listed products are returned instead (at most
+    MAX_BULK_SIZE, fetched with one query), plus the ids not found.
+    """
+    if request.args.get('ids'):
+        return get_products_by_ids(request.args['ids'])
+
     category = request.args.get('category')
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args['cursor'])
+        except ValueError:
+            return jsonify({"status": "error", "message": "Invalid cursor"}), 400
 
     if USE_DATABASE:
         query = "SELECT * FROM products WHERE is_active = TRUE"
@@ -154,35 +1025,70 @@ def get_products():
         if max_price is not None:
             query += " AND price <= %s"
             params.append(max_price)
+        if after is not None:
+            # Row comparison walks idx_products_active_created from the cursor
+            query += " AND (created_at, id) < (%s, %s)"
+            params.extend(after)
+
+        if wants_stream():
+            query += " ORDER BY created_at DESC, id DESC"
+            return ndjson_response(stream_query(query, params))
 
-        query += " ORDER BY created_at DESC LIMIT 100"
-        products = execute_query(query, params)
-        products = [serialize_row(p) for p in products]
+        # One extra row tells whether another page exists
+        query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+        params.append(limit + 1)
+        products = execute_query(query, params, read_only=True)
+        has_more = len(products) > limit
+        products = products[:limit]
+        next_cursor = encode_cursor(products[-1]['created_at'], products[-1]['id']) if has_more else None
     else:
-        # Use mock data
-        products = MOCK_PRODUCTS.copy()
-        if category:
-            products = [p for p in products if p['category'] == category]
-        if min_price is not None:
-            products = [p for p in products if p['price'] >= min_price]
-        if max_price is not None:
-            products = [p for p in products if p['price'] <= max_price]
+        # Use mock data, paged the same way
+        if wants_stream():
+            return ndjson_response([MOCK_STORE.page(category or None, min_price, max_price, after)])
+        products = MOCK_STORE.page(category or None, min_price, max_price, after, limit + 1)
+        has_more = len(products) > limit
+        products = products[:limit]
+        next_cursor = encode_cursor(products[-1]['created_at'], products[-1]['id']) if has_more else None
 
-    return jsonify({
+    return Response(dump_json({
         "status": "success",
         "count": len(products),
-        "data": products
-    })
+        "data": products,
+        "next_cursor": next_cursor
+    }), mimetype='application/json')
+
+def get_products_by_ids(raw_ids):
+    """GET /products?ids=...: the listed products, in the order asked for."""
+    try:
+        ids = list(dict.fromkeys(int(i) for i in raw_ids.split(',') if i.strip()))
+    except ValueError:
+        return jsonify({"status": "error", "message": "ids must be comma-separated integers"}), 400
+    if len(ids) > MAX_BULK_SIZE:
+        return jsonify({"status": "error", "message": f"At most {MAX_BULK_SIZE} ids per request"}), 400
+
+    if USE_DATABASE:
+        rows = execute_query("SELECT * FROM products WHERE id = ANY(%s)", (ids,), read_only=True)
+        found = {product['id']: product for product in rows}
+    else:
+        found = {i: MOCK_STORE.get(i) for i in ids if MOCK_STORE.get(i) is not None}
+
+    products = [found[i] for i in ids if i in found]
+    return Response(dump_json({
+        "status": "success",
+        "count": len(products),
+        "data": products,
+        "missing": [i for i in ids if i not in found]
+    }), mimetype='application/json')
 
 @app.route('/products/<int:product_id>', methods=['GET'])
+@cached_response(lambda product_id: {f"product:{product_id}"})
 def get_product(product_id):
     """Get a single product by ID."""
     if USE_DATABASE:
         query = "SELECT * FROM products WHERE id = %s"
-        product = execute_query(query, (product_id,), fetch_one=True)
-        product = serialize_row(product)
+        product = execute_query(query, (product_id,), fetch_one=True, read_only=True)
     else:
-        product = next((p for p in MOCK_PRODUCTS if p['id'] == product_id), None)
+        product = MOCK_STORE.get(product_id)
 
     if product is None:
         return jsonify({
@@ -190,10 +1096,10 @@ def get_product(product_id):
             "message": f"Product with ID {product_id} not found"
         }), 404
 
-    return jsonify({
+    return Response(dump_json({
         "status": "success",
         "data": product
-    })
+    }), mimetype='application/json')
 
 @app.route('/products', methods=['POST'])
 def create_product():
@@ -201,10 +1107,9 @@ def create_product():
     data = request.get_json()
 
     # Validation
-    if not data.get('name'):
-        return jsonify({"status": "error", "message": "Name is required"}), 400
-    if not data.get('price') or data['price'] < 0:
-        return jsonify({"status": "error", "message": "Valid price is required"}), 400
+    error = product_error(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
 
     if USE_DATABASE:
         query = """
@@ -221,22 +1126,19 @@ def create_product():
             data.get('sku')
         )
         product = execute_query(query, params, fetch_one=True)
-        product = serialize_row(product)
     else:
         # Mock create
-        new_id = max(p['id'] for p in MOCK_PRODUCTS) + 1
-        product = {
-            "id": new_id,
+        product = MOCK_STORE.add({
             "name": data['name'],
             "description": data.get('description'),
             "price": data['price'],
             "stock_quantity": data.get('stock_quantity', 0),
             "category": data.get('category'),
             "sku": data.get('sku'),
-            "is_active": True
-        }
-        MOCK_PRODUCTS.append(product)
+            "created_at": datetime.utcnow().isoformat()
+        })
 
+    invalidate_cache(product_tags(product['id'], product.get('category')))
     return jsonify({
         "status": "success",
         "message": "Product created successfully",
@@ -245,24 +1147,27 @@ def create_product():
 
 @app.route('/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
-    """Update an existing product."""
-    data = request.get_json()
+    """Update an existing product's UPDATABLE_FIELDS; other fields are ignored."""
+    data = request.get_json(silent=True)
 
-    if USE_DATABASE:
-        existing = execute_query("SELECT id FROM products WHERE id = %s", (product_id,), fetch_one=True)
-        if existing is None:
-            return jsonify({"status": "error", "message": f"Product {product_id} not found"}), 404
+    error = update_error(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
 
+    if USE_DATABASE:
+        # Joining the row to itself returns its category from before the update
         query = """
-            UPDATE products
-            SET name = COALESCE(%s, name),
-                description = COALESCE(%s, description),
-                price = COALESCE(%s, price),
-                stock_quantity = COALESCE(%s, stock_quantity),
-                category = COALESCE(%s, category),
+            UPDATE products p
+            SET name = COALESCE(%s, p.name),
+                description = COALESCE(%s, p.description),
+                price = COALESCE(%s, p.price),
+                stock_quantity = COALESCE(%s, p.stock_quantity),
+                category = COALESCE(%s, p.category),
+                is_active = COALESCE(%s, p.is_active),
                 updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-            RETURNING *
+            FROM products old
+            WHERE p.id = %s AND old.id = p.id
+            RETURNING p.*, old.category AS previous_category
         """
         params = (
             data.get('name'),
@@ -270,40 +1175,224 @@ def update_product(product_id):
             data.get('price'),
             data.get('stock_quantity'),
             data.get('category'),
+            data.get('is_active'),
             product_id
         )
         product = execute_query(query, params, fetch_one=True)
-        product = serialize_row(product)
+        if product is None:
+            return jsonify({"status": "error", "message": f"Product {product_id} not found"}), 404
+        existing = {"category": product.pop('previous_category')}
     else:
-        product = next((p for p in MOCK_PRODUCTS if p['id'] == product_id), None)
+        product = MOCK_STORE.get(product_id)
         if product is None:
             return jsonify({"status": "error", "message": f"Product {product_id} not found"}), 404
+        existing = {"category": product.get('category')}
 
         # Update mock product
-        for key, value in data.items():
-            if key in product and value is not None:
-                product[key] = value
+        product = MOCK_STORE.update(product_id, {
+            key: value for key, value in data.items()
+            if key in UPDATABLE_FIELDS and value is not None
+        })
 
+    invalidate_cache(product_tags(product_id, existing['category'], product.get('category')))
     return jsonify({
         "status": "success",
         "message": "Product updated successfully",
         "data": product
     })
 
+@app.route('/products/bulk', methods=['POST'])
+def create_products_bulk():
+    """
+    Create many products in one request.
+
+    Body: a list of products (or {"products": [...]}) with the same
+    fields as POST /products. Valid items are inserted with one
+    statement in one transaction; each item gets its own result, and
+    invalid items or taken SKUs are reported without failing the rest.
+    """
+    try:
+        items = bulk_items()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    results = [None] * len(items)
+    valid = []
+    seen_skus = set()
+    for index, data in enumerate(items):
+        error = product_error(data)
+        if not error and data.get('sku') in seen_skus:
+            error = f"Duplicate SKU {data['sku']} in request"
+        if error:
+            results[index] = {"index": index, "status": "error", "message": error}
+        else:
+            if data.get('sku'):
+                seen_skus.add(data['sku'])
+            valid.append(index)
+
+    if USE_DATABASE:
+        def insert(cursor):
+            rows = [
+                (index, items[index]['name'], items[index].get('description'), items[index]['price'],
+                 items[index].get('stock_quantity', 0), items[index].get('category'), items[index].get('sku'))
+                for index in valid
+            ]
+            if not rows:
+                return []
+            # Taken SKUs are skipped rather than failing the statement, even
+            # when a concurrent request takes one after this one started
+            created = execute_values(cursor, """
+                INSERT INTO products (name, description, price, stock_quantity, category, sku)
+                SELECT name, description, price, stock_quantity, category, sku
+                FROM (VALUES %s) AS input (idx, name, description, price, stock_quantity, category, sku)
+                ORDER BY idx
+                ON CONFLICT (sku) DO NOTHING
+                RETURNING *
+            """, rows, template="(%s::int, %s, %s, %s::numeric, %s::int, %s, %s)",
+                page_size=len(rows), fetch=True)
+            serialize = row_serializer(cursor.description)
+            created = sorted((serialize(row) for row in created), key=lambda product: product['id'])
+            # Ids are drawn in the SELECT's idx order, so sorting the returned
+            # rows by id lines them up with the items that were inserted
+            inserted_skus = {product['sku'] for product in created}
+            inserted = []
+            for index, *_, sku in rows:
+                if sku is None or sku in inserted_skus:
+                    inserted.append(index)
+                else:
+                    results[index] = {"index": index, "status": "error",
+                                      "message": f"SKU {sku} already exists"}
+            return list(zip(inserted, created))
+
+        try:
+            created = execute_transaction(insert)
+        except psycopg2.IntegrityError as e:
+            return jsonify({"status": "error", "message": f"Bulk create failed: {e.diag.message_primary}"}), 409
+    else:
+        created = [
+            (index, MOCK_STORE.add({
+                "name": items[index]['name'],
+                "description": items[index].get('description'),
+                "price": items[index]['price'],
+                "stock_quantity": items[index].get('stock_quantity', 0),
+                "category": items[index].get('category'),
+                "sku": items[index].get('sku'),
+                "created_at": datetime.utcnow().isoformat()
+            }))
+            for index in valid
+        ]
+
+    tags = set()
+    for index, product in created:
+        results[index] = {"index": index, "status": "created", "data": product}
+        tags |= product_tags(product['id'], product.get('category'))
+    invalidate_cache(tags)
+    return bulk_response(results)
+
+@app.route('/products/bulk', methods=['PATCH'])
+def update_products_bulk():
+    """
+    Update many products in one request.
+
+    Body: a list of {"id": ..., <fields to change>} (or {"products": [...]}),
+    with the fields and COALESCE semantics of PUT /products/<id>. All
+    items are applied by one UPDATE ... FROM (VALUES ...) statement;
+    unknown ids are reported per item.
+    """
+    try:
+        items = bulk_items()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    results = [None] * len(items)
+    valid = []
+    seen_ids = set()
+    for index, data in enumerate(items):
+        error = None
+        if not isinstance(data, dict) or not isinstance(data.get('id'), int):
+            error = "Integer id is required"
+        elif data['id'] in seen_ids:
+            error = f"Duplicate id {data['id']} in request"
+        else:
+            error = update_error(data)
+        if error:
+            results[index] = {"index": index, "status": "error", "message": error}
+        else:
+            seen_ids.add(data['id'])
+            valid.append(index)
+
+    updated = {}
+    if USE_DATABASE and valid:
+        rows = [
+            (items[index]['id'], items[index].get('name'), items[index].get('description'),
+             items[index].get('price'), items[index].get('stock_quantity'), items[index].get('category'),
+             items[index].get('is_active'))
+            for index in valid
+        ]
+
+        def update(cursor):
+            # Joining each row to itself returns its category from before the update
+            changed = execute_values(cursor, """
+                UPDATE products p
+                SET name = COALESCE(v.name, p.name),
+                    description = COALESCE(v.description, p.description),
+                    price = COALESCE(v.price, p.price),
+                    stock_quantity = COALESCE(v.stock_quantity, p.stock_quantity),
+                    category = COALESCE(v.category, p.category),
+                    is_active = COALESCE(v.is_active, p.is_active),
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v (id, name, description, price, stock_quantity, category, is_active),
+                     products old
+                WHERE p.id = v.id AND old.id = p.id
+                RETURNING p.*, old.category AS previous_category
+            """, rows, template="(%s::int, %s::varchar, %s::text, %s::numeric, %s::int, %s::varchar, %s::boolean)",
+                page_size=len(rows), fetch=True)
+            serialize = row_serializer(cursor.description)
+            return [serialize(row) for row in changed]
+
+        for product in execute_transaction(update):
+            updated[product['id']] = (product.pop('previous_category'), product)
+    elif valid:
+        for index in valid:
+            data = items[index]
+            product = MOCK_STORE.get(data['id'])
+            if product is None:
+                continue
+            previous_category = product.get('category')
+            product = MOCK_STORE.update(data['id'], {
+                key: value for key, value in data.items()
+                if key in UPDATABLE_FIELDS and value is not None
+            })
+            updated[product['id']] = (previous_category, product)
+
+    tags = set()
+    for index in valid:
+        product_id = items[index]['id']
+        if product_id not in updated:
+            results[index] = {"index": index, "status": "error", "message": f"Product {product_id} not found"}
+            continue
+        previous_category, product = updated[product_id]
+        results[index] = {"index": index, "status": "updated", "data": product}
+        tags |= product_tags(product_id, previous_category, product.get('category'))
+    invalidate_cache(tags)
+
+    return bulk_response(results)
+
 @app.route('/products/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
     """Delete a product (soft delete)."""
     if USE_DATABASE:
-        existing = execute_query("SELECT id FROM products WHERE id = %s", (product_id,), fetch_one=True)
-        if existing is None:
+        product = execute_query(
+            "UPDATE products SET is_active = FALSE WHERE id = %s RETURNING id, category", (product_id,), fetch_one=True
+        )
+        if product is None:
             return jsonify({"status": "error", "message": f"Product {product_id} not found"}), 404
-
-        execute_query("UPDATE products SET is_active = FALSE WHERE id = %s", (product_id,))
     else:
-        product = next((p for p in MOCK_PRODUCTS if p['id'] == product_id), None)
+        product = MOCK_STORE.update(product_id, {"is_active": False})
         if product is None:
             return jsonify({"status": "error", "message": f"Product {product_id} not found"}), 404
-        product['is_active'] = False
+
+    invalidate_cache(product_tags(product_id, product.get('category')))
 
     return jsonify({
         "status": "success",
@@ -311,14 +1400,20 @@ def delete_product(product_id):
     })
 
 @app.route('/products/<int:product_id>/orders', methods=['GET'])
+@cached_response(lambda product_id: {f"product:{product_id}", f"orders:{product_id}"})
 def get_product_orders(product_id):
-    """Get the last 10 orders containing this product."""
+    """
+    Get the last 10 orders containing this product.
+
+    With ?format=ndjson every order line for the product is streamed,
+    newest first, one JSON object per line.
+    """
     limit = request.args.get('limit', 10, type=int)
     limit = min(limit, 50)
 
     if USE_DATABASE:
         # First verify product exists
-        product = execute_query("SELECT * FROM products WHERE id = %s", (product_id,), fetch_one=True)
+        product = execute_query("SELECT * FROM products WHERE id = %s", (product_id,), fetch_one=True, read_only=True)
         if product is None:
             return jsonify({"status": "error", "message": f"Product {product_id} not found"}), 404
 
@@ -342,19 +1437,23 @@ def get_product_orders(product_id):
             INNER JOIN customers c ON o.customer_id = c.id
             WHERE p.id = %s
             ORDER BY o.order_date DESC
-            LIMIT %s
         """
-        orders = execute_query(orders_query, (product_id, limit))
-        orders = [serialize_row(o) for o in orders]
-        product = serialize_row(product)
+        if wants_stream():
+            return ndjson_response(stream_query(orders_query, (product_id,)))
+
+        orders_query += " LIMIT %s"
+        orders = execute_query(orders_query, (product_id, limit), read_only=True)
     else:
-        product = next((p for p in MOCK_PRODUCTS if p['id'] == product_id), None)
+        product = MOCK_STORE.get(product_id)
         if product is None:
             return jsonify({"status": "error", "message": f"Product {product_id} not found"}), 404
 
-        orders = [o for o in MOCK_ORDERS if o['product_id'] == product_id][:limit]
+        orders = [o for o in MOCK_ORDERS if o['product_id'] == product_id]
+        if wants_stream():
+            return ndjson_response([orders])
+        orders = orders[:limit]
 
-    return jsonify({
+    return Response(dump_json({
         "status": "success",
         "product": {
             "id": product['id'],
@@ -364,34 +1463,193 @@ def get_product_orders(product_id):
         },
         "orders_count": len(orders),
         "orders": orders
-    })
+    }), mimetype='application/json')
+
+class OutOfStock(Exception):
+    """Some order items could not be reserved; the transaction is rolled back."""
+
+    def __init__(self, product_ids):
+        super().__init__(f"Insufficient stock for products {product_ids}")
+        self.product_ids = product_ids
+
+# Reserve stock and write the order in one statement. Products are locked in
+# id order, so concurrent orders over the same products queue up instead of
+# deadlocking, and each reservation re-checks the stock it finds once it holds
+# the lock. The order is only inserted if every item was reserved.
+PLACE_ORDER_SQL = """
+    WITH wanted (product_id, quantity) AS (
+        SELECT * FROM unnest(%(product_ids)s::int[], %(quantities)s::int[])
+    ),
+    locked AS (
+        SELECT p.id
+        FROM products p
+        JOIN wanted w ON w.product_id = p.id
+        ORDER BY p.id
+        FOR UPDATE OF p
+    ),
+    reserved AS (
+        UPDATE products p
+        SET stock_quantity = p.stock_quantity - w.quantity,
+            updated_at = CURRENT_TIMESTAMP
+        FROM wanted w, locked l
+        WHERE p.id = w.product_id
+          AND l.id = p.id
+          AND p.is_active
+          AND p.stock_quantity >= w.quantity
+        RETURNING p.id, p.price, p.category, w.quantity
+    ),
+    new_order AS (
+        INSERT INTO orders (customer_id, shipping_address, notes, total_amount)
+        SELECT %(customer_id)s, %(shipping_address)s, %(notes)s, SUM(price * quantity)
+        FROM reserved
+        HAVING COUNT(*) = cardinality(%(product_ids)s::int[])
+        RETURNING *
+    ),
+    new_items AS (
+        INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+        SELECT o.id, r.id, r.quantity, r.price
+        FROM new_order o, reserved r
+        RETURNING order_id, product_id, quantity, unit_price, subtotal
+    )
+    SELECT
+        (SELECT row_to_json(o) FROM new_order o) AS placed_order,
+        (SELECT json_agg(i ORDER BY i.product_id) FROM new_items i) AS items,
+        ARRAY(SELECT id FROM reserved) AS reserved_ids,
+        ARRAY(SELECT DISTINCT category FROM reserved WHERE category IS NOT NULL) AS categories
+"""
+
+@app.route('/orders', methods=['POST'])
+def place_order():
+    """
+    Place an order, reserving its stock atomically.
+
+    Body: {"customer_id": 1, "items": [{"product_id": 1, "quantity": 2}],
+    "shipping_address": "...", "notes": "..."}. Either every item is
+    reserved and the order is created (201), or nothing changes and the
+    products that could not be reserved are listed (409). Deadlocks and
+    serialization failures are retried up to ORDER_ATTEMPTS times.
+    """
+    data = request.get_json(silent=True) or {}
+    customer_id = data.get('customer_id')
+    items = data.get('items')
+    if not isinstance(customer_id, int):
+        return jsonify({"status": "error", "message": "Integer customer_id is required"}), 400
+    if not isinstance(items, list) or not items:
+        return jsonify({"status": "error", "message": "At least one item is required"}), 400
+
+    # One line per product, in id order (the order rows are locked in)
+    quantities = {}
+    for item in items:
+        if (not isinstance(item, dict) or not isinstance(item.get('product_id'), int)
+                or not isinstance(item.get('quantity'), int) or item['quantity'] <= 0):
+            return jsonify({"status": "error", "message": "Each item needs a product_id and a positive quantity"}), 400
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    product_ids = sorted(quantities)
+
+    if USE_DATABASE:
+        params = {
+            "product_ids": product_ids,
+            "quantities": [quantities[i] for i in product_ids],
+            "customer_id": customer_id,
+            "shipping_address": data.get('shipping_address'),
+            "notes": data.get('notes'),
+        }
+
+        def place(cursor):
+            cursor.execute(PLACE_ORDER_SQL, params)
+            order, order_items, reserved_ids, categories = cursor.fetchone()
+            if order is None:
+                raise OutOfStock(sorted(set(product_ids) - set(reserved_ids)))
+            order['items'] = order_items
+            return order, categories
+
+        for attempt in range(1, ORDER_ATTEMPTS + 1):
+            try:
+                order, categories = execute_transaction(place)
+                break
+            except OutOfStock as e:
+                return jsonify({"status": "error", "message": "Insufficient stock",
+                                "unavailable": e.product_ids}), 409
+            except psycopg2.errors.ForeignKeyViolation:
+                return jsonify({"status": "error", "message": f"Customer {customer_id} not found"}), 400
+            except psycopg2.extensions.TransactionRollbackError:
+                # Deadlock or serialization failure: back off and try again
+                if attempt == ORDER_ATTEMPTS:
+                    return jsonify({"status": "error", "message": "Too much contention, try again"}), 503
+                clock.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+    else:
+        products, unavailable = MOCK_STORE.reserve({i: quantities[i] for i in product_ids})
+        if unavailable:
+            return jsonify({"status": "error", "message": "Insufficient stock", "unavailable": unavailable}), 409
+        order_id = max((o['order_id'] for o in MOCK_ORDERS), default=0) + 1
+        order_date = datetime.utcnow().isoformat()
+        order = {
+            "id": order_id,
+            "customer_id": customer_id,
+            "order_date": order_date,
+            "status": "pending",
+            "total_amount": round(sum(p['price'] * quantities[p['id']] for p in products), 2),
+            "shipping_address": data.get('shipping_address'),
+            "notes": data.get('notes'),
+            "items": [
+                {"order_id": order_id, "product_id": p['id'], "quantity": quantities[p['id']],
+                 "unit_price": p['price'], "subtotal": round(p['price'] * quantities[p['id']], 2)}
+                for p in products
+            ]
+        }
+        for p in products:
+            MOCK_ORDERS.insert(0, {"order_id": order_id, "customer_name": f"Customer {customer_id}",
+                                   "product_id": p['id'], "quantity": quantities[p['id']],
+                                   "order_date": order_date, "status": "pending"})
+        categories = {p.get('category') for p in products}
+
+    tags = {f"orders:{i}" for i in product_ids}
+    for product_id in product_ids:
+        tags |= product_tags(product_id, *categories)
+    invalidate_cache(tags)
+
+    return jsonify({
+        "status": "success",
+        "message": "Order placed successfully",
+        "data": order
+    }), 201
 
 @app.route('/categories', methods=['GET'])
+@cached_response(lambda: {"categories"})
 def get_categories():
-    """Get all unique categories."""
+    """
+    Get all categories with their number of active products.
+
+    Counts come from the category_stats read model
+    (Database/examples/05_category_stats.sql), kept current by triggers,
+    so this reads one row per category instead of scanning products.
+    Databases without the read model are counted with GROUP BY instead.
+    """
     if USE_DATABASE:
         query = """
-            SELECT category, COUNT(*) as product_count
-            FROM products
-            WHERE is_active = TRUE AND category IS NOT NULL
-            GROUP BY category
+            SELECT category, product_count
+            FROM category_stats
             ORDER BY product_count DESC
         """
-        categories = execute_query(query)
-        categories = [serialize_row(c) for c in categories]
+        try:
+            categories = execute_query(query, read_only=True)
+        except psycopg2.errors.UndefinedTable:
+            query = """
+                SELECT category, COUNT(*) AS product_count
+                FROM products
+                WHERE is_active = TRUE AND category IS NOT NULL
+                GROUP BY category
+                ORDER BY product_count DESC
+            """
+            categories = execute_query(query, read_only=True)
     else:
-        category_counts = {}
-        for p in MOCK_PRODUCTS:
-            cat = p.get('category')
-            if cat:
-                category_counts[cat] = category_counts.get(cat, 0) + 1
-        categories = [{"category": k, "product_count": v} for k, v in category_counts.items()]
+        categories = [{"category": k, "product_count": v} for k, v in MOCK_STORE.category_counts()]
 
-    return jsonify({
+    return Response(dump_json({
         "status": "success",
         "count": len(categories),
         "data": categories
-    })
+    }), mimetype='application/json')
 
 # ============================================
 # ERROR HANDLERS
@@ -416,6 +1674,7 @@ if __name__ == '__main__':
     print(f"  Database: {'Connected' if USE_DATABASE else 'Using Mock Data'}")
     print(f"  Documentation: http://localhost:5000/")
     print(f"  Health Check: http://localhost:5000/health")
+    print(f"  Metrics: http://localhost:5000/metrics")
     print("=" * 50 + "\n")
 
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,86 @@
+"""
+Order Placement Benchmark
+Hammers POST /orders for a single hot product from many threads and
+reports sustained orders/sec, the way a flash sale hits one SKU.
+
+Before running:
+1. Make sure the API is running: python app.py
+2. Install requests: pip install requests
+
+Usage:
+    python benchmark_orders.py --product-id 1 --workers 32 --seconds 30
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# API Base URL
+BASE_URL = "http://localhost:5000"
+
+
+def place_orders(base_url, product_id, customer_id, deadline, stats, lock):
+    """Place one-unit orders until the deadline, tallying outcomes."""
+    session = requests.Session()
+    order = {"customer_id": customer_id, "items": [{"product_id": product_id, "quantity": 1}]}
+    while time.time() < deadline:
+        start = time.perf_counter()
+        response = session.post(f"{base_url}/orders", json=order)
+        elapsed = time.perf_counter() - start
+        with lock:
+            stats["latencies"].append(elapsed)
+            stats[response.status_code] = stats.get(response.status_code, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark POST /orders on one hot product")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--product-id", type=int, default=1)
+    parser.add_argument("--customer-id", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--stock", type=int, default=1_000_000,
+                        help="Stock to give the product first, so it does not sell out mid-run")
+    args = parser.parse_args()
+
+    response = requests.put(f"{args.base_url}/products/{args.product_id}",
+                            json={"stock_quantity": args.stock})
+    if response.status_code != 200:
+        print(f"Could not set stock for product {args.product_id}: {response.status_code}")
+        return
+
+    print(f"Placing orders for product {args.product_id} with {args.workers} workers for {args.seconds}s...")
+    stats = {"latencies": []}
+    lock = threading.Lock()
+    deadline = time.time() + args.seconds
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for _ in range(args.workers):
+            pool.submit(place_orders, args.base_url, args.product_id, args.customer_id, deadline, stats, lock)
+    duration = time.time() - started
+
+    latencies = sorted(stats.pop("latencies"))
+    placed = stats.get(201, 0)
+    print(f"\n{'='*60}")
+    print(" Results")
+    print(f"{'='*60}")
+    print(f"Orders placed:      {placed} ({placed / duration:.1f} orders/sec)")
+    print(f"Out of stock (409): {stats.get(409, 0)}")
+    print(f"Contention (503):   {stats.get(503, 0)}")
+    other = {code: count for code, count in stats.items() if code not in (201, 409, 503)}
+    if other:
+        print(f"Other responses:    {other}")
+    if latencies:
+        print(f"Latency p50:        {latencies[len(latencies) // 2] * 1000:.1f} ms")
+        print(f"Latency p99:        {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+    response = requests.get(f"{args.base_url}/products/{args.product_id}")
+    remaining = response.json()['data']['stock_quantity']
+    print(f"Stock left:         {remaining} (expected {args.stock - placed})")
+
+
+if __name__ == "__main__":
+    main()
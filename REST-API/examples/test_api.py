@@ -52,6 +52,14 @@ def main():
     response = requests.get(f"{BASE_URL}/products", params={"min_price": 50, "max_price": 200})
     print_response("Products $50-$200", response)
 
+    # 5b. Page Through Products (keyset cursor)
+    response = requests.get(f"{BASE_URL}/products", params={"limit": 2})
+    print_response("Products Page 1 (limit=2)", response)
+    next_cursor = response.json().get('next_cursor')
+    if next_cursor:
+        response = requests.get(f"{BASE_URL}/products", params={"limit": 2, "cursor": next_cursor})
+        print_response("Products Page 2", response)
+
     # 6. Get Single Product
     response = requests.get(f"{BASE_URL}/products/1")
     print_response("Product ID: 1", response)
@@ -80,6 +88,23 @@ def main():
         response = requests.delete(f"{BASE_URL}/products/{new_product_id}")
         print_response(f"Delete Product {new_product_id}", response)
 
+    # 9b. Bulk Create, Bulk Update and Get by IDs
+    response = requests.post(f"{BASE_URL}/products/bulk", json=[
+        {"name": "Bulk Product A", "price": 10.00, "category": "Test"},
+        {"name": "Bulk Product B", "price": 20.00, "category": "Test"},
+        {"name": "Missing Price"}
+    ])
+    print_response("Bulk Create (one invalid item)", response)
+    bulk_ids = [r['data']['id'] for r in response.json().get('results', []) if r['status'] == 'created']
+    if bulk_ids:
+        response = requests.patch(f"{BASE_URL}/products/bulk", json=[
+            {"id": product_id, "stock_quantity": 5} for product_id in bulk_ids
+        ])
+        print_response("Bulk Update", response)
+
+        response = requests.get(f"{BASE_URL}/products", params={"ids": ",".join(map(str, bulk_ids))})
+        print_response("Get Products by IDs", response)
+
     # 10. Get Orders for Product (with JOIN)
     response = requests.get(f"{BASE_URL}/products/1/orders")
     print_response("Last 10 Orders for Product 1", response)
@@ -0,0 +1,75 @@
+"""Shared setup for the API tests: every test runs against the mock store."""
+
+import os
+import sys
+from collections import namedtuple
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as api  # noqa: E402
+
+# An entry of cursor.description: the fields row_serializer reads
+Column = namedtuple("Column", "name type_code")
+
+
+class FakeCursor:
+    """Cursor that records statements and returns its connection's rows."""
+
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.description = conn.description
+        self.rowcount = 1
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.conn.rows[0] if self.conn.rows else None
+
+    def fetchmany(self, size):
+        rows = self.conn.rows[self.position:self.position + size]
+        self.position += len(rows)
+        return rows
+
+
+class FakeConnection:
+    """Connection whose cursors answer every query with the same rows."""
+
+    def __init__(self, rows=(), description=None, host=None):
+        self.rows = list(rows)
+        self.description = description
+        self.host = host
+        self.executed = []
+        self.cursor_names = []
+        self.committed = False
+        self.closed = False
+
+    def cursor(self, name=None):
+        self.cursor_names.append(name)
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A test client on a fresh mock catalog with an empty response cache."""
+    monkeypatch.setattr(api, "USE_DATABASE", False)
+    monkeypatch.setattr(api, "MOCK_STORE", api.MockProductStore(api.MOCK_PRODUCTS))
+    api.clear_cache()
+    yield api.app.test_client()
+    api.clear_cache()
@@ -0,0 +1,83 @@
+"""Tests for the response cache: hits, ETags, invalidation and eviction."""
+
+import app as api
+
+
+def test_repeat_get_is_served_from_cache(client):
+    first = client.get("/products/1")
+    hits = api.CACHE_STATS["hits"]
+
+    second = client.get("/products/1")
+
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert api.CACHE_STATS["hits"] == hits + 1
+
+
+def test_matching_etag_returns_304(client):
+    etag = client.get("/products/1").headers["ETag"]
+
+    response = client.get("/products/1", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_update_invalidates_detail_and_changes_etag(client):
+    before = client.get("/products/1")
+
+    client.put("/products/1", json={"price": 999.0})
+    after = client.get("/products/1", headers={"If-None-Match": before.headers["ETag"]})
+
+    assert after.status_code == 200
+    assert after.get_json()["data"]["price"] == 999.0
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+
+def test_create_invalidates_lists_and_categories(client):
+    client.get("/products")
+    client.get("/categories")
+
+    client.post("/products", json={"name": "Desk Lamp", "price": 19.5, "category": "Home"})
+
+    names = [p["name"] for p in client.get("/products").get_json()["data"]]
+    categories = {c["category"] for c in client.get("/categories").get_json()["data"]}
+    assert "Desk Lamp" in names
+    assert "Home" in categories
+
+
+def test_response_rendered_during_invalidation_is_not_stored(client, monkeypatch):
+    store = api.MOCK_STORE
+
+    class WriteDuringRead:
+        def get(self, product_id):
+            product = dict(store.get(product_id))
+            # A write lands after the read but before the response is stored
+            api.invalidate_cache({f"product:{product_id}"})
+            return product
+
+    monkeypatch.setattr(api, "MOCK_STORE", WriteDuringRead())
+    client.get("/products/1")
+
+    assert "/products/1" not in api.RESPONSE_CACHE
+
+
+def test_least_recently_used_entry_is_evicted(client, monkeypatch):
+    monkeypatch.setattr(api, "CACHE_MAX_ENTRIES", 2)
+
+    client.get("/products/1")
+    client.get("/products/2")
+    client.get("/products/1")
+    client.get("/products/3")
+
+    assert list(api.RESPONSE_CACHE) == ["/products/1", "/products/3"]
+
+
+def test_expired_entries_are_swept(client, monkeypatch):
+    client.get("/products/1")
+    api.RESPONSE_CACHE["/products/1"]["expires"] = 0
+    monkeypatch.setattr(api, "_next_cache_sweep", 0.0)
+
+    client.get("/products/2")
+
+    assert list(api.RESPONSE_CACHE) == ["/products/2"]
@@ -0,0 +1,29 @@
+"""Tests for GET /categories."""
+
+import app as api
+
+
+def test_mock_categories_count_active_products(client):
+    data = client.get("/categories").get_json()["data"]
+
+    assert data == [{"category": "Electronics", "product_count": 5}]
+
+
+def test_falls_back_to_group_by_without_category_stats(client, monkeypatch):
+    queries = []
+
+    def execute_query(query, params=None, fetch_one=False, read_only=False):
+        queries.append(query)
+        if "category_stats" in query:
+            raise api.psycopg2.errors.UndefinedTable()
+        return [{"category": "Books", "product_count": 3}]
+
+    monkeypatch.setattr(api, "USE_DATABASE", True)
+    monkeypatch.setattr(api, "_listener_started", True)
+    monkeypatch.setattr(api, "execute_query", execute_query)
+
+    response = client.get("/categories")
+
+    assert response.status_code == 200
+    assert response.get_json()["data"] == [{"category": "Books", "product_count": 3}]
+    assert "GROUP BY category" in queries[1]
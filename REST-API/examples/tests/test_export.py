@@ -0,0 +1,70 @@
+"""Tests for NDJSON exports streamed with ?format=ndjson."""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from conftest import Column, FakeConnection
+
+import app as api
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.fixture
+def database(client, monkeypatch):
+    """A fake database holding five products, streamed two rows at a time."""
+    conn = FakeConnection(
+        [(i, Decimal(f"{i}.50"), datetime(2024, 1, 10 - i)) for i in range(1, 6)],
+        description=[Column("id", 23), Column("price", 1700), Column("created_at", 1114)]
+    )
+    monkeypatch.setattr(api, "USE_DATABASE", True)
+    monkeypatch.setattr(api, "_listener_started", True)
+    monkeypatch.setattr(api, "STREAM_BATCH_SIZE", 2)
+    monkeypatch.setattr(api, "get_db_connection", lambda read_only=False: conn)
+    return conn
+
+
+def test_mock_export_streams_every_matching_product(client):
+    response = client.get("/products?format=ndjson&max_price=100")
+
+    assert response.mimetype == "application/x-ndjson"
+    assert response.is_streamed
+    assert [p["id"] for p in ndjson(response)] == [4, 3, 2]
+
+
+def test_stream_query_yields_batches_from_a_server_side_cursor(database):
+    batches = list(api.stream_query("SELECT id, price, created_at FROM products"))
+
+    assert [len(rows) for rows in batches] == [2, 2, 1]
+    assert batches[0][0] == {"id": 1, "price": 1.5, "created_at": "2024-01-09T00:00:00"}
+    assert database.cursor_names[0].startswith("export_")
+    assert database.closed
+
+
+def test_database_export_writes_one_json_object_per_line(client, database):
+    response = client.get("/products?format=ndjson&category=Books")
+
+    body = response.get_data(as_text=True)
+    assert body.endswith("}\n")
+    assert [row["id"] for row in ndjson(response)] == [1, 2, 3, 4, 5]
+    sql, params = database.executed[0]
+    # The whole result is exported: no page size, no cursor
+    assert sql.endswith("ORDER BY created_at DESC, id DESC")
+    assert params == ["Books"]
+    assert not api.RESPONSE_CACHE
+
+
+def test_order_export_streams_all_order_lines(client, monkeypatch):
+    monkeypatch.setattr(api, "MOCK_ORDERS", [
+        {"order_id": n, "product_id": 1 if n % 2 else 2} for n in range(1, 121)
+    ])
+
+    response = client.get("/products/1/orders?format=ndjson")
+
+    # More than the JSON endpoint's 50-order cap, and only product 1's
+    assert len(ndjson(response)) == 60
+    assert all(order["product_id"] == 1 for order in ndjson(response))
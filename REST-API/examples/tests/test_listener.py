@@ -0,0 +1,84 @@
+"""Tests for the cross-worker invalidation listener."""
+
+import pytest
+
+import app as api
+
+
+class StopListening(BaseException):
+    pass
+
+
+def test_apply_change_evicts_tagged_entries(client):
+    client.get("/products/1")
+    client.get("/products/2")
+
+    api.apply_change({"products": [1], "categories": ["Electronics"]})
+
+    assert list(api.RESPONSE_CACHE) == ["/products/2"]
+
+
+def test_listener_survives_unexpected_errors(client, monkeypatch):
+    client.get("/products/1")
+    attempts = []
+
+    def connect(**config):
+        attempts.append(config)
+        raise ValueError("not a database error")
+
+    def sleep(seconds):
+        if len(attempts) == 2:
+            raise StopListening()
+
+    monkeypatch.setattr(api.psycopg2, "connect", connect)
+    monkeypatch.setattr(api.clock, "sleep", sleep)
+
+    with pytest.raises(StopListening):
+        api.listen_for_changes()
+
+    # It kept reconnecting, and dropped what it could no longer invalidate
+    assert len(attempts) == 2
+    assert not api.RESPONSE_CACHE
+
+
+class DeadCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if sql == "SELECT 1":
+            raise api.psycopg2.OperationalError("server closed the connection")
+
+
+class DeadConnection:
+    """A connection whose server went away without closing the socket."""
+
+    def cursor(self):
+        return DeadCursor()
+
+    def close(self):
+        pass
+
+
+def test_listener_reconnects_when_a_quiet_connection_died(monkeypatch):
+    attempts = []
+
+    def connect(**config):
+        attempts.append(config)
+        return DeadConnection()
+
+    def sleep(seconds):
+        raise StopListening()
+
+    monkeypatch.setattr(api.psycopg2, "connect", connect)
+    monkeypatch.setattr(api.select, "select", lambda *args: ([], [], []))
+    monkeypatch.setattr(api.clock, "sleep", sleep)
+
+    with pytest.raises(StopListening):
+        api.listen_for_changes()
+
+    # The timeout check found the dead connection and went on to reconnect
+    assert len(attempts) == 1
@@ -0,0 +1,48 @@
+"""Tests for the Prometheus metrics at /metrics."""
+
+import app as api
+
+
+def samples(text, prefix):
+    """Sample lines starting with prefix, as {series: value}."""
+    found = {}
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            series, value = line.rsplit(" ", 1)
+            found[series] = float(value)
+    return found
+
+
+def test_histogram_buckets_include_their_upper_bound():
+    histogram = api.Histogram("demo_seconds", "Demo", ("route",), (1, 5))
+    for value in (1, 1.5, 5, 7):
+        histogram.observe(("/x",), value)
+
+    lines = samples("\n".join(histogram.render()), "demo_seconds")
+
+    assert lines == {
+        'demo_seconds_bucket{route="/x",le="1"}': 1,
+        'demo_seconds_bucket{route="/x",le="5"}': 3,
+        'demo_seconds_bucket{route="/x",le="+Inf"}': 4,
+        'demo_seconds_sum{route="/x"}': 14.5,
+        'demo_seconds_count{route="/x"}': 4,
+    }
+
+
+def test_metrics_endpoint_reports_request_histograms(client):
+    client.get("/products/1")
+
+    text = client.get("/metrics").get_data(as_text=True)
+
+    route = 'method="GET",route="/products/<int:product_id>"'
+    duration = samples(text, f'http_request_duration_seconds_bucket{{{route},status="200"')
+    counts = list(duration.values())
+    assert len(counts) == len(api.LATENCY_BUCKETS) + 1
+    assert counts == sorted(counts)
+    assert counts[-1] >= 1
+
+    size = samples(text, f"http_response_size_bytes_bucket{{{route}")
+    # A single product is more than 100 bytes and less than 1000
+    assert size[f'http_response_size_bytes_bucket{{{route},le="100"}}'] == 0
+    assert size[f'http_response_size_bytes_bucket{{{route},le="1000"}}'] >= 1
+    assert "# TYPE http_request_duration_seconds histogram" in text
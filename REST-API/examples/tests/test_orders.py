@@ -0,0 +1,65 @@
+"""Tests for POST /orders: stock is reserved for every item or for none."""
+
+import pytest
+from conftest import FakeConnection
+
+import app as api
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    """The mock order history, restored after the test."""
+    history = list(api.MOCK_ORDERS)
+    monkeypatch.setattr(api, "MOCK_ORDERS", history)
+    return history
+
+
+def test_order_reserves_stock(client, orders):
+    response = client.post("/orders", json={"customer_id": 7, "items": [
+        {"product_id": 1, "quantity": 2},
+        {"product_id": 2, "quantity": 1},
+        {"product_id": 1, "quantity": 1},
+    ]})
+
+    assert response.status_code == 201
+    assert response.get_json()["data"]["total_amount"] == round(3 * 1299.99 + 29.99, 2)
+    assert api.MOCK_STORE.get(1)["stock_quantity"] == 47
+    assert api.MOCK_STORE.get(2)["stock_quantity"] == 199
+    assert len(orders) == 5
+
+
+def test_insufficient_stock_changes_nothing(client, orders):
+    client.get("/products/2")
+
+    response = client.post("/orders", json={"customer_id": 7, "items": [
+        {"product_id": 2, "quantity": 1},
+        {"product_id": 5, "quantity": 76},
+    ]})
+
+    assert response.status_code == 409
+    assert response.get_json()["unavailable"] == [5]
+    assert api.MOCK_STORE.get(2)["stock_quantity"] == 200
+    assert api.MOCK_STORE.get(5)["stock_quantity"] == 75
+    assert len(orders) == 3
+    # Nothing was written, so nothing was invalidated
+    assert "/products/2" in api.RESPONSE_CACHE
+
+
+def test_database_order_short_of_stock_is_not_committed(client, monkeypatch):
+    # The CTE reserved product 1 but not 2, so it inserted no order
+    conn = FakeConnection([(None, None, [1], ["Electronics"])])
+    monkeypatch.setattr(api, "USE_DATABASE", True)
+    monkeypatch.setattr(api, "_listener_started", True)
+    monkeypatch.setattr(api, "get_db_connection", lambda read_only=False: conn)
+
+    response = client.post("/orders", json={"customer_id": 7, "items": [
+        {"product_id": 2, "quantity": 5},
+        {"product_id": 1, "quantity": 1},
+    ]})
+
+    assert response.status_code == 409
+    assert response.get_json()["unavailable"] == [2]
+    assert conn.executed[0][1]["product_ids"] == [1, 2]
+    # Closing without a commit rolls back the reservation of product 1
+    assert not conn.committed
+    assert conn.closed
@@ -0,0 +1,95 @@
+"""Tests for keyset pagination of GET /products."""
+
+from datetime import datetime
+
+import app as api
+
+PRODUCTS = [
+    {"id": i, "name": f"Product {i}", "price": price, "category": category,
+     "sku": f"SKU-{i}", "is_active": True, "created_at": created_at}
+    for i, price, category, created_at in [
+        (1, 10.0, "Books", "2024-01-01T09:00:00"),
+        (2, 20.0, "Books", "2024-01-02T09:00:00"),
+        (3, 30.0, "Toys", "2024-01-02T09:00:00"),
+        (4, 40.0, "Books", "2024-01-02T09:00:00"),
+        (5, 50.0, "Toys", "2024-01-03T09:00:00"),
+        (6, 60.0, "Books", "2024-01-04T09:00:00"),
+        (7, 70.0, "Books", "2024-01-05T09:00:00"),
+    ]
+]
+
+
+def all_pages(client, url):
+    """Follow next_cursor from url and return the ids of every page."""
+    pages = []
+    response = client.get(url).get_json()
+    pages.append([p["id"] for p in response["data"]])
+    while response["next_cursor"]:
+        response = client.get(f"{url}&cursor={response['next_cursor']}").get_json()
+        pages.append([p["id"] for p in response["data"]])
+    return pages
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 2, 9, 30, 15, 250)
+
+    assert api.decode_cursor(api.encode_cursor(created_at, 42)) == (created_at, 42)
+    # Mock rows carry ISO strings rather than datetimes
+    assert api.decode_cursor(api.encode_cursor("2024-01-02T09:00:00", 3)) == \
+        (datetime(2024, 1, 2, 9), 3)
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/products?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+
+
+def test_pages_cover_every_product_once_with_tied_timestamps(client, monkeypatch):
+    monkeypatch.setattr(api, "MOCK_STORE", api.MockProductStore(PRODUCTS))
+
+    # Products 2, 3 and 4 share created_at, and the id breaks the tie
+    assert all_pages(client, "/products?limit=2") == [[7, 6], [5, 4], [3, 2], [1]]
+
+
+def test_pages_stay_stable_when_products_are_added_between_fetches(client, monkeypatch):
+    monkeypatch.setattr(api, "MOCK_STORE", api.MockProductStore(PRODUCTS))
+    first = client.get("/products?limit=3").get_json()
+
+    created = client.post("/products", json={"name": "New", "price": 5.0, "category": "Books"})
+    second = client.get(f"/products?limit=3&cursor={first['next_cursor']}").get_json()
+
+    assert created.status_code == 201
+    # The new product sorts before the cursor, so nothing shifts or repeats
+    assert [p["id"] for p in first["data"]] == [7, 6, 5]
+    assert [p["id"] for p in second["data"]] == [4, 3, 2]
+
+
+def test_cursor_combines_with_category_and_price_filters(client, monkeypatch):
+    monkeypatch.setattr(api, "MOCK_STORE", api.MockProductStore(PRODUCTS))
+
+    pages = all_pages(client, "/products?limit=2&category=Books&min_price=15&max_price=65")
+
+    assert pages == [[6, 4], [2]]
+
+
+def test_database_query_seeks_past_the_cursor(client, monkeypatch):
+    calls = []
+
+    def execute_query(query, params=None, **kwargs):
+        calls.append((" ".join(query.split()), params))
+        return []
+
+    monkeypatch.setattr(api, "USE_DATABASE", True)
+    monkeypatch.setattr(api, "_listener_started", True)
+    monkeypatch.setattr(api, "execute_query", execute_query)
+    cursor = api.encode_cursor(datetime(2024, 1, 2, 9), 4)
+
+    client.get(f"/products?category=Books&min_price=15&limit=2&cursor={cursor}")
+
+    query, params = calls[0]
+    assert query.endswith(
+        "AND category = %s AND price >= %s AND (created_at, id) < (%s, %s) "
+        "ORDER BY created_at DESC, id DESC LIMIT %s"
+    )
+    assert params == ["Books", 15.0, datetime(2024, 1, 2, 9), 4, 3]
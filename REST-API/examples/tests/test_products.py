@@ -0,0 +1,92 @@
+"""Tests for product writes against the mock store."""
+
+from conftest import Column, FakeConnection
+
+import app as api
+
+
+def test_update_rejects_non_numeric_price(client):
+    response = client.put("/products/1", json={"price": "cheap"})
+
+    assert response.status_code == 400
+    assert api.MOCK_STORE.get(1)["price"] == 1299.99
+    # The price index is intact: range filters still work
+    assert client.get("/products?min_price=1000").status_code == 200
+
+
+def test_update_ignores_fields_outside_the_whitelist(client):
+    response = client.put("/products/1", json={"created_at": 5, "sku": "NEW", "name": "Laptop Air"})
+
+    assert response.status_code == 200
+    product = api.MOCK_STORE.get(1)
+    assert (product["name"], product["created_at"], product["sku"]) == \
+        ("Laptop Air", "2024-01-10T09:00:00", "ELEC-001")
+    assert 1 in [p["id"] for p in client.get("/products").get_json()["data"]]
+
+
+def test_update_validates_is_active_and_can_reactivate(client):
+    assert client.put("/products/1", json={"is_active": "no"}).status_code == 400
+
+    client.delete("/products/1")
+    assert 1 not in [p["id"] for p in client.get("/products").get_json()["data"]]
+
+    assert client.put("/products/1", json={"is_active": True}).status_code == 200
+    assert 1 in [p["id"] for p in client.get("/products").get_json()["data"]]
+
+
+def test_bulk_update_reports_bad_price_per_item(client):
+    response = client.patch("/products/bulk", json=[
+        {"id": 1, "price": "cheap"},
+        {"id": 2, "price": 25.0},
+    ])
+
+    results = response.get_json()["results"]
+    assert response.status_code == 207
+    assert results[0]["status"] == "error"
+    assert results[1]["data"]["price"] == 25.0
+
+
+def test_bulk_create_reports_taken_skus_per_item(client, monkeypatch):
+    taken = {"ELEC-001"}
+
+    conn = FakeConnection(description=[Column("id", 23), Column("name", 25), Column("sku", 25)])
+
+    def execute_values(cursor, sql, rows, **kwargs):
+        # ON CONFLICT (sku) DO NOTHING: taken SKUs return no row
+        assert "ON CONFLICT (sku) DO NOTHING" in sql
+        inserted = [row for row in rows if row[-1] not in taken]
+        created = [(100 + i, row[1], row[-1]) for i, row in enumerate(inserted)]
+        return created[::-1]
+
+    monkeypatch.setattr(api, "USE_DATABASE", True)
+    monkeypatch.setattr(api, "_listener_started", True)
+    monkeypatch.setattr(api, "execute_values", execute_values)
+    monkeypatch.setattr(api, "execute_transaction", lambda work: work(conn.cursor()))
+
+    response = client.post("/products/bulk", json=[
+        {"name": "Lamp", "price": 10, "sku": "HOME-001"},
+        {"name": "Laptop", "price": 10, "sku": "ELEC-001"},
+        {"name": "Rug", "price": 10},
+    ])
+
+    results = response.get_json()["results"]
+    assert response.status_code == 207
+    assert results[0]["data"] == {"id": 100, "name": "Lamp", "sku": "HOME-001"}
+    assert results[1] == {"index": 1, "status": "error", "message": "SKU ELEC-001 already exists"}
+    assert results[2]["data"] == {"id": 101, "name": "Rug", "sku": None}
+
+
+def test_create_rejects_boolean_price(client):
+    response = client.post("/products", json={"name": "Lamp", "price": True})
+
+    assert response.status_code == 400
+    assert len(api.MOCK_STORE) == len(api.MOCK_PRODUCTS)
+
+
+def test_create_rejects_non_integer_stock(client):
+    for stock in ("10", 2.5, -1, True):
+        response = client.post("/products", json={"name": "Lamp", "price": 10, "stock_quantity": stock})
+        assert response.status_code == 400
+
+    response = client.put("/products/1", json={"stock_quantity": "10"})
+    assert response.status_code == 400
@@ -0,0 +1,41 @@
+"""Tests for read replica routing."""
+
+import pytest
+from conftest import FakeConnection
+
+import app as api
+
+
+@pytest.fixture
+def hosts(client, monkeypatch):
+    """Hosts of the connections each read used, with one caught-up replica."""
+    used = []
+
+    def execute_query(query, params=None, fetch_one=False, read_only=False):
+        used.append(api.get_db_connection(read_only).host)
+        return dict(api.MOCK_PRODUCTS[0])
+
+    monkeypatch.setattr(api, "USE_DATABASE", True)
+    # No change listener thread
+    monkeypatch.setattr(api, "_listener_started", True)
+    monkeypatch.setattr(api, "REPLICA_CONFIGS", [{**api.DB_CONFIG, "host": "replica"}])
+    # Replica status of every connection: no lag, caught up
+    monkeypatch.setattr(
+        api.psycopg2, "connect", lambda **config: FakeConnection([(0, True)], host=config["host"])
+    )
+    monkeypatch.setattr(api, "execute_query", execute_query)
+    return used
+
+
+def test_cache_fill_reads_from_primary(client, hosts):
+    client.get("/products/1")
+
+    assert hosts == [api.DB_CONFIG["host"]]
+
+
+def test_uncached_reads_use_replica(client, hosts, monkeypatch):
+    monkeypatch.setattr(api, "CACHE_TTL", 0)
+
+    client.get("/products/1")
+
+    assert hosts == ["replica"]
@@ -0,0 +1,28 @@
+"""Tests for row serialization and JSON encoding."""
+
+from datetime import datetime
+from decimal import Decimal
+
+from conftest import Column
+
+import app as api
+
+
+def test_row_serializer_converts_numeric_and_timestamp_columns():
+    description = [Column("id", 23), Column("price", 1700), Column("created_at", 1114)]
+    serialize = api.row_serializer(description)
+
+    row = serialize((1, Decimal("9.99"), datetime(2024, 1, 10, 9)))
+
+    assert row == {"id": 1, "price": 9.99, "created_at": "2024-01-10T09:00:00"}
+    assert api.row_serializer(description) is serialize
+
+
+def test_read_endpoints_return_json(client):
+    for path in ("/products/1", "/products/1/orders", "/categories"):
+        response = client.get(path)
+        assert response.mimetype == "application/json"
+        assert response.get_json()["status"] == "success"
+
+    orders = client.get("/products/1/orders").get_json()
+    assert orders["orders_count"] == 3
@@ -4,7 +4,7 @@ A complete example of building a semantic search knowledge base.
 
 Prerequisites:
 1. PostgreSQL with pgvector extension
-2. pip install openai psycopg2-binary python-dotenv
+2. pip install openai psycopg2-binary python-dotenv numpy
 
 Setup:
 1. Create .env file with:
@@ -18,14 +18,58 @@ Setup:
    CREATE DATABASE knowledge_db;
    \c knowledge_db
    CREATE EXTENSION vector;
+
+Changing embedding models without downtime:
+   kb.migrate_in_background("text-embedding-3-large", dimensions=1536)
+   Search keeps using the old vectors until the new column is ready.
+
+Spreading the knowledge base over several Postgres servers:
+   kb = KnowledgeBase(shard_dsns=["postgresql://db1/knowledge_db",
+                                  "postgresql://db2/knowledge_db"])
+   Documents are hashed to a shard; searches query every shard in
+   parallel and merge the results.
+
+Sending searches to read replicas:
+   kb = KnowledgeBase(replica_dsns=["postgresql://replica1/knowledge_db"])
+   Writes stay on the primary; a KnowledgeBase instance always sees its
+   own writes.
+
+Copying a knowledge base to another environment without re-embedding
+(needs pip install pyarrow):
+   kb.export_snapshot("kb.arrow")
+   other_kb.setup(); other_kb.import_snapshot("kb.arrow")
+
+Keeping the vector index healthy as documents churn:
+   maintenance = IndexMaintenance(kb, kb.table_name)
+   maintenance.setup()
+   maintenance.start()   # VACUUM / REINDEX CONCURRENTLY off-peak only
+
+Sharding, replicas, migrations, snapshots, deduplication signatures and
+IndexMaintenance live in vector_store.py, shared with the RAG examples.
 """
 
 import psycopg2
 import psycopg2.extras
 from openai import OpenAI
+import hashlib
+import heapq
 import os
+import re
+import threading
+from collections import OrderedDict
+from itertools import islice
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+from vector_store import (
+    IndexMaintenance,
+    PgVectorStore,
+    SIMHASH_BANDS,
+    content_signature,
+    hamming_distance,
+    install_row_counters,
+    keyword_query,
+)
 
 load_dotenv()
 
@@ -41,22 +85,116 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'password')
 }
 
+# Columns search results include for each projection
+SEARCH_PROJECTIONS = {
+    "ids": ["id"],
+    "titles": ["id", "title", "source"],
+    "full": ["id", "title", "content", "source", "metadata"],
+}
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict]],
+    limit: int,
+    k: int = 60
+) -> List[Dict]:
+    """
+    Fuse ranked result lists with Reciprocal Rank Fusion.
+
+    Each document scores sum(1 / (k + rank)) over the lists it appears
+    in, so documents found by several queries rise to the top. The
+    fused results keep the best similarity seen and get an rrf_score.
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            entry = fused.get(result['id'])
+            if entry is None:
+                entry = fused[result['id']] = dict(result, rrf_score=0.0)
+            elif result['similarity'] > entry['similarity']:
+                entry.update(result, rrf_score=entry['rrf_score'])
+            entry['rrf_score'] += 1.0 / (k + rank)
+    return sorted(
+        fused.values(),
+        key=lambda result: result['rrf_score'],
+        reverse=True
+    )[:limit]
+
 
-class KnowledgeBase:
+def text_hash(text: str) -> str:
+    """SHA-256 of the exact text, as stored in the content_hash column."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class KnowledgeBase(PgVectorStore):
     """A knowledge base with semantic search using pgvector."""
 
-    def __init__(self, table_name: str = "documents"):
+    # Column of the signatures table referencing a document
+    signature_key = "doc_id"
+
+    def __init__(
+        self,
+        table_name: str = "documents",
+        deduplicate: bool = False,
+        near_duplicate_distance: int = 3,
+        shard_dsns: Optional[List[str]] = None,
+        shard_timeout: float = 2.0,
+        allow_partial_results: bool = True,
+        replica_dsns: Optional[List] = None,
+        max_replica_lag: float = 5.0
+    ):
+        """
+        Args:
+            table_name: Table holding the documents
+            deduplicate: Skip embedding documents that exactly or nearly
+                match an existing one; store them as references instead
+            near_duplicate_distance: Maximum SimHash bit difference for two
+                documents to count as near-duplicates
+            shard_dsns: Connection strings of Postgres shards; None uses
+                the single DB_CONFIG database. Documents are placed by
+                hashing their content, so exact duplicates share a shard.
+            shard_timeout: Seconds each shard gets to answer a search
+            allow_partial_results: Return results from the shards that
+                answered when others fail or time out (otherwise raise)
+            replica_dsns: Connection strings of read replicas. A flat list
+                holds replicas of the single database; with shards, give
+                one list per shard. Searches use a replica, writes always
+                go to the primary.
+            max_replica_lag: Replicas lagging more seconds than this are
+                skipped for reads
+        """
+        super().__init__(
+            table_name,
+            DB_CONFIG,
+            shard_dsns=shard_dsns,
+            shard_timeout=shard_timeout,
+            allow_partial_results=allow_partial_results,
+            replica_dsns=replica_dsns,
+            max_replica_lag=max_replica_lag
+        )
         self.table_name = table_name
         self.embedding_model = "text-embedding-3-small"
         self.embedding_dimensions = 1536
-
-    def get_connection(self):
-        """Create a database connection."""
-        return psycopg2.connect(**DB_CONFIG)
+        self.deduplicate = deduplicate
+        self.near_duplicate_distance = near_duplicate_distance
+        # ivfflat lists scanned for the first page of a search; later
+        # pages scan proportionally more
+        self.search_probes = 10
+        self._iterative_scan = None
+        # Query embeddings kept for page cursors, by query id
+        self.query_cache_size = 1000
+        self._query_embeddings = OrderedDict()
+        self._query_lock = threading.Lock()
 
     def setup(self):
-        """Set up the database table and index."""
-        conn = self.get_connection()
+        """Set up the database table and index on every shard."""
+        for shard in range(self.shard_count):
+            self._setup_shard(shard)
+        print(f"Table '{self.table_name}' created successfully!")
+
+    def _setup_shard(self, shard: int):
+        """Set up the table and index in one database."""
+        conn = self.get_connection(shard)
         try:
             with conn.cursor() as cur:
                 # Enable pgvector extension
@@ -84,28 +222,150 @@ class KnowledgeBase:
                     WITH (lists = 100)
                 """)
 
+                if self.shard_dsns:
+                    self._interleave_ids(cur, shard)
+
+                # Duplicate documents point at a canonical document's vector
+                cur.execute(f"""
+                    ALTER TABLE {self.table_name}
+                    ADD COLUMN IF NOT EXISTS canonical_id INTEGER
+                        REFERENCES {self.table_name}(id) ON DELETE CASCADE
+                """)
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {self.table_name}_canonical_id_idx
+                    ON {self.table_name} (canonical_id)
+                    WHERE canonical_id IS NOT NULL
+                """)
+
+                # Full-text index for exact identifiers in hybrid_search()
+                cur.execute(f"""
+                    ALTER TABLE {self.table_name}
+                    ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR
+                        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+                """)
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {self.table_name}_content_tsv_idx
+                    ON {self.table_name}
+                    USING gin (content_tsv)
+                """)
+
+                # Hash of the exact content, so updates can skip re-embedding
+                cur.execute(f"""
+                    ALTER TABLE {self.table_name}
+                    ADD COLUMN IF NOT EXISTS content_hash CHAR(64)
+                """)
+                cur.execute(f"""
+                    UPDATE {self.table_name}
+                    SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+                    WHERE content_hash IS NULL
+                """)
+
+                # Signature index of canonical documents for deduplication
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.signatures_table} (
+                        doc_id INTEGER PRIMARY KEY
+                            REFERENCES {self.table_name}(id) ON DELETE CASCADE,
+                        content_hash CHAR(64) NOT NULL,
+                        simhash BIGINT NOT NULL,
+                        band0 INTEGER NOT NULL,
+                        band1 INTEGER NOT NULL,
+                        band2 INTEGER NOT NULL,
+                        band3 INTEGER NOT NULL
+                    )
+                """)
+                for column in ["content_hash"] + [
+                    f"band{i}" for i in range(SIMHASH_BANDS)
+                ]:
+                    cur.execute(f"""
+                        CREATE INDEX IF NOT EXISTS
+                            {self.signatures_table}_{column}_idx
+                        ON {self.signatures_table} ({column})
+                    """)
+
+                # Which vector column (and model) queries should use
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.embedding_columns_table} (
+                        column_name VARCHAR(63) PRIMARY KEY,
+                        model VARCHAR(100) NOT NULL,
+                        dimensions INTEGER,
+                        status VARCHAR(20) NOT NULL
+                            CHECK (status IN ('backfilling', 'active', 'retired')),
+                        checkpoint_id INTEGER DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cur.execute(f"""
+                    INSERT INTO {self.embedding_columns_table}
+                    (column_name, model, status)
+                    VALUES ('embedding', %s, 'active')
+                    ON CONFLICT (column_name) DO NOTHING
+                """, (self.embedding_model,))
+
+                # Counters behind get_stats()
+                install_row_counters(
+                    cur, self.table_name, self.stats_table,
+                    [
+                        ("documents", "''"),
+                        ("source", "source"),
+                        ("tenant", "metadata->>'tenant'")
+                    ]
+                )
+
                 conn.commit()
-                print(f"Table '{self.table_name}' created successfully!")
 
         finally:
             conn.close()
 
-    def get_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text using OpenAI."""
-        response = openai_client.embeddings.create(
-            input=text,
-            model=self.embedding_model
-        )
-        return response.data[0].embedding
+    def get_embedding(
+        self,
+        text: str,
+        model: str = None,
+        dimensions: Optional[int] = None
+    ) -> List[float]:
+        """
+        Generate embedding for text using OpenAI.
+
+        Uses the model of the active embedding column unless a model
+        is given.
+        """
+        return self.get_embeddings_batch([text], model, dimensions)[0]
 
-    def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    def get_embeddings_batch(
+        self,
+        texts: List[str],
+        model: str = None,
+        dimensions: Optional[int] = None
+    ) -> List[List[float]]:
         """Generate embeddings for multiple texts."""
+        if model is None:
+            _, model, dimensions = self._active_embedding()
+        options = {"dimensions": dimensions} if dimensions else {}
         response = openai_client.embeddings.create(
             input=texts,
-            model=self.embedding_model
+            model=model,
+            **options
         )
         return [item.embedding for item in response.data]
 
+    def _embed_for_all_columns(
+        self,
+        texts: List[str]
+    ) -> Tuple[List[str], List[List[List[float]]]]:
+        """
+        Embed texts for every vector column in use.
+
+        During a migration this fills both the active and the new
+        column. Returns the column names and, per text, one vector for
+        each column.
+        """
+        vector_columns = self._embedding_columns()
+        per_column = [
+            self.get_embeddings_batch(texts, model, dimensions) if texts else []
+            for _, model, dimensions in vector_columns
+        ]
+        columns = [column for column, _, _ in vector_columns]
+        return columns, [list(vectors) for vectors in zip(*per_column)]
+
     def add_document(
         self,
         content: str,
@@ -113,56 +373,143 @@ class KnowledgeBase:
         source: str = None,
         metadata: dict = None
     ) -> int:
-        """Add a single document to the knowledge base."""
-        embedding = self.get_embedding(content)
+        """
+        Add a single document to the knowledge base.
 
-        conn = self.get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(f"""
-                    INSERT INTO {self.table_name}
-                    (title, content, source, metadata, embedding)
-                    VALUES (%s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    title,
-                    content,
-                    source,
-                    psycopg2.extras.Json(metadata or {}),
-                    embedding
-                ))
-                doc_id = cur.fetchone()[0]
-                conn.commit()
-                return doc_id
-        finally:
-            conn.close()
+        Goes through add_documents_batch(), so deduplication applies.
+        """
+        return self.add_documents_batch([{
+            'title': title,
+            'content': content,
+            'source': source,
+            'metadata': metadata or {}
+        }])[0]
 
     def add_documents_batch(self, documents: List[Dict]) -> List[int]:
-        """Add multiple documents at once."""
-        # Get all embeddings in one API call
+        """
+        Add multiple documents at once.
+
+        With deduplicate enabled, documents that match an existing
+        document (or an earlier one in the batch) are stored with a
+        canonical_id reference and no embedding. With shards
+        configured, each shard receives its documents in one transaction.
+        """
+        # Group documents by shard, remembering their batch positions
+        by_shard = {}
+        for i, doc in enumerate(documents):
+            by_shard.setdefault(self.shard_for(doc['content']), []).append(i)
+
+        doc_ids = [None] * len(documents)
+        if self.deduplicate:
+            for shard, positions in by_shard.items():
+                ids = self._add_documents_deduplicated(
+                    [documents[i] for i in positions], shard
+                )
+                for i, doc_id in zip(positions, ids):
+                    doc_ids[i] = doc_id
+            return doc_ids
+
+        # Get all embeddings in one API call (per vector column)
         contents = [doc['content'] for doc in documents]
-        embeddings = self.get_embeddings_batch(contents)
+        columns, embeddings = self._embed_for_all_columns(contents)
+        placeholders = ", ".join(["%s"] * len(columns))
+
+        for shard, positions in by_shard.items():
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    for i in positions:
+                        doc = documents[i]
+                        cur.execute(f"""
+                            INSERT INTO {self.table_name}
+                            (title, content, source, metadata, content_hash,
+                             {", ".join(columns)})
+                            VALUES (%s, %s, %s, %s, %s, {placeholders})
+                            RETURNING id
+                        """, [
+                            doc.get('title'),
+                            doc['content'],
+                            doc.get('source'),
+                            psycopg2.extras.Json(doc.get('metadata', {})),
+                            text_hash(doc['content'])
+                        ] + embeddings[i])
+                        doc_ids[i] = cur.fetchone()[0]
+
+                    self._commit(conn, shard)
+            finally:
+                conn.close()
+        return doc_ids
 
-        conn = self.get_connection()
+    def _add_documents_deduplicated(
+        self,
+        documents: List[Dict],
+        shard: int = 0
+    ) -> List[int]:
+        """Insert a batch, embedding only documents that are not duplicates."""
+        signatures = [content_signature(doc['content']) for doc in documents]
+
+        conn = self.get_connection(shard)
         try:
-            doc_ids = []
             with conn.cursor() as cur:
-                for doc, embedding in zip(documents, embeddings):
+                # For each document: ('db', id), ('batch', index) or None
+                references = []
+                for i, signature in enumerate(signatures):
+                    canonical_id = self._find_canonical(cur, signature)
+                    if canonical_id is not None:
+                        references.append(('db', canonical_id))
+                        continue
+                    match = next(
+                        (
+                            j for j in range(i)
+                            if references[j] is None and (
+                                signatures[j][0] == signature[0]
+                                or hamming_distance(signatures[j][1], signature[1])
+                                <= self.near_duplicate_distance
+                            )
+                        ),
+                        None
+                    )
+                    references.append(None if match is None else ('batch', match))
+
+                # Embed only the canonical documents, in one API call
+                unique = [i for i, ref in enumerate(references) if ref is None]
+                columns, vectors = self._embed_for_all_columns(
+                    [documents[i]['content'] for i in unique]
+                )
+                embeddings = dict(zip(unique, vectors))
+                no_vectors = [None] * len(columns)
+                placeholders = ", ".join(["%s"] * len(columns))
+
+                doc_ids = []
+                for i, doc in enumerate(documents):
+                    ref = references[i]
+                    if ref is None:
+                        canonical_id = None
+                    elif ref[0] == 'db':
+                        canonical_id = ref[1]
+                    else:
+                        canonical_id = doc_ids[ref[1]]
+
                     cur.execute(f"""
                         INSERT INTO {self.table_name}
-                        (title, content, source, metadata, embedding)
-                        VALUES (%s, %s, %s, %s, %s)
+                        (title, content, source, metadata, canonical_id,
+                         content_hash, {", ".join(columns)})
+                        VALUES (%s, %s, %s, %s, %s, %s, {placeholders})
                         RETURNING id
-                    """, (
+                    """, [
                         doc.get('title'),
                         doc['content'],
                         doc.get('source'),
                         psycopg2.extras.Json(doc.get('metadata', {})),
-                        embedding
-                    ))
+                        canonical_id,
+                        text_hash(doc['content'])
+                    ] + embeddings.get(i, no_vectors))
                     doc_ids.append(cur.fetchone()[0])
 
-                conn.commit()
+                    if ref is None:
+                        self._store_signature(cur, doc_ids[-1], signatures[i])
+
+                self._commit(conn, shard)
             return doc_ids
         finally:
             conn.close()
@@ -171,81 +518,701 @@ class KnowledgeBase:
         self,
         query: str,
         limit: int = 5,
+        threshold: float = 0.0,
+        projection: str = "full"
+    ) -> List[Dict]:
+        """
+        Search for similar documents using semantic search.
+
+        With shards configured, all shards are searched in parallel and
+        their top results merged. See search_page() for projections and
+        paging through more results.
+        """
+        return self.search_page(
+            query,
+            limit=limit,
+            threshold=threshold,
+            projection=projection
+        )['results']
+
+    def search_page(
+        self,
+        query: Optional[str] = None,
+        limit: int = 10,
+        threshold: float = 0.0,
+        projection: str = "titles",
+        cursor: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Return one page of search results and a cursor for the next page.
+
+        Args:
+            query: Search text (ignored when a cursor is given)
+            limit: Results per page
+            threshold: Minimum similarity of returned documents
+            projection: "ids" (id and similarity), "titles" (adds title
+                and source) or "full" (adds content and metadata); use
+                load_documents() to fetch content for chosen hits later
+            cursor: next_cursor of the previous page. It names the query
+                by id; the query embedding stays on the server, so later
+                pages normally cost no embedding call.
+
+        Each page keeps only hits past the previous page's last distance,
+        which an ivfflat scan of a few lists runs out of quickly. Deeper
+        pages therefore scan more lists, and on pgvector 0.8+ the index
+        scan goes on to further lists until the page is full.
+
+        Returns:
+            {'results': [...], 'next_cursor': dict or None,
+             'failed_shards': shards left out of this page (see
+             allow_partial_results)}
+        """
+        if projection not in SEARCH_PROJECTIONS:
+            raise ValueError(f"Unknown projection: {projection}")
+        if cursor is None:
+            cursor = self._new_cursor(query, threshold)
+
+        column = cursor['column']
+        query_embedding = self._query_embedding(cursor)
+        fields = SEARCH_PROJECTIONS[projection]
+        timeout = self.shard_timeout if self.shard_dsns else None
+        probes = self.search_probes * (cursor['page'] + 1)
+
+        # Keyset condition: past the previous page's last distance, or at
+        # that distance but not shown yet
+        after = ""
+        params = [query_embedding, query_embedding, cursor['threshold']]
+        if cursor['distance'] is not None:
+            after = f"""
+                          AND ({column} <=> %s::vector > %s
+                               OR ({column} <=> %s::vector = %s
+                                   AND NOT id = ANY(%s)))"""
+            params += [
+                query_embedding,
+                cursor['distance'],
+                query_embedding,
+                cursor['distance'],
+                cursor['seen_ids']
+            ]
+        params += [query_embedding, limit]
+
+        def search_shard(shard: int) -> List[Dict]:
+            conn = self.get_read_connection(shard, timeout)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"SET LOCAL ivfflat.probes = {probes}")
+                    if self._supports_iterative_scan(cur):
+                        cur.execute(
+                            "SET LOCAL ivfflat.iterative_scan = relaxed_order"
+                        )
+                    cur.execute(f"""
+                        SELECT
+                            {", ".join(fields)},
+                            {column} <=> %s::vector AS distance
+                        FROM {self.table_name}
+                        WHERE 1 - ({column} <=> %s::vector) >= %s{after}
+                        ORDER BY {column} <=> %s::vector
+                        LIMIT %s
+                    """, params)
+
+                    results = []
+                    for row in cur.fetchall():
+                        result = dict(zip(fields, row))
+                        result['distance'] = row[-1]
+                        results.append(result)
+                    # Iterative scans return hits only roughly in order
+                    results.sort(key=lambda result: result['distance'])
+                    return results
+            finally:
+                conn.close()
+
+        # Each shard returns its own top hits; merge them by distance
+        shard_results, failed_shards = self._scatter(search_shard)
+        page = list(islice(
+            heapq.merge(
+                *shard_results,
+                key=lambda result: result['distance']
+            ),
+            limit
+        ))
+
+        next_cursor = None
+        if len(page) == limit:
+            distance = page[-1]['distance']
+            seen_ids = [r['id'] for r in page if r['distance'] == distance]
+            if distance == cursor['distance']:
+                seen_ids += cursor['seen_ids']
+            next_cursor = dict(
+                cursor,
+                distance=distance,
+                seen_ids=seen_ids,
+                page=cursor['page'] + 1
+            )
+
+        for result in page:
+            result['similarity'] = 1 - float(result.pop('distance'))
+        return {
+            'results': page,
+            'next_cursor': next_cursor,
+            'failed_shards': failed_shards
+        }
+
+    def _new_cursor(self, query: str, threshold: float) -> Dict:
+        """Start a search: a cursor for the first page of a query."""
+        column, model, dimensions = self._active_embedding()
+        return {
+            'query': query,
+            'query_id': text_hash(f"{column}:{query}"),
+            'column': column,
+            'model': model,
+            'dimensions': dimensions,
+            'threshold': threshold,
+            'distance': None,
+            'seen_ids': [],
+            'page': 0
+        }
+
+    def _query_embedding(self, cursor: Dict) -> List[float]:
+        """
+        Return the embedding of a cursor's query.
+
+        Embeddings of the last query_cache_size queries are kept by query
+        id; an evicted one is embedded again from the query text.
+        """
+        query_id = cursor['query_id']
+        with self._query_lock:
+            embedding = self._query_embeddings.get(query_id)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(query_id)
+                return embedding
+
+        embedding = self.get_embedding(
+            cursor['query'], cursor['model'], cursor['dimensions']
+        )
+        with self._query_lock:
+            self._query_embeddings[query_id] = embedding
+            while len(self._query_embeddings) > self.query_cache_size:
+                self._query_embeddings.popitem(last=False)
+        return embedding
+
+    def _supports_iterative_scan(self, cur) -> bool:
+        """Whether pgvector can extend ivfflat scans until LIMIT is met."""
+        if self._iterative_scan is None:
+            cur.execute("""
+                SELECT extversion FROM pg_extension WHERE extname = 'vector'
+            """)
+            row = cur.fetchone()
+            parts = re.findall(r"\d+", row[0]) if row else []
+            version = tuple(int(part) for part in parts[:2])
+            self._iterative_scan = version >= (0, 8)
+        return self._iterative_scan
+
+    def search_many(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        threshold: float = 0.0,
+        projection: str = "full",
+        fuse: bool = False,
+        rrf_k: int = 60
+    ):
+        """
+        Run several searches at once, e.g. rewrites of one question.
+
+        All queries are embedded in one API call and searched in one
+        statement per shard (a LATERAL k-NN query per query vector),
+        with shards queried in parallel.
+
+        Returns one result list per query, or with fuse=True a single
+        list combined by Reciprocal Rank Fusion (constant rrf_k).
+        """
+        if projection not in SEARCH_PROJECTIONS:
+            raise ValueError(f"Unknown projection: {projection}")
+        if not queries:
+            return []
+
+        column, model, dimensions = self._active_embedding()
+        embeddings = self.get_embeddings_batch(queries, model, dimensions)
+        fields = SEARCH_PROJECTIONS[projection]
+        timeout = self.shard_timeout if self.shard_dsns else None
+        values = ", ".join(["(%s, %s::vector)"] * len(queries))
+        params = [
+            value for n, embedding in enumerate(embeddings)
+            for value in (n, embedding)
+        ] + [threshold, limit]
+
+        def search_shard(shard: int) -> List[List[Dict]]:
+            conn = self.get_read_connection(shard, timeout)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT q.n, d.*
+                        FROM (VALUES {values}) AS q (n, embedding)
+                        CROSS JOIN LATERAL (
+                            SELECT
+                                {", ".join(fields)},
+                                1 - ({column} <=> q.embedding) AS similarity
+                            FROM {self.table_name}
+                            WHERE 1 - ({column} <=> q.embedding) >= %s
+                            ORDER BY {column} <=> q.embedding
+                            LIMIT %s
+                        ) AS d
+                        ORDER BY q.n, d.similarity DESC
+                    """, params)
+
+                    per_query = [[] for _ in queries]
+                    for row in cur.fetchall():
+                        result = dict(zip(fields, row[1:]))
+                        result['similarity'] = float(row[-1])
+                        per_query[row[0]].append(result)
+                    return per_query
+            finally:
+                conn.close()
+
+        # Merge each query's hits across shards by similarity
+        shard_results, _ = self._scatter(search_shard)
+        result_lists = [
+            list(islice(
+                heapq.merge(
+                    *[per_query[n] for per_query in shard_results],
+                    key=lambda result: -result['similarity']
+                ),
+                limit
+            ))
+            for n in range(len(queries))
+        ]
+
+        if fuse:
+            return reciprocal_rank_fusion(result_lists, limit, rrf_k)
+        return result_lists
+
+    def hybrid_search(
+        self,
+        query: str,
+        limit: int = 5,
+        projection: str = "full",
+        lexical_k: int = 50,
         threshold: float = 0.0
     ) -> List[Dict]:
-        """Search for similar documents using semantic search."""
-        query_embedding = self.get_embedding(query)
+        """
+        Search that looks up exact identifiers in the full-text index.
 
-        conn = self.get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(f"""
-                    SELECT
-                        id,
-                        title,
-                        content,
-                        source,
-                        metadata,
-                        1 - (embedding <=> %s::vector) AS similarity
-                    FROM {self.table_name}
-                    WHERE 1 - (embedding <=> %s::vector) >= %s
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                """, (
-                    query_embedding,
-                    query_embedding,
-                    threshold,
-                    query_embedding,
-                    limit
+        Identifier-like query terms (error codes, SKUs, plan codes) are
+        matched through the GIN index first, up to lexical_k documents
+        per shard. If the index returns every match (fewer than
+        lexical_k per shard), only those documents are ranked, without
+        an ANN scan; otherwise vector search runs as well. The keyword
+        and vector rankings are combined with Reciprocal Rank Fusion.
+        Queries without such terms are plain vector searches. Documents
+        below threshold similarity are left out of both rankings.
+        """
+        if projection not in SEARCH_PROJECTIONS:
+            raise ValueError(f"Unknown projection: {projection}")
+
+        cursor = self._new_cursor(query, threshold)
+        column = cursor['column']
+        query_embedding = self._query_embedding(cursor)
+        keywords = keyword_query(query)
+        if keywords is None:
+            return self.search_page(
+                limit=limit, projection=projection, cursor=cursor
+            )['results']
+
+        fields = SEARCH_PROJECTIONS[projection]
+        timeout = self.shard_timeout if self.shard_dsns else None
+
+        def search_shard(shard: int) -> List[Dict]:
+            conn = self.get_read_connection(shard, timeout)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT
+                            {", ".join(fields)},
+                            1 - ({column} <=> %s::vector) AS similarity,
+                            ts_rank_cd(content_tsv, keywords) AS text_rank
+                        FROM {self.table_name},
+                             websearch_to_tsquery('english', %s) AS keywords
+                        WHERE content_tsv @@ keywords
+                          AND 1 - ({column} <=> %s::vector) >= %s
+                        ORDER BY text_rank DESC
+                        LIMIT %s
+                    """, (
+                        query_embedding,
+                        keywords,
+                        query_embedding,
+                        threshold,
+                        lexical_k + 1
+                    ))
+
+                    results = []
+                    for row in cur.fetchall():
+                        result = dict(zip(fields, row))
+                        result['similarity'] = float(row[-2])
+                        result['text_rank'] = float(row[-1])
+                        results.append(result)
+                    return results
+            finally:
+                conn.close()
+
+        # One extra row per shard tells a complete match from a truncated one
+        shard_results, failed_shards = self._scatter(search_shard)
+        selective = not failed_shards and all(
+            len(results) <= lexical_k for results in shard_results
+        )
+        lexical = sorted(
+            (r for results in shard_results for r in results[:lexical_k]),
+            key=lambda result: -result['text_rank']
+        )
+        for result in lexical:
+            del result['text_rank']
+        if selective and lexical:
+            # Every keyword hit is known: rank them without an ANN scan
+            semantic = sorted(lexical, key=lambda result: -result['similarity'])
+        else:
+            semantic = self.search_page(
+                limit=limit, projection=projection, cursor=cursor
+            )['results']
+        return reciprocal_rank_fusion([lexical, semantic], limit)
+
+    def load_documents(self, doc_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Fetch full documents for search hits, in one query per shard.
+
+        Returns a dict mapping each found id to its title, content,
+        source and metadata.
+        """
+        def load_shard(shard: int) -> List[tuple]:
+            shard_ids = [i for i in doc_ids if self.shard_of_id(i) == shard]
+            if not shard_ids:
+                return []
+            conn = self.get_read_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT id, title, content, source, metadata
+                        FROM {self.table_name}
+                        WHERE id = ANY(%s)
+                    """, (shard_ids,))
+                    return cur.fetchall()
+            finally:
+                conn.close()
+
+        documents = {}
+        for rows in self._scatter(load_shard)[0]:
+            for row in rows:
+                documents[row[0]] = dict(
+                    zip(SEARCH_PROJECTIONS['full'], row)
+                )
+        return documents
+
+    def update_document(
+        self,
+        doc_id: int,
+        content: str = None,
+        title: str = None,
+        source: str = None,
+        metadata: dict = None
+    ) -> bool:
+        """
+        Update a document in place, keeping its id.
+
+        Fields left as None keep their current value. The document is
+        re-embedded only if its content actually changed.
+        """
+        updated = self.update_documents_batch([{
+            'id': doc_id,
+            'content': content,
+            'title': title,
+            'source': source,
+            'metadata': metadata
+        }])
+        return updated == 1
+
+    def update_documents_batch(self, updates: List[Dict]) -> int:
+        """
+        Update many documents, each given as a dict with 'id' and any of
+        'content', 'title', 'source' and 'metadata'.
+
+        Each shard first applies the title, source and metadata edits in
+        one UPDATE statement, which sets updated_at and returns the
+        documents whose new content differs from their stored
+        content_hash. Only those are embedded, in one API call, and get
+        their new content and vectors together in a second statement. A
+        changed duplicate document gets its own embedding and stops
+        pointing at its canonical document; duplicates of a changed
+        canonical document are handed over by _promote_duplicates().
+
+        Returns the number of documents updated.
+        """
+        by_shard = {}
+        for update in updates:
+            by_shard.setdefault(self.shard_of_id(update['id']), []).append(update)
+
+        # Apply field edits and find documents whose content really changed
+        field_template = "(%s::int, %s::text, %s::text, %s::jsonb, %s::char(64))"
+        updated = 0
+        changed = {}
+        for shard, shard_updates in by_shard.items():
+            rows = []
+            for u in shard_updates:
+                metadata = u.get('metadata')
+                rows.append((
+                    u['id'],
+                    u.get('title'),
+                    u.get('source'),
+                    None if metadata is None else psycopg2.extras.Json(metadata),
+                    None if u.get('content') is None else text_hash(u['content'])
                 ))
 
-                results = []
-                for row in cur.fetchall():
-                    results.append({
-                        'id': row[0],
-                        'title': row[1],
-                        'content': row[2],
-                        'source': row[3],
-                        'metadata': row[4],
-                        'similarity': float(row[5])
-                    })
-                return results
-        finally:
-            conn.close()
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    results = psycopg2.extras.execute_values(cur, f"""
+                        UPDATE {self.table_name} AS d
+                        SET title = COALESCE(v.title, d.title),
+                            source = COALESCE(v.source, d.source),
+                            metadata = COALESCE(v.metadata, d.metadata),
+                            updated_at = CURRENT_TIMESTAMP
+                        FROM (VALUES %s) AS v
+                            (id, title, source, metadata, content_hash)
+                        WHERE d.id = v.id
+                        RETURNING d.id, v.content_hash IS NOT NULL
+                            AND v.content_hash IS DISTINCT FROM d.content_hash
+                    """, rows, template=field_template, page_size=len(rows), fetch=True)
+                    self._commit(conn, shard)
+            finally:
+                conn.close()
+
+            updated += len(results)
+            for doc_id, content_changed in results:
+                if content_changed:
+                    changed.setdefault(shard, []).append(doc_id)
+
+        if not changed:
+            return updated
+
+        contents = {u['id']: u['content'] for u in updates
+                    if u.get('content') is not None}
+        changed_ids = [doc_id for ids in changed.values() for doc_id in ids]
+        columns, vectors = self._embed_for_all_columns(
+            [contents[doc_id] for doc_id in changed_ids]
+        )
+        embeddings = dict(zip(changed_ids, vectors))
+        vector_names = ", ".join(columns)
+        vector_sets = "".join(
+            f",\n                            {column} = v.{column}"
+            for column in columns
+        )
+        template = (
+            "(%s::int, %s::text, %s::char(64)"
+            + ", %s::vector" * len(columns) + ")"
+        )
+
+        for shard, shard_ids in changed.items():
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    if self.deduplicate:
+                        self._promote_duplicates(cur, shard_ids, columns)
+
+                    psycopg2.extras.execute_values(cur, f"""
+                        UPDATE {self.table_name} AS d
+                        SET content = v.content,
+                            content_hash = v.content_hash,
+                            canonical_id = NULL{vector_sets},
+                            updated_at = CURRENT_TIMESTAMP
+                        FROM (VALUES %s) AS v
+                            (id, content, content_hash, {vector_names})
+                        WHERE d.id = v.id
+                    """, [
+                        [doc_id, contents[doc_id], text_hash(contents[doc_id])]
+                        + embeddings[doc_id]
+                        for doc_id in shard_ids
+                    ], template=template, page_size=len(shard_ids))
+
+                    # Re-index the new content of canonical documents
+                    if self.deduplicate:
+                        cur.execute(f"""
+                            DELETE FROM {self.signatures_table}
+                            WHERE doc_id = ANY(%s)
+                        """, (shard_ids,))
+                        self._store_signatures(cur, [
+                            (doc_id, content_signature(contents[doc_id]))
+                            for doc_id in shard_ids
+                        ])
+                    self._commit(conn, shard)
+            finally:
+                conn.close()
+        return updated
+
+    def _promote_duplicates(
+        self,
+        cur,
+        canonical_ids: List[int],
+        columns: List[str]
+    ):
+        """
+        Hand the duplicates of canonical documents about to change or be
+        deleted to a new canonical document.
+
+        The lowest-id duplicate of each becomes canonical: it takes over
+        the current vectors, which embed its (near-)identical content,
+        and gets a signature. The other duplicates point at it instead.
+        Must run before the canonical documents are overwritten or
+        deleted.
+        """
+        vector_sets = "".join(
+            f",\n                {column} = c.{column}" for column in columns
+        )
+        cur.execute(f"""
+            UPDATE {self.table_name} AS dup
+            SET canonical_id = NULL{vector_sets},
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT DISTINCT ON (canonical_id) id, canonical_id
+                FROM {self.table_name}
+                WHERE canonical_id = ANY(%s) AND id <> ALL(%s)
+                ORDER BY canonical_id, id
+            ) AS p
+            JOIN {self.table_name} AS c ON c.id = p.canonical_id
+            WHERE dup.id = p.id
+            RETURNING dup.id, p.canonical_id, dup.content
+        """, (canonical_ids, canonical_ids))
+
+        for doc_id, old_canonical_id, content in cur.fetchall():
+            cur.execute(f"""
+                UPDATE {self.table_name}
+                SET canonical_id = %s
+                WHERE canonical_id = %s
+            """, (doc_id, old_canonical_id))
+            self._store_signature(cur, doc_id, content_signature(content))
 
     def delete_document(self, doc_id: int) -> bool:
-        """Delete a document by ID."""
-        conn = self.get_connection()
+        """
+        Delete a document by ID.
+
+        Duplicates of the document are handed to a new canonical
+        document by _promote_duplicates() first; the ON DELETE CASCADE
+        on canonical_id would otherwise delete them along with it.
+        """
+        shard = self.shard_of_id(doc_id)
+        columns = [column for column, _, _ in self._embedding_columns()]
+        conn = self.get_connection(shard)
         try:
             with conn.cursor() as cur:
+                self._promote_duplicates(cur, [doc_id], columns)
                 cur.execute(f"""
                     DELETE FROM {self.table_name} WHERE id = %s
                 """, (doc_id,))
                 deleted = cur.rowcount > 0
-                conn.commit()
+                self._commit(conn, shard)
                 return deleted
         finally:
             conn.close()
 
+    def get_stats(self) -> Dict:
+        """
+        Corpus statistics that stay cheap however large the corpus gets.
+
+        Exact counts come from the trigger-maintained counters table,
+        the estimate and sizes from the system catalog, so nothing scans
+        the documents table. Documents are grouped by source and by
+        their 'tenant' metadata value.
+
+        Returns:
+            {'documents', 'estimated_documents', 'by_source', 'by_tenant',
+             'table_bytes', 'index_bytes', 'last_ingest'}
+        """
+        stats = {
+            'documents': 0,
+            'estimated_documents': 0,
+            'by_source': {},
+            'by_tenant': {},
+            'table_bytes': 0,
+            'index_bytes': 0,
+            'last_ingest': None
+        }
+        for shard in range(self.shard_count):
+            conn = self.get_read_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT scope, key, SUM(row_count)::bigint, MAX(last_ingest)
+                        FROM {self.stats_table}
+                        GROUP BY scope, key
+                    """)
+                    for scope, key, count, last_ingest in cur.fetchall():
+                        if scope in stats:
+                            stats[scope] += count
+                        elif count:
+                            group = stats[f"by_{scope}"]
+                            group[key] = group.get(key, 0) + count
+                        if last_ingest and (stats['last_ingest'] is None
+                                            or last_ingest > stats['last_ingest']):
+                            stats['last_ingest'] = last_ingest
+
+                    cur.execute("""
+                        SELECT GREATEST(reltuples, 0)::bigint,
+                               pg_table_size(oid),
+                               pg_indexes_size(oid)
+                        FROM pg_class
+                        WHERE oid = %s::regclass
+                    """, (self.table_name,))
+                    estimated, table_bytes, index_bytes = cur.fetchone()
+                    stats['estimated_documents'] += estimated
+                    stats['table_bytes'] += table_bytes
+                    stats['index_bytes'] += index_bytes
+            finally:
+                conn.close()
+        return stats
+
     def get_document_count(self) -> int:
         """Get the total number of documents."""
-        conn = self.get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(f"SELECT COUNT(*) FROM {self.table_name}")
-                return cur.fetchone()[0]
-        finally:
-            conn.close()
+        total = 0
+        for shard in range(self.shard_count):
+            conn = self.get_read_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT COALESCE(SUM(row_count), 0)
+                        FROM {self.stats_table}
+                        WHERE scope = 'documents'
+                    """)
+                    total += cur.fetchone()[0]
+            finally:
+                conn.close()
+        return total
 
     def clear_all(self):
         """Delete all documents (use with caution!)."""
-        conn = self.get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(f"TRUNCATE {self.table_name} RESTART IDENTITY")
-                conn.commit()
-        finally:
-            conn.close()
+        for shard in range(self.shard_count):
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"TRUNCATE {self.table_name} RESTART IDENTITY CASCADE"
+                    )
+                    self._commit(conn, shard)
+            finally:
+                conn.close()
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def _snapshot_fields(self) -> List[Tuple[str, str]]:
+        """(column, kind) pairs saved in a snapshot, besides the embedding."""
+        return [
+            ("id", "int"),
+            ("title", "text"),
+            ("content", "text"),
+            ("source", "text"),
+            ("metadata", "jsonb"),
+            ("canonical_id", "int"),
+            ("content_hash", "text"),
+            ("created_at", "timestamp"),
+            ("updated_at", "timestamp"),
+        ]
 
 
 def demo():
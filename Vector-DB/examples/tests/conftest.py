@@ -0,0 +1,85 @@
+"""Shared setup for the knowledge base tests: no database or OpenAI calls are made."""
+
+import os
+import sys
+
+import psycopg2.extras
+import pytest
+
+# knowledge_base builds an OpenAI client at import time; it is never called here
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base import KnowledgeBase  # noqa: E402
+
+
+class FakeCursor:
+    """Cursor answering each statement with conn.respond(sql, params)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.queries.append((" ".join(sql.split()), params))
+        self.rows = list(self.conn.respond(sql, params) or [])
+        self.rowcount = len(self.rows)
+
+    def copy_expert(self, sql, file):
+        self.conn.queries.append((" ".join(sql.split()), None))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeConnection:
+    def __init__(self, respond):
+        self.respond = respond
+        self.queries = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+
+def execute_values(cur, sql, argslist, template=None, page_size=100, fetch=False):
+    cur.execute(sql, [list(args) for args in argslist])
+    return cur.fetchall() if fetch else None
+
+
+@pytest.fixture
+def make_kb(monkeypatch):
+    """Build a KnowledgeBase whose connections answer with respond(sql, params)."""
+    def make(respond, **options):
+        kb = KnowledgeBase(**options)
+        conn = FakeConnection(respond)
+        monkeypatch.setattr(kb, "get_connection", lambda *args: conn)
+        monkeypatch.setattr(kb, "get_read_connection", lambda *args: conn)
+        monkeypatch.setattr(
+            kb, "_embedding_columns", lambda: [("embedding", "model", None)]
+        )
+        monkeypatch.setattr(kb, "get_embedding", lambda *args: [1.0, 0.0])
+        # One statement per execute_values call, with the rows as params
+        monkeypatch.setattr(psycopg2.extras, "execute_values", execute_values)
+        monkeypatch.setattr(
+            kb, "get_embeddings_batch",
+            lambda texts, *args: [[1.0, float(n)] for n in range(len(texts))]
+        )
+        return kb, conn
+    return make
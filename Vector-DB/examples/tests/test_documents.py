@@ -0,0 +1,127 @@
+"""Tests for KnowledgeBase document writes."""
+
+import re
+
+from knowledge_base import text_hash
+
+
+class DocumentTable:
+    """
+    Just enough of a documents table with deduplication for delete_document:
+    canonical_id references cascade on delete, as in the real schema.
+    """
+
+    def __init__(self, documents):
+        self.documents = {doc['id']: dict(doc) for doc in documents}
+        self.signatures = {}
+
+    def respond(self, sql, params):
+        sql = " ".join(sql.split())
+        if "AS dup" in sql:
+            canonical_ids, excluded = params
+            promoted = []
+            for canonical_id in canonical_ids:
+                duplicates = sorted(
+                    doc_id for doc_id, doc in self.documents.items()
+                    if doc['canonical_id'] == canonical_id and doc_id not in excluded
+                )
+                if duplicates:
+                    doc = self.documents[duplicates[0]]
+                    doc['canonical_id'] = None
+                    doc['embedding'] = self.documents[canonical_id]['embedding']
+                    promoted.append((doc['id'], canonical_id, doc['content']))
+            return promoted
+        if re.search(r"SET canonical_id = %s WHERE canonical_id = %s", sql):
+            new_id, old_id = params
+            for doc in self.documents.values():
+                if doc['canonical_id'] == old_id:
+                    doc['canonical_id'] = new_id
+            return []
+        if sql.startswith("INSERT INTO documents_signatures"):
+            for row in params:
+                self.signatures[row[0]] = row[1:]
+            return []
+        if sql.startswith("DELETE FROM documents WHERE id = %s"):
+            doc_id = params[0]
+            if doc_id not in self.documents:
+                return []
+            deleted = [doc_id]
+            # ON DELETE CASCADE on canonical_id
+            deleted += [i for i, doc in self.documents.items() if doc['canonical_id'] == doc_id]
+            for i in deleted:
+                del self.documents[i]
+            return [(i,) for i in deleted[:1]]
+        raise AssertionError(f"Unexpected SQL: {sql}")
+
+    def searchable(self, doc_id):
+        """A document is found by search through its own or its canonical's vector."""
+        doc = self.documents.get(doc_id)
+        if doc is None:
+            return False
+        if doc['canonical_id'] is not None:
+            doc = self.documents[doc['canonical_id']]
+        return doc['embedding'] is not None
+
+
+def document(doc_id, canonical_id=None):
+    return {
+        "id": doc_id,
+        "content": "Refunds are issued within 14 days.",
+        "canonical_id": canonical_id,
+        "embedding": None if canonical_id else [0.1, 0.2],
+    }
+
+
+def test_deleting_a_canonical_document_keeps_its_duplicates(make_kb):
+    table = DocumentTable([document(1), document(2, 1), document(3, 1), document(4)])
+    kb, conn = make_kb(table.respond, deduplicate=True)
+
+    assert kb.delete_document(1)
+
+    assert sorted(table.documents) == [2, 3, 4]
+    assert all(table.searchable(doc_id) for doc_id in (2, 3, 4))
+    # The lowest-id duplicate took over the vector and the signature index
+    assert table.documents[2]['canonical_id'] is None
+    assert table.documents[3]['canonical_id'] == 2
+    assert list(table.signatures) == [2]
+    assert conn.commits == 1
+
+
+def test_deleting_a_missing_document_returns_false(make_kb):
+    table = DocumentTable([document(1)])
+    kb, _ = make_kb(table.respond)
+
+    assert not kb.delete_document(7)
+    assert sorted(table.documents) == [1]
+
+
+def test_update_re_embeds_only_documents_whose_content_changed(make_kb, monkeypatch):
+    stored = {1: text_hash("Refunds take 14 days."), 2: text_hash("Shipping is free.")}
+    contents = {}
+
+    def respond(sql, params):
+        sql = " ".join(sql.split())
+        if sql.startswith("UPDATE documents AS d SET title"):
+            # RETURNING id, whether the new content hash differs
+            return [(row[0], row[4] is not None and row[4] != stored[row[0]]) for row in params]
+        if sql.startswith("UPDATE documents AS d SET content"):
+            contents.update({row[0]: row[1] for row in params})
+            return []
+        raise AssertionError(f"Unexpected SQL: {sql}")
+
+    kb, conn = make_kb(respond)
+    embedded = []
+    monkeypatch.setattr(
+        kb, "get_embeddings_batch",
+        lambda texts, *args: embedded.extend(texts) or [[1.0, 0.0] for _ in texts]
+    )
+
+    updated = kb.update_documents_batch([
+        {'id': 1, 'content': "Refunds take 14 days.", 'title': "Refunds"},
+        {'id': 2, 'content': "Shipping costs $5."},
+    ])
+
+    assert updated == 2
+    assert embedded == ["Shipping costs $5."]
+    assert contents == {2: "Shipping costs $5."}
+    assert conn.commits == 2
@@ -0,0 +1,147 @@
+"""Tests for KnowledgeBase search paging, projections and multi-query search."""
+
+import threading
+
+import pytest
+from knowledge_base import reciprocal_rank_fusion
+
+
+class VectorTable:
+    """
+    Answers search_page's k-NN query from fixed (id, distance) hits,
+    applying its threshold and keyset condition like PostgreSQL would.
+    """
+
+    def __init__(self, hits):
+        self.hits = sorted(hits, key=lambda hit: (hit[1], hit[0]))
+        self.probes = []
+
+    def respond(self, sql, params):
+        sql = " ".join(sql.split())
+        if "extversion" in sql:
+            return [("0.8.0",)]
+        if sql.startswith("SET LOCAL ivfflat.probes"):
+            self.probes.append(int(sql.rsplit(" ", 1)[1]))
+            return []
+        if sql.startswith("SET LOCAL"):
+            return []
+        threshold, limit = params[2], params[-1]
+        hits = [hit for hit in self.hits if 1 - hit[1] >= threshold]
+        if "NOT id = ANY" in sql:
+            distance, seen_ids = params[4], params[7]
+            hits = [
+                (doc_id, d) for doc_id, d in hits
+                if d > distance or (d == distance and doc_id not in seen_ids)
+            ]
+        return hits[:limit]
+
+
+def test_pages_with_tied_distances_skip_and_repeat_nothing(make_kb):
+    table = VectorTable([(1, 0.1), (2, 0.2), (3, 0.2), (4, 0.2), (5, 0.4)])
+    kb, _ = make_kb(table.respond)
+
+    pages = []
+    page = kb.search_page("refunds", limit=2, projection="ids")
+    pages.append([r['id'] for r in page['results']])
+    while page['next_cursor']:
+        page = kb.search_page(cursor=page['next_cursor'], limit=2, projection="ids")
+        pages.append([r['id'] for r in page['results']])
+
+    assert pages == [[1, 2], [3, 4], [5]]
+    assert page['failed_shards'] == []
+    # Deeper pages scan more ivfflat lists
+    assert table.probes == [kb.search_probes * n for n in (1, 2, 3)]
+
+
+def test_cursor_remembers_every_id_shown_at_its_distance(make_kb):
+    table = VectorTable([(1, 0.2), (2, 0.2), (3, 0.2), (4, 0.3)])
+    kb, _ = make_kb(table.respond)
+
+    first = kb.search_page("refunds", limit=2, projection="ids")
+    second = kb.search_page(cursor=first['next_cursor'], limit=1, projection="ids")
+
+    assert first['next_cursor']['seen_ids'] == [1, 2]
+    assert second['next_cursor']['seen_ids'] == [3, 1, 2]
+    assert [r['id'] for r in second['results']] == [3]
+
+
+def test_later_pages_reuse_the_query_embedding(make_kb, monkeypatch):
+    table = VectorTable([(1, 0.1), (2, 0.2), (3, 0.3)])
+    kb, _ = make_kb(table.respond)
+    calls = []
+    monkeypatch.setattr(kb, "get_embedding", lambda *args: calls.append(args) or [1.0, 0.0])
+
+    first = kb.search_page("refunds", limit=1, projection="ids")
+    kb.search_page(cursor=first['next_cursor'], limit=1, projection="ids")
+
+    assert len(calls) == 1
+    assert [1.0, 0.0] not in first['next_cursor'].values()
+
+
+def test_results_follow_the_projection_and_report_similarity(make_kb):
+    def respond(sql, params):
+        if "extversion" in sql or sql.strip().startswith("SET LOCAL"):
+            return [("0.7.4",)]
+        return [(7, "Refunds", "faq.md", 0.25)]
+
+    kb, _ = make_kb(respond)
+
+    page = kb.search_page("refunds", projection="titles")
+
+    assert page['results'] == [{'id': 7, 'title': "Refunds", 'source': "faq.md", 'similarity': 0.75}]
+    assert page['next_cursor'] is None
+
+
+def hit(doc_id, similarity):
+    return {'id': doc_id, 'similarity': similarity}
+
+
+def test_rrf_puts_documents_found_by_several_queries_first():
+    fused = reciprocal_rank_fusion([
+        [hit(1, 0.9), hit(2, 0.8)],
+        [hit(3, 0.95), hit(2, 0.85)],
+    ], limit=3, k=60)
+
+    assert [r['id'] for r in fused] == [2, 1, 3]
+    assert fused[0]['rrf_score'] == pytest.approx(2 / 62)
+    # A document keeps the best similarity any query found for it
+    assert fused[0]['similarity'] == 0.85
+
+
+def test_rrf_keeps_documents_from_a_single_list_and_breaks_ties_by_first_seen():
+    fused = reciprocal_rank_fusion([[hit(1, 0.5)], [hit(2, 0.9)], []], limit=5)
+
+    assert [(r['id'], r['rrf_score']) for r in fused] == [(1, 1 / 61), (2, 1 / 61)]
+    assert reciprocal_rank_fusion([[hit(1, 0.5), hit(2, 0.4)]], limit=1) == \
+        [dict(hit(1, 0.5), rrf_score=1 / 61)]
+
+
+def test_search_many_maps_rows_to_their_query_across_shards(make_kb):
+    # Rows are (query number, id, similarity); each shard answers differently
+    shard_rows = [[(0, 1, 0.9), (1, 2, 0.7)], [(0, 3, 0.95), (0, 4, 0.5), (1, 5, 0.8)]]
+    lock = threading.Lock()
+
+    def respond(sql, params):
+        assert "CROSS JOIN LATERAL" in sql
+        with lock:
+            return shard_rows.pop()
+
+    kb, conn = make_kb(respond, shard_dsns=["dbname=a", "dbname=b"])
+
+    results = kb.search_many(["refunds", "shipping", "returns"], limit=2, projection="ids")
+
+    assert [[(r['id'], r['similarity']) for r in hits] for hits in results] == [
+        [(3, 0.95), (1, 0.9)],
+        [(5, 0.8), (2, 0.7)],
+        [],
+    ]
+    # One statement per shard for all three queries
+    assert len(conn.queries) == 2
+
+
+def test_search_many_can_fuse_its_results(make_kb):
+    kb, _ = make_kb(lambda sql, params: [(0, 1, 0.9), (0, 2, 0.8), (1, 2, 0.85)])
+
+    fused = kb.search_many(["refunds", "returns"], projection="ids", fuse=True)
+
+    assert [r['id'] for r in fused] == [2, 1]
@@ -0,0 +1,69 @@
+"""Tests for the shard scatter-gather and its timeouts."""
+
+import threading
+import time
+
+import pytest
+
+from knowledge_base import KnowledgeBase
+from vector_store import timeout_options
+
+
+def sharded_kb(**options):
+    return KnowledgeBase(shard_dsns=["dbname=a", "dbname=b"], **options)
+
+
+def test_timeout_options_set_connect_and_statement_timeouts():
+    assert timeout_options(None) == {}
+    assert timeout_options(2.5) == {
+        "connect_timeout": 3,
+        "options": "-c statement_timeout=2500"
+    }
+    # libpq ignores a connect_timeout below one second
+    assert timeout_options(0.2)["connect_timeout"] == 1
+
+
+def test_scatter_returns_failed_shards_instead_of_storing_them():
+    kb = sharded_kb()
+
+    def fn(shard):
+        if shard == 1:
+            raise OSError("shard down")
+        return [shard]
+
+    results, failed = kb._scatter(fn)
+
+    assert results == [[0]]
+    assert failed == [1]
+    assert not hasattr(kb, "last_failed_shards")
+
+
+def test_scatter_raises_without_partial_results():
+    kb = sharded_kb(allow_partial_results=False)
+
+    def fn(shard):
+        if shard == 0:
+            raise OSError("shard down")
+        return [shard]
+
+    with pytest.raises(RuntimeError, match=r"Shards \[0\]"):
+        kb._scatter(fn)
+
+
+def test_hung_shard_does_not_delay_later_searches():
+    kb = sharded_kb(shard_timeout=0.1)
+    release = threading.Event()
+
+    def hang(shard):
+        if shard == 1:
+            release.wait(5)
+        return [shard]
+
+    try:
+        assert kb._scatter(hang) == ([[0]], [1])
+
+        start = time.monotonic()
+        assert kb._scatter(lambda shard: [shard]) == ([[0], [1]], [])
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
@@ -0,0 +1,47 @@
+"""Tests for the duplicate signatures in vector_store.py."""
+
+from vector_store import (
+    SIMHASH_BANDS,
+    content_signature,
+    hamming_distance,
+    simhash_bands,
+)
+
+TEXT = " ".join(f"word{i}" for i in range(200))
+NEAR_DUPLICATE = TEXT.replace("word100 ", "word100 extra ")
+OTHER = "Postgres keeps vectors in pages and pgvector groups them into ivfflat lists"
+
+
+def test_exact_hash_ignores_case_and_whitespace():
+    assert content_signature("Hello   World\n")[0] == content_signature("hello world")[0]
+    assert content_signature("hello world")[0] != content_signature("hello there")[0]
+
+
+def test_simhash_is_an_unsigned_64_bit_int():
+    # This text's fingerprint has its top bit set
+    simhash = content_signature("x y z w v")[1]
+
+    assert type(simhash) is int
+    assert 2 ** 63 <= simhash < 2 ** 64
+
+
+def test_bands_split_the_fingerprint_into_16_bit_pieces():
+    simhash = 0x1234_5678_9ABC_DEF0
+
+    assert simhash_bands(simhash) == [0xDEF0, 0x9ABC, 0x5678, 0x1234]
+    assert len(simhash_bands(simhash)) == SIMHASH_BANDS
+
+
+def test_near_duplicates_are_within_the_hamming_threshold():
+    text = content_signature(TEXT)[1]
+
+    assert hamming_distance(text, content_signature(NEAR_DUPLICATE)[1]) <= 3
+    assert hamming_distance(text, content_signature(OTHER)[1]) > 3
+
+
+def test_hamming_distance_treats_signed_storage_as_the_same_bits():
+    simhash = 2 ** 64 - 1
+    signed = simhash - 2 ** 64
+
+    assert hamming_distance(signed, simhash) == 0
+    assert hamming_distance(signed, 0) == 64
@@ -0,0 +1,43 @@
+"""Tests for importing snapshots into the knowledge base."""
+
+from datetime import datetime
+
+import pytest
+from vector_store import snapshot_batch, snapshot_schema
+
+pa = pytest.importorskip("pyarrow")
+
+
+def write_snapshot(kb, path, rows):
+    schema = snapshot_schema(kb._snapshot_fields(), 2, {"model": "model", "shards": "1"})
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        writer.write_batch(snapshot_batch(rows, schema))
+
+
+def snapshot_row(doc_id, content, canonical_id=None):
+    now = datetime(2024, 1, 1)
+    return (doc_id, None, content, None, "{}", canonical_id, "hash", now, now, [1.0, 0.0])
+
+
+def respond(sql, params):
+    if "SELECT EXISTS" in sql:
+        return [(False,)]
+    if "atttypmod" in sql:
+        return [(2,)]
+    return []
+
+
+def test_import_stores_signatures_in_one_statement(make_kb, tmp_path):
+    kb, conn = make_kb(respond, deduplicate=True)
+    path = tmp_path / "kb.arrow"
+    write_snapshot(kb, path, [
+        snapshot_row(1, "first document"),
+        snapshot_row(2, "second document"),
+        snapshot_row(3, "first document", canonical_id=1),
+    ])
+
+    assert kb.import_snapshot(str(path)) == 3
+
+    # Only canonical rows are indexed, with a single multi-row INSERT
+    inserts = [params for sql, params in conn.queries if sql.startswith("INSERT INTO")]
+    assert [[row[0] for row in rows] for rows in inserts] == [[1, 2]]
@@ -0,0 +1,1398 @@
+"""
+Shared pgvector plumbing for the knowledge base and RAG examples.
+
+KnowledgeBase (Vector-DB/examples/knowledge_base.py) and RAGSystem
+(RAG/examples/rag_system.py) both build on PgVectorStore, which provides:
+- Scatter-gather across Postgres shards and routing reads to replicas
+- Online embedding-model migration through a shadow vector column
+- Snapshot export/import (Arrow IPC + binary COPY) without re-embedding
+- Exact and near-duplicate signatures (SHA-256 + SimHash)
+- Trigger-maintained row counters (install_row_counters)
+- Vector index health checks and off-peak VACUUM/REINDEX (IndexMaintenance)
+
+Prerequisites:
+- pip install psycopg2-binary numpy
+- PostgreSQL with pgvector extension
+- Optional: pip install pyarrow (snapshot export/import)
+
+Each chapter's examples directory has an identical copy of this file, so
+either chapter runs on its own. Change both copies together.
+"""
+
+import hashlib
+import io
+import math
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+import psycopg2
+import psycopg2.extras
+
+# pyarrow is only needed to export and import snapshots
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Identifier-like tokens: anything with a digit (error codes, SKUs,
+# versions) or upper-case words joined by - or _ (PRO-PLAN, ERR_TIMEOUT).
+# Plain acronyms such as API are ordinary words and left to vector search.
+IDENTIFIER = re.compile(r"[\w.-]*\d[\w.-]*|\b[A-Z]+(?:[_-][A-Z0-9]+)+\b")
+
+# SimHash fingerprints are split into this many 16-bit bands for lookup
+SIMHASH_BANDS = 4
+
+# Each row counter is split over this many rows to spread write contention
+COUNTER_SLOTS = 8
+
+# Binary COPY stream header: signature, flags, header extension length
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+
+# PostgreSQL timestamps count microseconds from this date
+PG_EPOCH = datetime(2000, 1, 1)
+
+# Replication status of a server: (lag in seconds, has it replayed the
+# given WAL position). A primary reports no lag and is always caught up.
+REPLICA_STATUS_SQL = """
+    SELECT
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM
+                now() - pg_last_xact_replay_timestamp()), 0)
+        END,
+        NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= %s::pg_lsn
+"""
+
+
+def timeout_options(timeout: Optional[float]) -> Dict:
+    """
+    psycopg2.connect() arguments bounding a connection by timeout seconds:
+    connect_timeout for connecting and statement_timeout for each
+    statement, after which the server cancels it.
+    """
+    if timeout is None:
+        return {}
+    return {
+        "connect_timeout": max(1, math.ceil(timeout)),
+        "options": f"-c statement_timeout={int(timeout * 1000)}",
+    }
+
+
+def content_signature(text: str) -> Tuple[str, int]:
+    """
+    Compute an exact hash and a 64-bit SimHash for a piece of text.
+
+    Text is lowercased and whitespace-normalized first. The SimHash is
+    built from word 3-shingles, so texts that differ in a few words get
+    fingerprints that differ in only a few bits.
+    """
+    normalized = " ".join(text.lower().split())
+    content_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    words = normalized.split(" ")
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    hashes = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(),
+                "big"
+            )
+            for s in shingles
+        ],
+        dtype=np.uint64
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.astype(np.int64).sum(axis=0) * 2 - len(shingles)
+    simhash = sum(1 << int(i) for i in np.flatnonzero(votes > 0))
+    return content_hash, simhash
+
+
+def simhash_bands(simhash: int) -> List[int]:
+    """Split a 64-bit SimHash into 16-bit bands for indexed lookup."""
+    return [(simhash >> (16 * i)) & 0xFFFF for i in range(SIMHASH_BANDS)]
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Count differing bits between two 64-bit fingerprints."""
+    return bin((a ^ b) & (2 ** 64 - 1)).count("1")
+
+
+def keyword_query(text: str) -> Optional[str]:
+    """
+    Build a full-text query from the identifier-like tokens of a question.
+
+    The tokens are quoted (so "ERR-4012" matches as one phrase) and
+    OR-ed for websearch_to_tsquery. Returns None when the question has
+    no such tokens and plain vector search should be used.
+    """
+    tokens = []
+    for token in IDENTIFIER.findall(text):
+        token = token.strip(".-")
+        if token and token not in tokens:
+            tokens.append(token)
+    if not tokens:
+        return None
+    return " or ".join(f'"{token}"' for token in tokens)
+
+
+def install_row_counters(
+    cur,
+    table: str,
+    stats_table: str,
+    keys: List[Tuple[str, str]]
+):
+    """
+    Keep row counts of a table per key in stats_table, maintained by
+    triggers in the same transaction as every write.
+
+    keys pairs a scope name with an SQL expression over the table's
+    columns; NULL results are counted under the empty key. The triggers
+    are statement-level with transition tables, so a multi-row INSERT,
+    COPY or DELETE costs one upsert per key. Each key's count is spread
+    over COUNTER_SLOTS rows (picked by backend pid) so concurrent
+    writers rarely wait on the same row. Existing rows are counted once
+    when the triggers are first installed.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {stats_table} (
+            scope VARCHAR(20) NOT NULL,
+            key TEXT NOT NULL,
+            slot SMALLINT NOT NULL,
+            row_count BIGINT NOT NULL DEFAULT 0,
+            last_ingest TIMESTAMP,
+            PRIMARY KEY (scope, key, slot)
+        )
+    """)
+
+    def changes(rows: str, sign: int) -> str:
+        return " UNION ALL ".join(
+            f"SELECT '{scope}' AS scope, COALESCE(({expr})::text, '') AS key, "
+            f"{sign} AS delta FROM {rows}"
+            for scope, expr in keys
+        )
+
+    def upsert(deltas: str, ingest: str) -> str:
+        return f"""
+            INSERT INTO {stats_table} (scope, key, slot, row_count, last_ingest)
+            SELECT scope, key, pg_backend_pid() % {COUNTER_SLOTS},
+                   SUM(delta), {ingest}
+            FROM ({deltas}) AS changes
+            GROUP BY scope, key
+            HAVING SUM(delta) <> 0
+            ON CONFLICT (scope, key, slot) DO UPDATE
+            SET row_count = {stats_table}.row_count + EXCLUDED.row_count,
+                last_ingest = COALESCE(EXCLUDED.last_ingest,
+                                       {stats_table}.last_ingest);
+        """
+
+    on_insert = upsert(changes("new_rows", 1), "now()")
+    on_delete = upsert(changes("old_rows", -1), "NULL::timestamp")
+    on_update = upsert(
+        changes("old_rows", -1) + " UNION ALL " + changes("new_rows", 1),
+        "NULL::timestamp"
+    )
+    scopes = ", ".join(f"'{scope}'" for scope, _ in keys)
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION {table}_count_rows() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {on_insert}
+            ELSIF TG_OP = 'DELETE' THEN
+                {on_delete}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {on_update}
+            ELSE
+                DELETE FROM {stats_table} WHERE scope IN ({scopes});
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Count existing rows while writes are blocked, then start the triggers
+    cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute(f"""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = '{table}_count_inserts'
+              AND tgrelid = '{table}'::regclass
+        )
+    """)
+    if not cur.fetchone()[0]:
+        existing = " UNION ALL ".join(
+            f"SELECT '{scope}' AS scope, "
+            f"COALESCE(({expr})::text, '') AS key, created_at FROM {table}"
+            for scope, expr in keys
+        )
+        cur.execute(f"""
+            INSERT INTO {stats_table} (scope, key, slot, row_count, last_ingest)
+            SELECT scope, key, 0, COUNT(*), MAX(created_at)
+            FROM ({existing}) AS existing
+            GROUP BY scope, key
+            ON CONFLICT (scope, key, slot) DO UPDATE
+            SET row_count = EXCLUDED.row_count
+        """)
+
+    for name, event, referencing in [
+        ("count_inserts", "INSERT", "NEW TABLE AS new_rows"),
+        ("count_deletes", "DELETE", "OLD TABLE AS old_rows"),
+        ("count_updates", "UPDATE",
+         "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("count_truncates", "TRUNCATE", ""),
+    ]:
+        cur.execute(f"DROP TRIGGER IF EXISTS {table}_{name} ON {table}")
+        cur.execute(f"""
+            CREATE TRIGGER {table}_{name}
+            AFTER {event} ON {table}
+            {"REFERENCING " + referencing if referencing else ""}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION {table}_count_rows()
+        """)
+
+
+def snapshot_schema(
+    fields: List[Tuple[str, str]],
+    dimensions: int,
+    metadata: Dict[str, str]
+) -> "pa.Schema":
+    """
+    Arrow schema of a snapshot: the given (name, kind) columns followed
+    by the embedding as a fixed-size float32 list.
+    """
+    arrow_types = {
+        "int": pa.int32(),
+        "text": pa.string(),
+        "jsonb": pa.string(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema(
+        [pa.field(name, arrow_types[kind]) for name, kind in fields]
+        + [pa.field("embedding", pa.list_(pa.float32(), dimensions))],
+        metadata=metadata
+    )
+
+
+def snapshot_batch(rows: List[tuple], schema: "pa.Schema") -> "pa.RecordBatch":
+    """Turn database rows into an Arrow record batch."""
+    columns = list(zip(*rows))
+    return pa.record_batch(
+        [
+            pa.array(values, type=field.type)
+            for values, field in zip(columns, schema)
+        ],
+        schema=schema
+    )
+
+
+def snapshot_rows(batch: "pa.RecordBatch") -> List[tuple]:
+    """Turn an Arrow record batch back into rows (vectors as float32 arrays)."""
+    *columns, vectors = batch.columns
+    size = vectors.type.list_size
+    # Fixed-size lists keep one slot per row in a flat values array
+    flat = vectors.values.to_numpy(zero_copy_only=False)
+    start = vectors.offset * size
+    matrix = flat[start:start + len(vectors) * size].reshape(-1, size)
+    embedded = [
+        None if null else vector
+        for null, vector in zip(vectors.is_null().to_pylist(), matrix)
+    ]
+    return list(zip(*[column.to_pylist() for column in columns], embedded))
+
+
+def encode_copy_binary(rows: List[tuple], kinds: List[str]) -> bytes:
+    """
+    Encode rows in PostgreSQL's binary COPY format.
+
+    kinds names each column's type: "int", "text", "jsonb" (JSON text),
+    "timestamp" or "vector" (pgvector's layout: dimensions, an unused
+    16-bit field, then big-endian float32 values).
+    """
+    out = [PGCOPY_HEADER]
+    field_count = struct.pack("!h", len(kinds))
+    for row in rows:
+        out.append(field_count)
+        for kind, value in zip(kinds, row):
+            if value is None:
+                out.append(struct.pack("!i", -1))
+                continue
+            if kind == "int":
+                data = struct.pack("!i", value)
+            elif kind == "text":
+                data = value.encode("utf-8")
+            elif kind == "jsonb":
+                data = b"\x01" + value.encode("utf-8")
+            elif kind == "timestamp":
+                data = struct.pack(
+                    "!q", (value - PG_EPOCH) // timedelta(microseconds=1)
+                )
+            else:
+                data = (
+                    struct.pack("!hh", len(value), 0)
+                    + np.asarray(value, dtype=">f4").tobytes()
+                )
+            out.append(struct.pack("!i", len(data)))
+            out.append(data)
+    out.append(struct.pack("!h", -1))
+    return b"".join(out)
+
+
+class PgVectorStore:
+    """
+    Base class for tables of rows with one or more embedding columns.
+
+    Subclasses create the tables and provide get_embedding(),
+    get_embeddings_batch() and _snapshot_fields(). They also set
+    embedding_model, deduplicate, near_duplicate_distance and
+    signature_key (the signatures table's column referencing a row).
+    _text_query() says where the text of each row comes from.
+    """
+
+    def __init__(
+        self,
+        vector_table: str,
+        db_config: Dict,
+        shard_dsns: Optional[List[str]] = None,
+        shard_timeout: float = 2.0,
+        allow_partial_results: bool = True,
+        replica_dsns: Optional[List] = None,
+        max_replica_lag: float = 5.0
+    ):
+        """
+        Args:
+            vector_table: Table holding the rows and their vectors
+            db_config: psycopg2.connect() arguments of the database used
+                without shards
+            shard_dsns, shard_timeout, allow_partial_results,
+            replica_dsns, max_replica_lag: see KnowledgeBase and RAGSystem
+        """
+        self.vector_table = vector_table
+        self.db_config = db_config
+        self.signatures_table = f"{vector_table}_signatures"
+        self.embedding_columns_table = f"{vector_table}_embedding_columns"
+        self.stats_table = f"{vector_table}_stats"
+        # How long the active embedding column is cached (seconds)
+        self.embedding_config_ttl = 30.0
+        self._embedding_columns_cache = None
+        self.shard_dsns = shard_dsns or []
+        self.shard_timeout = shard_timeout
+        self.allow_partial_results = allow_partial_results
+        if replica_dsns and isinstance(replica_dsns[0], str):
+            replica_dsns = [replica_dsns]
+        self.replica_dsns = replica_dsns or []
+        self.max_replica_lag = max_replica_lag
+        # Last WAL position written per shard, for read-your-writes
+        self._write_lsns = {}
+
+    def _text_query(self) -> str:
+        """SELECT returning (id, text) for every row, aliased as c."""
+        return f"SELECT c.id, c.content FROM {self.vector_table} c"
+
+    # ------------------------------------------------------------------
+    # Shards and read replicas
+    # ------------------------------------------------------------------
+
+    def get_connection(self, shard: int = 0, timeout: Optional[float] = None):
+        """
+        Create a database connection.
+
+        Connects to the given shard when shards are configured. With a
+        timeout (seconds), connecting and each statement give up after
+        that long, so a hung shard does not hold a search thread.
+        """
+        options = timeout_options(timeout)
+        if self.shard_dsns:
+            return psycopg2.connect(self.shard_dsns[shard], **options)
+        return psycopg2.connect(**self.db_config, **options)
+
+    def _replicas(self, shard: int) -> List[str]:
+        """Read replicas configured for a shard."""
+        if shard < len(self.replica_dsns):
+            return self.replica_dsns[shard]
+        return []
+
+    def get_read_connection(
+        self,
+        shard: int = 0,
+        timeout: Optional[float] = None
+    ):
+        """
+        Create a connection for read-only queries.
+
+        Tries the shard's replicas in random order and uses the first one
+        lagging at most max_replica_lag seconds that has already replayed
+        this instance's last write to the shard, so reads always see
+        earlier writes. Falls back to the primary when no replica
+        qualifies.
+        """
+        options = timeout_options(timeout)
+        replicas = self._replicas(shard)
+        min_lsn = self._write_lsns.get(shard, "0/0")
+
+        for dsn in random.sample(replicas, len(replicas)):
+            try:
+                conn = psycopg2.connect(dsn, **options)
+            except psycopg2.OperationalError:
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(REPLICA_STATUS_SQL, (min_lsn,))
+                    lag, caught_up = cur.fetchone()
+            except psycopg2.Error:
+                conn.close()
+                continue
+            if caught_up and float(lag) <= self.max_replica_lag:
+                return conn
+            conn.close()
+
+        return self.get_connection(shard, timeout)
+
+    def _commit(self, conn, shard: int = 0):
+        """Commit a write and remember its WAL position for later reads."""
+        conn.commit()
+        if self._replicas(shard):
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_current_wal_lsn()::text")
+                self._write_lsns[shard] = cur.fetchone()[0]
+            conn.commit()
+
+    @property
+    def shard_count(self) -> int:
+        """Number of databases holding the table."""
+        return max(1, len(self.shard_dsns))
+
+    def shard_for(self, key: str) -> int:
+        """Pick the shard for a key with a stable hash."""
+        return zlib.crc32((key or "").encode("utf-8")) % self.shard_count
+
+    def shard_of_id(self, row_id: int) -> int:
+        """Find the shard holding a row id (ids are interleaved)."""
+        return (row_id - 1) % self.shard_count
+
+    def _scatter(self, fn) -> Tuple[List, List[int]]:
+        """
+        Run fn(shard) on every shard in parallel and collect the results.
+
+        Returns the results of the shards that answered and the sorted
+        list of shards that failed or exceeded shard_timeout. Failed
+        shards are skipped when allow_partial_results is set; otherwise
+        a RuntimeError is raised. Each call gets its own threads, so a
+        shard still running after the timeout (until its connect or
+        statement timeout cancels it) does not delay later searches.
+        """
+        if self.shard_count == 1:
+            return [fn(0)], []
+
+        executor = ThreadPoolExecutor(max_workers=self.shard_count)
+        try:
+            futures = {
+                executor.submit(fn, shard): shard
+                for shard in range(self.shard_count)
+            }
+            done, _ = wait(futures, timeout=self.shard_timeout)
+        finally:
+            executor.shutdown(wait=False)
+
+        results, failed = [], []
+        for future, shard in futures.items():
+            if future in done and future.exception() is None:
+                results.append(future.result())
+            else:
+                failed.append(shard)
+
+        failed.sort()
+        if failed and (not self.allow_partial_results or not results):
+            raise RuntimeError(f"Shards {failed} failed or timed out")
+        return results, failed
+
+    def _interleave_ids(self, cur, shard: int):
+        """
+        Give each shard its own id sequence: shard, shard + n, ...
+
+        An id then tells which shard holds the row. Only an empty
+        table can be switched over.
+        """
+        cur.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id')",
+            (self.vector_table,)
+        )
+        sequence = cur.fetchone()[0]
+        cur.execute(
+            "SELECT seqincrement FROM pg_sequence WHERE seqrelid = %s::regclass",
+            (sequence,)
+        )
+        if cur.fetchone()[0] == self.shard_count:
+            return
+
+        cur.execute(f"SELECT EXISTS (SELECT 1 FROM {self.vector_table})")
+        if cur.fetchone()[0]:
+            raise ValueError(
+                f"Shard {shard} already holds rows with non-sharded ids"
+            )
+        cur.execute(f"""
+            ALTER SEQUENCE {sequence}
+            INCREMENT BY {self.shard_count}
+            MINVALUE 1
+            RESTART WITH {shard + 1}
+        """)
+
+    # ------------------------------------------------------------------
+    # Embedding columns and duplicate signatures
+    # ------------------------------------------------------------------
+
+    def _embedding_columns(self) -> List[Tuple[str, str, Optional[int]]]:
+        """
+        Return (column, model, dimensions) for every vector column in use.
+
+        The active column comes first, followed by any column being
+        backfilled by a migration; writes fill all of them. The answer
+        is cached for embedding_config_ttl seconds so queries do not pay
+        an extra round trip. If the configuration table is missing or
+        unreadable, only the original embedding column is used.
+        """
+        now = time.monotonic()
+        cached = self._embedding_columns_cache
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        columns = [("embedding", self.embedding_model, None)]
+        try:
+            conn = self.get_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT column_name, model, dimensions
+                        FROM {self.embedding_columns_table}
+                        WHERE status IN ('active', 'backfilling')
+                        ORDER BY status = 'active' DESC, column_name
+                    """)
+                    rows = [tuple(row) for row in cur.fetchall()]
+                    if rows:
+                        columns = rows
+            finally:
+                conn.close()
+        except psycopg2.Error:
+            pass
+
+        self._embedding_columns_cache = (now + self.embedding_config_ttl, columns)
+        return columns
+
+    def _active_embedding(self) -> Tuple[str, str, Optional[int]]:
+        """Return (column, model, dimensions) of the active vector column."""
+        return self._embedding_columns()[0]
+
+    def _find_canonical(self, cur, signature: Tuple[str, int]) -> Optional[int]:
+        """
+        Find an indexed row that duplicates the given signature.
+
+        Exact content hashes win; otherwise candidates sharing any
+        SimHash band are compared by Hamming distance.
+        """
+        content_hash, simhash = signature
+        bands = simhash_bands(simhash)
+        cur.execute(f"""
+            SELECT {self.signature_key}, content_hash, simhash
+            FROM {self.signatures_table}
+            WHERE content_hash = %s
+               OR band0 = %s OR band1 = %s OR band2 = %s OR band3 = %s
+        """, [content_hash] + bands)
+
+        best_id, best_distance = None, self.near_duplicate_distance + 1
+        for row_id, candidate_hash, candidate_simhash in cur.fetchall():
+            if candidate_hash == content_hash:
+                return row_id
+            distance = hamming_distance(candidate_simhash, simhash)
+            if distance < best_distance:
+                best_id, best_distance = row_id, distance
+        return best_id
+
+    def _store_signature(self, cur, row_id: int, signature: Tuple[str, int]):
+        """Add a canonical row to the signature index."""
+        self._store_signatures(cur, [(row_id, signature)])
+
+    def _store_signatures(self, cur, rows: List[Tuple[int, Tuple[str, int]]]):
+        """Add (row_id, signature) pairs to the signature index in bulk."""
+        values = []
+        for row_id, (content_hash, simhash) in rows:
+            # Store the unsigned fingerprint in a signed BIGINT column
+            signed = simhash - 2 ** 64 if simhash >= 2 ** 63 else simhash
+            values.append(
+                [row_id, content_hash, signed] + simhash_bands(simhash)
+            )
+        if not values:
+            return
+        psycopg2.extras.execute_values(cur, f"""
+            INSERT INTO {self.signatures_table}
+            ({self.signature_key}, content_hash, simhash,
+             band0, band1, band2, band3)
+            VALUES %s
+        """, values, page_size=len(values))
+
+    # ------------------------------------------------------------------
+    # Embedding model migration
+    # ------------------------------------------------------------------
+
+    def start_embedding_migration(
+        self,
+        model: str,
+        dimensions: Optional[int] = None
+    ) -> str:
+        """
+        Add a shadow vector column for a new embedding model.
+
+        Search keeps using the current column until
+        finish_embedding_migration() switches over; meanwhile new rows
+        are embedded into both columns. dimensions is
+        passed to the embeddings API, which lets models such as
+        text-embedding-3-large fit ivfflat's 2000-dimension limit.
+
+        Returns the name of the shadow column.
+        """
+        column = "embedding_" + re.sub(r"\W+", "_", model).strip("_").lower()
+        size = dimensions or len(self.get_embedding("dimension probe", model))
+
+        for shard in range(self.shard_count):
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        ALTER TABLE {self.vector_table}
+                        ADD COLUMN IF NOT EXISTS {column} VECTOR({size})
+                    """)
+                    cur.execute(f"""
+                        INSERT INTO {self.embedding_columns_table}
+                        (column_name, model, dimensions, status)
+                        VALUES (%s, %s, %s, 'backfilling')
+                        ON CONFLICT (column_name) DO UPDATE
+                        SET status = 'backfilling', updated_at = CURRENT_TIMESTAMP
+                        WHERE {self.embedding_columns_table}.status <> 'active'
+                    """, (column, model, dimensions))
+                    conn.commit()
+            finally:
+                conn.close()
+
+        # Start writing the new column right away
+        self._embedding_columns_cache = None
+        return column
+
+    def _reembed(self, cur, column: str, rows, model: str, dimensions):
+        """Write new-model vectors for (id, text) rows into a column."""
+        embeddings = self.get_embeddings_batch(
+            [text for _, text in rows], model, dimensions
+        )
+        psycopg2.extras.execute_values(cur, f"""
+            UPDATE {self.vector_table} AS t
+            SET {column} = v.embedding::vector
+            FROM (VALUES %s) AS v(id, embedding)
+            WHERE t.id = v.id
+        """, [
+            (row_id, embedding)
+            for (row_id, _), embedding in zip(rows, embeddings)
+        ])
+
+    def _migration_target(self, cur, column: str) -> Tuple:
+        """Return (model, dimensions, checkpoint_id) of a running migration."""
+        cur.execute(f"""
+            SELECT model, dimensions, checkpoint_id
+            FROM {self.embedding_columns_table}
+            WHERE column_name = %s AND status = 'backfilling'
+        """, (column,))
+        row = cur.fetchone()
+        if row is None:
+            raise ValueError(f"No migration in progress for {column}")
+        return row
+
+    def run_embedding_migration(
+        self,
+        column: str,
+        batch_size: int = 100,
+        max_rows_per_second: float = 50.0,
+        max_batches: Optional[int] = None
+    ) -> int:
+        """
+        Re-embed rows into a shadow column, resuming from a checkpoint.
+
+        Each batch is embedded in one API call and committed together
+        with the checkpoint, so an interrupted run picks up where it
+        stopped. Batches are paced to max_rows_per_second to keep load
+        on the database and the embeddings API steady. Shards are
+        migrated one after another; max_batches applies to each.
+
+        Returns the number of rows re-embedded by this call.
+        """
+        return sum(
+            self._run_shard_migration(
+                shard, column, batch_size, max_rows_per_second, max_batches
+            )
+            for shard in range(self.shard_count)
+        )
+
+    def _run_shard_migration(
+        self,
+        shard: int,
+        column: str,
+        batch_size: int,
+        max_rows_per_second: float,
+        max_batches: Optional[int]
+    ) -> int:
+        """Backfill a shadow column on one shard."""
+        conn = self.get_connection(shard)
+        migrated = 0
+        batches = 0
+        try:
+            with conn.cursor() as cur:
+                model, dimensions, checkpoint = self._migration_target(cur, column)
+                conn.commit()
+
+                while max_batches is None or batches < max_batches:
+                    started = time.monotonic()
+                    cur.execute(f"""
+                        {self._text_query()}
+                        WHERE c.id > %s
+                          AND c.{column} IS NULL
+                          AND c.canonical_id IS NULL
+                        ORDER BY c.id
+                        LIMIT %s
+                    """, (checkpoint, batch_size))
+                    rows = cur.fetchall()
+                    if not rows:
+                        break
+
+                    self._reembed(cur, column, rows, model, dimensions)
+                    checkpoint = rows[-1][0]
+                    cur.execute(f"""
+                        UPDATE {self.embedding_columns_table}
+                        SET checkpoint_id = %s, updated_at = CURRENT_TIMESTAMP
+                        WHERE column_name = %s
+                    """, (checkpoint, column))
+                    conn.commit()
+
+                    migrated += len(rows)
+                    batches += 1
+                    pause = len(rows) / max_rows_per_second
+                    pause -= time.monotonic() - started
+                    if pause > 0:
+                        time.sleep(pause)
+        finally:
+            conn.close()
+        return migrated
+
+    def _activate_column(self, cur, column: str):
+        """Make one vector column active and retire the previous one."""
+        cur.execute(f"""
+            UPDATE {self.embedding_columns_table}
+            SET status = CASE WHEN column_name = %s
+                              THEN 'active' ELSE 'retired' END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE column_name = %s OR status = 'active'
+        """, (column, column))
+
+    def finish_embedding_migration(self, column: str, batch_size: int = 100):
+        """
+        Index the shadow column and make it the active one.
+
+        The ivfflat index is built CONCURRENTLY so searches keep running.
+        Rows still missing a vector are then embedded with no lock
+        held. Only the final catch-up (rows written in the meantime) and
+        the switch of the active column run while writes (not reads) are
+        blocked. The old column is kept as retired for
+        rollback_embedding_migration().
+        """
+        for shard in range(self.shard_count):
+            conn = self.get_connection(shard)
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        CREATE INDEX CONCURRENTLY IF NOT EXISTS
+                            {self.vector_table}_{column}_idx
+                        ON {self.vector_table}
+                        USING ivfflat ({column} vector_cosine_ops)
+                        WITH (lists = 100)
+                    """)
+            finally:
+                conn.close()
+
+        # Embed stragglers before locking: the embeddings API is far too
+        # slow to call while writes are blocked
+        for shard in range(self.shard_count):
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    model, dimensions, _ = self._migration_target(cur, column)
+                    while True:
+                        cur.execute(f"""
+                            {self._text_query()}
+                            WHERE c.{column} IS NULL AND c.canonical_id IS NULL
+                            ORDER BY c.id
+                            LIMIT %s
+                        """, (batch_size,))
+                        rows = cur.fetchall()
+                        if not rows:
+                            break
+                        self._reembed(cur, column, rows, model, dimensions)
+                        conn.commit()
+            finally:
+                conn.close()
+
+        # Switch every shard while holding all the write locks; shard 0,
+        # whose configuration searches read, commits last
+        connections = [
+            self.get_connection(shard) for shard in range(self.shard_count)
+        ]
+        try:
+            for conn in connections:
+                with conn.cursor() as cur:
+                    cur.execute(f"LOCK TABLE {self.vector_table} IN SHARE MODE")
+                    model, dimensions, _ = self._migration_target(cur, column)
+                    cur.execute(f"""
+                        {self._text_query()}
+                        WHERE c.{column} IS NULL AND c.canonical_id IS NULL
+                    """)
+                    remaining = cur.fetchall()
+                    if remaining:
+                        self._reembed(cur, column, remaining, model, dimensions)
+                    self._activate_column(cur, column)
+            for conn in reversed(connections):
+                conn.commit()
+        finally:
+            for conn in connections:
+                conn.close()
+
+        self._embedding_columns_cache = None
+
+    def rollback_embedding_migration(self) -> Optional[str]:
+        """
+        Switch back to the most recently retired vector column.
+
+        Rows added after the switch have no vector in the old column
+        and need re-embedding before they are searchable again.
+
+        Returns the reactivated column, or None if there was none.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT column_name
+                    FROM {self.embedding_columns_table}
+                    WHERE status = 'retired'
+                    ORDER BY updated_at DESC
+                    LIMIT 1
+                """)
+                row = cur.fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        # Shard 0 holds the configuration searches read, so it goes last
+        for shard in reversed(range(self.shard_count)):
+            conn = self.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    self._activate_column(cur, row[0])
+                    conn.commit()
+            finally:
+                conn.close()
+
+        self._embedding_columns_cache = None
+        return row[0]
+
+    def migrate_in_background(
+        self,
+        model: str,
+        dimensions: Optional[int] = None,
+        batch_size: int = 100,
+        max_rows_per_second: float = 50.0
+    ) -> threading.Thread:
+        """
+        Run a full embedding migration on a daemon thread.
+
+        Starts (or resumes) the shadow column, backfills it at the given
+        rate and switches over when done. Searches keep using the old
+        column until then.
+        """
+        def worker():
+            column = self.start_embedding_migration(model, dimensions)
+            self.run_embedding_migration(
+                column,
+                batch_size=batch_size,
+                max_rows_per_second=max_rows_per_second
+            )
+            self.finish_embedding_migration(column)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _vector_dimensions(cur, table: str, column: str) -> int:
+        """Declared dimensions of a VECTOR column."""
+        cur.execute("""
+            SELECT atttypmod FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attname = %s
+        """, (table, column))
+        return cur.fetchone()[0]
+
+    def export_snapshot(self, path: str, batch_size: int = 10000) -> int:
+        """
+        Write every row and its embedding to an Arrow IPC file.
+
+        Rows are streamed from a server-side cursor on each shard and
+        written batch_size at a time, so memory use stays bounded. Only
+        the active embedding column is saved; its model and dimensions
+        are recorded in the file for import_snapshot() to check.
+
+        Returns the number of rows exported.
+        """
+        if pa is None:
+            raise ImportError("Snapshots need pyarrow: pip install pyarrow")
+
+        column, model, _ = self._active_embedding()
+        fields = self._snapshot_fields()
+        select = ", ".join(
+            f"{name}::text" if kind == "jsonb" else name
+            for name, kind in fields
+        )
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                dimensions = self._vector_dimensions(cur, self.vector_table, column)
+        finally:
+            conn.close()
+        schema = snapshot_schema(fields, dimensions, {
+            "model": model,
+            "shards": str(self.shard_count),
+        })
+
+        exported = 0
+        with pa.OSFile(path, "wb") as sink, \
+                pa.ipc.new_file(sink, schema) as writer:
+            for shard in range(self.shard_count):
+                conn = self.get_read_connection(shard)
+                try:
+                    with conn.cursor(name="snapshot_export") as cur:
+                        cur.itersize = batch_size
+                        cur.execute(f"""
+                            SELECT {select}, {column}::real[]
+                            FROM {self.vector_table}
+                            ORDER BY id
+                        """)
+                        while True:
+                            rows = cur.fetchmany(batch_size)
+                            if not rows:
+                                break
+                            writer.write_batch(snapshot_batch(rows, schema))
+                            exported += len(rows)
+                finally:
+                    conn.close()
+        return exported
+
+    def import_snapshot(self, path: str) -> int:
+        """
+        Load a snapshot written by export_snapshot() without re-embedding.
+
+        The target must be set up and empty, and its active embedding
+        column must use the snapshot's model. Each record batch is loaded
+        with binary COPY; the vector index is dropped first and rebuilt
+        after the load so ivfflat picks its lists from the real vectors.
+        Rows keep their ids, so canonical_id references stay valid.
+
+        Returns the number of rows imported.
+        """
+        if pa is None:
+            raise ImportError("Snapshots need pyarrow: pip install pyarrow")
+
+        column, model, _ = self._active_embedding()
+        fields = self._snapshot_fields()
+        kinds = [kind for _, kind in fields] + ["vector"]
+        names = ", ".join([name for name, _ in fields] + [column])
+        index = f"{self.vector_table}_{column}_idx"
+        # Canonical rows (no canonical_id) go into the signature index
+        positions = {name: i for i, (name, _) in enumerate(fields)}
+        content_at, canonical_at = positions["content"], positions["canonical_id"]
+
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        info = {
+            key.decode(): value.decode()
+            for key, value in reader.schema.metadata.items()
+        }
+        dimensions = reader.schema.field("embedding").type.list_size
+        if info["model"] != model:
+            raise ValueError(
+                f"Snapshot embeddings come from {info['model']}, "
+                f"but {column} holds {model} embeddings"
+            )
+        if self.shard_count > 1 and int(info["shards"]) != self.shard_count:
+            raise ValueError(
+                f"Snapshot was taken from {info['shards']} shard(s); "
+                f"it can only be imported into 1 or {info['shards']}"
+            )
+
+        connections = [
+            self.get_connection(shard) for shard in range(self.shard_count)
+        ]
+        imported = 0
+        try:
+            for conn in connections:
+                with conn.cursor() as cur:
+                    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {self.vector_table})")
+                    if cur.fetchone()[0]:
+                        raise ValueError(f"{self.vector_table} is not empty")
+                    size = self._vector_dimensions(cur, self.vector_table, column)
+                    if size != dimensions:
+                        raise ValueError(
+                            f"Snapshot has {dimensions}-dimensional vectors, "
+                            f"{column} holds {size}"
+                        )
+                    cur.execute(f"DROP INDEX IF EXISTS {index}")
+
+            for i in range(reader.num_record_batches):
+                # Ids are kept, so each row goes back to its own shard
+                by_shard = {}
+                for row in snapshot_rows(reader.get_record_batch(i)):
+                    by_shard.setdefault(self.shard_of_id(row[0]), []).append(row)
+
+                for shard, rows in by_shard.items():
+                    with connections[shard].cursor() as cur:
+                        cur.copy_expert(
+                            f"COPY {self.vector_table} ({names}) "
+                            "FROM STDIN WITH (FORMAT binary)",
+                            io.BytesIO(encode_copy_binary(rows, kinds))
+                        )
+                        if self.deduplicate:
+                            self._store_signatures(cur, [
+                                (row[0], content_signature(row[content_at]))
+                                for row in rows
+                                if row[canonical_at] is None
+                            ])
+                    imported += len(rows)
+
+            for shard, conn in enumerate(connections):
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        CREATE INDEX {index}
+                        ON {self.vector_table}
+                        USING ivfflat ({column} vector_cosine_ops)
+                        WITH (lists = 100)
+                    """)
+                    # New rows continue after the imported ids
+                    cur.execute(f"""
+                        SELECT setval(
+                            pg_get_serial_sequence('{self.vector_table}', 'id'),
+                            MAX(id)
+                        )
+                        FROM {self.vector_table}
+                        HAVING MAX(id) IS NOT NULL
+                    """)
+                    cur.execute(f"ANALYZE {self.vector_table}")
+                self._commit(conn, shard)
+        finally:
+            for conn in connections:
+                conn.close()
+
+        return imported
+
+
+class IndexMaintenance:
+    """
+    Watches the vector index of a table and repairs it.
+
+    Tracks, per shard:
+    - growth_since_build: rows now vs. when the ivfflat lists were
+      learned (pgvector does not expose list sizes, so growth is the
+      imbalance signal)
+    - dead_ratio: dead tuples left behind by deletes and updates
+    - index_ratio: vector index size relative to the table
+    - recall and recall_drop: recall@10 of the index on a fixed probe
+      set against exact search, and its drop since the last rebuild
+
+    VACUUM and REINDEX CONCURRENTLY only run inside the off-peak window.
+
+    Usage:
+        maintenance = IndexMaintenance(kb, kb.vector_table)
+        maintenance.setup()
+        maintenance.start()   # checks hourly, repairs between 02:00-05:00
+    """
+
+    def __init__(
+        self,
+        owner,
+        table: str,
+        window: Tuple[int, int] = (2, 5),
+        check_interval: float = 3600.0,
+        probe_count: int = 10,
+        max_growth: float = 2.0,
+        max_dead_ratio: float = 0.2,
+        max_index_ratio: float = 1.5,
+        max_recall_drop: float = 0.05
+    ):
+        """
+        Args:
+            owner: The PgVectorStore (KnowledgeBase, RAGSystem) whose
+                connections and shards are used
+            table: Table holding the vectors
+            window: Off-peak hours (start, end) in local time when
+                maintenance may run
+            check_interval: Seconds between scheduler checks
+            probe_count: Stored vectors used as recall probes
+            max_growth: Rebuild once the table has grown this many times
+                past its size at the last index build
+            max_dead_ratio: Vacuum when this share of tuples is dead
+            max_index_ratio: Rebuild when the index outgrows the table by
+                this factor (bloat left by deletes)
+            max_recall_drop: Rebuild when recall falls this far below
+                its value after the last build
+        """
+        self.owner = owner
+        self.table = table
+        self.health_table = f"{table}_index_health"
+        self.window = window
+        self.check_interval = check_interval
+        self.probe_count = probe_count
+        self.max_growth = max_growth
+        self.max_dead_ratio = max_dead_ratio
+        self.max_index_ratio = max_index_ratio
+        self.max_recall_drop = max_recall_drop
+        self._stop = threading.Event()
+
+    def setup(self):
+        """Create the table that remembers each index's last build."""
+        for shard in range(self.owner.shard_count):
+            conn = self.owner.get_connection(shard)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {self.health_table} (
+                            index_name VARCHAR(63) PRIMARY KEY,
+                            built_rows BIGINT,
+                            baseline_recall REAL,
+                            probe_ids INTEGER[],
+                            last_vacuum TIMESTAMP,
+                            last_reindex TIMESTAMP,
+                            checked_at TIMESTAMP
+                        )
+                    """)
+                    conn.commit()
+            finally:
+                conn.close()
+
+    def _index(self) -> Tuple[str, str]:
+        """Active vector column and the name of its index."""
+        column = self.owner._active_embedding()[0]
+        return column, f"{self.table}_{column}_idx"
+
+    def _measure_recall(self, cur, column: str, probe_ids: List[int]) -> float:
+        """Recall@10 of index scans against exact scans for the probes."""
+        cur.execute(f"""
+            SELECT {column} FROM {self.table}
+            WHERE id = ANY(%s) AND {column} IS NOT NULL
+        """, (probe_ids,))
+        probes = [row[0] for row in cur.fetchall()]
+        if not probes:
+            return 1.0
+
+        knn = f"""
+            SELECT id FROM {self.table}
+            WHERE {column} IS NOT NULL
+            ORDER BY {column} <=> %s::vector
+            LIMIT 10
+        """
+        found = total = 0
+        for probe in probes:
+            cur.execute(knn, (probe,))
+            approximate = {row[0] for row in cur.fetchall()}
+            # Without index scans the same query is an exact search
+            cur.execute("SET LOCAL enable_indexscan = off")
+            cur.execute(knn, (probe,))
+            exact = {row[0] for row in cur.fetchall()}
+            cur.execute("SET LOCAL enable_indexscan = on")
+            found += len(approximate & exact)
+            total += len(exact)
+        return found / total if total else 1.0
+
+    def _reset_baseline(self, cur, column: str, index: str):
+        """Pick fresh probes and record the index as just built."""
+        cur.execute(f"""
+            SELECT id FROM {self.table}
+            WHERE {column} IS NOT NULL
+            ORDER BY random()
+            LIMIT %s
+        """, (self.probe_count,))
+        probe_ids = [row[0] for row in cur.fetchall()]
+        recall = self._measure_recall(cur, column, probe_ids)
+        cur.execute(f"""
+            INSERT INTO {self.health_table}
+            (index_name, built_rows, baseline_recall, probe_ids)
+            VALUES (%s, (SELECT COUNT(*) FROM {self.table}), %s, %s)
+            ON CONFLICT (index_name) DO UPDATE
+            SET built_rows = EXCLUDED.built_rows,
+                baseline_recall = EXCLUDED.baseline_recall,
+                probe_ids = EXCLUDED.probe_ids
+        """, (index, recall, probe_ids))
+
+    def check(self, shard: int = 0, measure_recall: bool = True) -> Dict:
+        """
+        Collect index health figures for one shard.
+
+        Recall needs exact scans of the table, so skip it
+        (measure_recall=False) for frequent checks of large tables.
+        """
+        column, index = self._index()
+        conn = self.owner.get_connection(shard)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT built_rows, baseline_recall, probe_ids
+                    FROM {self.health_table}
+                    WHERE index_name = %s
+                """, (index,))
+                row = cur.fetchone()
+                if row is None:
+                    self._reset_baseline(cur, column, index)
+                    conn.commit()
+                    cur.execute(f"""
+                        SELECT built_rows, baseline_recall, probe_ids
+                        FROM {self.health_table}
+                        WHERE index_name = %s
+                    """, (index,))
+                    row = cur.fetchone()
+                built_rows, baseline_recall, probe_ids = row
+
+                cur.execute("""
+                    SELECT n_live_tup, n_dead_tup,
+                           pg_relation_size(relid),
+                           pg_relation_size(%s::regclass)
+                    FROM pg_stat_user_tables
+                    WHERE relid = %s::regclass
+                """, (index, self.table))
+                live, dead, table_size, index_size = cur.fetchone()
+
+                health = {
+                    'shard': shard,
+                    'index': index,
+                    'rows': live,
+                    'growth_since_build': live / max(built_rows or 0, 1),
+                    'dead_ratio': dead / max(live + dead, 1),
+                    'index_ratio': index_size / max(table_size, 1),
+                    'recall': None,
+                    'recall_drop': None
+                }
+                if measure_recall:
+                    recall = self._measure_recall(cur, column, probe_ids)
+                    health['recall'] = recall
+                    health['recall_drop'] = (baseline_recall or 0) - recall
+
+                cur.execute(f"""
+                    UPDATE {self.health_table}
+                    SET checked_at = CURRENT_TIMESTAMP
+                    WHERE index_name = %s
+                """, (index,))
+                conn.commit()
+                return health
+        finally:
+            conn.close()
+
+    def needed_actions(self, health: Dict) -> List[str]:
+        """Maintenance steps ("vacuum", "reindex") the figures call for."""
+        actions = []
+        if health['dead_ratio'] > self.max_dead_ratio:
+            actions.append("vacuum")
+        if (health['growth_since_build'] > self.max_growth
+                or health['index_ratio'] > self.max_index_ratio
+                or (health['recall_drop'] or 0) > self.max_recall_drop):
+            actions.append("reindex")
+        return actions
+
+    def in_window(self) -> bool:
+        """Whether the current local time is inside the off-peak window."""
+        start, end = self.window
+        hour = time.localtime().tm_hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def maintain(self, force: bool = False) -> List[Dict]:
+        """
+        Check every shard and run the maintenance it needs.
+
+        Does nothing outside the off-peak window unless force is set.
+        Returns each shard's health figures with the actions taken.
+        """
+        if not (force or self.in_window()):
+            return []
+
+        reports = []
+        for shard in range(self.owner.shard_count):
+            health = self.check(shard)
+            health['actions'] = self.needed_actions(health)
+            if health['actions']:
+                self._run(shard, health['actions'])
+            reports.append(health)
+        return reports
+
+    def _run(self, shard: int, actions: List[str]):
+        """Vacuum and/or rebuild one shard's index without blocking reads."""
+        column, index = self._index()
+        conn = self.owner.get_connection(shard)
+        try:
+            # VACUUM and REINDEX CONCURRENTLY cannot run in a transaction
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                if "vacuum" in actions:
+                    cur.execute(f"VACUUM (ANALYZE) {self.table}")
+                    cur.execute(f"""
+                        UPDATE {self.health_table}
+                        SET last_vacuum = CURRENT_TIMESTAMP
+                        WHERE index_name = %s
+                    """, (index,))
+                if "reindex" in actions:
+                    # Relearns the ivfflat lists from the current vectors
+                    cur.execute(f"REINDEX INDEX CONCURRENTLY {index}")
+                    cur.execute("BEGIN")
+                    self._reset_baseline(cur, column, index)
+                    cur.execute(f"""
+                        UPDATE {self.health_table}
+                        SET last_reindex = CURRENT_TIMESTAMP
+                        WHERE index_name = %s
+                    """, (index,))
+                    cur.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def start(self) -> threading.Thread:
+        """Run maintain() every check_interval seconds on a daemon thread."""
+        self._stop.clear()
+
+        def worker():
+            while not self._stop.is_set():
+                try:
+                    for report in self.maintain():
+                        if report['actions']:
+                            print(f"Index maintenance on shard {report['shard']}: "
+                                  f"{', '.join(report['actions'])}")
+                except psycopg2.Error as e:
+                    print(f"Index maintenance failed: {e}")
+                self._stop.wait(self.check_interval)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop the background scheduler after its current run."""
+        self._stop.set()